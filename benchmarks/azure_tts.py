@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Azure TTS benchmark against a local stand-in of the Speech service
+
+Compares the previous per-speech setup (new SpeechConfig, AudioConfig and
+SpeechSynthesizer for every speech, audio written to an MP3 file and decoded
+again) with the pooled provider (long-lived pre-warmed synthesizers, PCM audio
+returned in memory). The stand-in sleeps for the connection setup and the
+request round trip, so no subscription or network is needed. Usage:
+
+    python benchmarks/azure_tts.py [--speeches 40] [--threads 4] [--connect-ms 150]
+"""
+import argparse
+import io
+import sys
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import azure.cognitiveservices.speech as speechsdk
+from src.audio import decode_pcm, encode_pcm
+from src.tts.providers import azure
+from src.tts.providers.azure import AzureTTSProvider
+
+class StandInService:
+    """Sleeps like the Speech service: once per connection, once per request"""
+
+    def __init__(self, connect_ms: float, request_ms: float):
+        self.connect = connect_ms / 1000
+        self.request = request_ms / 1000
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    def audio(self, text: str):
+        import numpy as np
+        # About 14 characters per second of speech, 24 kHz mono
+        samples = np.sin(np.arange(int(len(text) / 14 * 24000)) * 0.05) * 0.3
+        return samples
+
+    def synthesizer_class(self):
+        """Stand-in for speechsdk.SpeechSynthesizer bound to this service"""
+        service = self
+
+        class Synthesizer:
+            def __init__(self, speech_config=None, audio_config=None):
+                self.audio_config = audio_config
+                self.connected = False
+
+            def _connect(self):
+                if not self.connected:
+                    with service._lock:
+                        service.connections += 1
+                    time.sleep(service.connect)
+                    self.connected = True
+
+            def speak_text_async(self, text):
+                self._connect()
+                time.sleep(service.request)
+                samples = service.audio(text)
+                if self.audio_config is not None:
+                    # Previous path: the SDK writes an MP3 file
+                    encode_pcm(samples, 24000, Path(self.audio_config.filename))
+                    data = b''
+                else:
+                    buffer = io.BytesIO()
+                    with wave.open(buffer, 'wb') as wav:
+                        wav.setnchannels(1)
+                        wav.setsampwidth(2)
+                        wav.setframerate(24000)
+                        wav.writeframes((samples * 32767).astype('<i2').tobytes())
+                    data = buffer.getvalue()
+                result = type('Result', (), {
+                    'reason': speechsdk.ResultReason.SynthesizingAudioCompleted,
+                    'audio_data': data
+                })
+                return type('Future', (), {'get': lambda self: result})()
+        return Synthesizer
+
+def legacy_synthesize(service, text: str, output_path: Path):
+    """The provider before pooling: everything is created for each speech"""
+    synthesizer = service.synthesizer_class()(
+        speech_config=object(), audio_config=type('AudioConfig', (), {'filename': str(output_path)})
+    )
+    synthesizer.speak_text_async(text).get()
+    # ...and the pipeline decodes the MP3 again
+    decode_pcm(output_path, 24000)
+
+def pooled_synthesize(provider, text: str, output_path: Path):
+    audio = provider.synthesize_bytes(text)
+    output_path.write_bytes(audio.data)
+
+def run(label, func, texts, threads, workdir):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(lambda item: func(item[1], workdir / f'{label}_{item[0]}.mp3'),
+                          enumerate(texts)))
+    return time.perf_counter() - start
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--speeches', type=int, default=40)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--connect-ms', type=float, default=150.0,
+                        help='stand-in connection setup (TLS, websocket, auth)')
+    parser.add_argument('--request-ms', type=float, default=80.0,
+                        help='stand-in synthesis round trip')
+    args = parser.parse_args()
+
+    texts = [f"Questa è la frase numero {i} del benchmark, di lunghezza media." for i in range(args.speeches)]
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+
+        legacy = StandInService(args.connect_ms, args.request_ms)
+        legacy_seconds = run('legacy', lambda t, p: legacy_synthesize(legacy, t, p),
+                             texts, args.threads, workdir)
+
+        pooled = StandInService(args.connect_ms, args.request_ms)
+        with patch.object(azure.speechsdk, 'SpeechSynthesizer', pooled.synthesizer_class()), \
+             patch.object(azure.speechsdk, 'SpeechConfig'), \
+             patch.object(azure.speechsdk, 'Connection') as connection:
+            connection.from_speech_synthesizer.side_effect = \
+                lambda synthesizer: type('Connection', (), {'open': lambda self, _: synthesizer._connect()})()
+            provider = AzureTTSProvider('key', 'region', pool_size=args.threads, prewarm=False)
+            # Pre-warming happens while the rest of the pipeline starts up
+            provider.warm_up()
+            pooled_seconds = run('pooled', lambda t, p: pooled_synthesize(provider, t, p),
+                                 texts, args.threads, workdir)
+
+    print(f"{'path':<8} {'seconds':>8} {'connections':>12} {'ms/speech':>10}")
+    for label, seconds, service in (('legacy', legacy_seconds, legacy),
+                                    ('pooled', pooled_seconds, pooled)):
+        print(f"{label:<8} {seconds:8.2f} {service.connections:12d} "
+              f"{seconds * 1000 / args.speeches:10.1f}")
+    print(f"speed-up: {legacy_seconds / pooled_seconds:.1f}x")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""End-to-end pipeline benchmark on a synthetic corpus
+
+Generates Markdown posts of the requested size and structure, then scans
+them (BlogProcessor), writes their scripts (ScriptProcessor) and renders
+them (VideoProcessor) with the offline synthetic voice, so no network is
+needed. Stage timings come from the tracing spans of the pipeline; the
+results are written as JSON and compared with a baseline. Usage:
+
+    python benchmarks/pipeline.py [--posts 3] [--sections 4] [--sentences 5]
+        [--list-items 3] [--emoji 0.2] [--runs 3] [--profile draft]
+        [--output results.json] [--baseline baseline.json] [--tolerance 0.2]
+
+Exits with 1 when a stage is slower than the baseline by more than the
+tolerance (and by more than --min-seconds, to ignore noise on tiny stages).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+WORDS = (
+    "il la un una codice dati sistema rete server modello utente progetto versione "
+    "sviluppo test errore funzione libreria processo risultato tempo valore problema "
+    "soluzione applicazione servizio memoria cache richiesta risposta analisi struttura "
+    "semplice veloce nuovo grande importante possibile diverso complesso stabile "
+    "usare scrivere leggere costruire misurare provare cambiare migliorare capire"
+).split()
+EMOJI = ['🚀', '✅', '💡', '🔥', '📈', '🐍', '⚙️', '🎬']
+
+# Stage -> span names. Times are the spans' own time, without nested spans of
+# other stages (encode.audio is not counted again in encode)
+STAGES = {
+    'tts': ['tts'],
+    'layout': ['slide', 'effect'],
+    'audio': ['encode.audio'],
+    'encode': ['encode'],
+    'concat': ['concat'],
+}
+
+def _sentence(rng: random.Random, emoji: float) -> str:
+    words = rng.choices(WORDS, k=rng.randint(6, 16))
+    text = ' '.join(words).capitalize()
+    if rng.random() < 0.3:
+        cut = rng.randint(2, len(words) - 2)
+        text = ' '.join(text.split()[:cut]) + ', ' + ' '.join(text.split()[cut:])
+    if rng.random() < emoji:
+        text += ' ' + rng.choice(EMOJI)
+    return text + rng.choice('..!?')
+
+def generate_corpus(directory: Path, posts: int, sections: int, sentences: int,
+                    list_items: int = 0, emoji: float = 0.0, seed: int = 0) -> Dict:
+    """Write `posts` Markdown posts and return a summary of the corpus
+
+    Each post has an untitled opening paragraph and `sections` H2 sections of
+    `sentences` sentences, every other one followed by a list of
+    `list_items` items; `emoji` is the share of sentences ending with one.
+    """
+    rng = random.Random(seed)
+    directory.mkdir(parents=True, exist_ok=True)
+    chars = 0
+    for n in range(posts):
+        lines = [_sentence(rng, emoji) for _ in range(2)]
+        for s in range(sections):
+            lines += ['', f"## Sezione {s + 1}: {' '.join(rng.choices(WORDS, k=3))}", '']
+            lines.append(' '.join(_sentence(rng, emoji) for _ in range(sentences)))
+            if list_items and s % 2 == 0:
+                lines.append('')
+                lines += [f"- {_sentence(rng, emoji)}" for _ in range(list_items)]
+        body = '\n'.join(lines)
+        chars += len(body)
+        posted = date(2024, 1, 1) + timedelta(days=n)
+        (directory / f"post-{n:03d}.md").write_text(
+            f"---\ntitle: 'Post {n:03d} di benchmark'\ndate: {posted.isoformat()}\n"
+            f"url: https://example.com/post-{n:03d}\n---\n\n{body}\n",
+            encoding='utf-8'
+        )
+    return {'posts': posts, 'sections': sections, 'sentences': sentences,
+            'list_items': list_items, 'emoji': emoji, 'seed': seed, 'chars': chars}
+
+def _peak_rss_mb(who: int) -> float:
+    import resource
+    # Of this process only: ffmpeg children would report the RSS they forked with
+    peak = resource.getrusage(who).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (2**20 if sys.platform == 'darwin' else 2**10), 1)
+
+def _stage_times(spans: List[Dict]) -> Dict[str, float]:
+    stage_of = {name: stage for stage, names in STAGES.items() for name in names}
+    own = {span['span_id']: (span['end_ns'] - span['start_ns']) / 1e9 for span in spans}
+    for span in spans:
+        # A nested span of another stage is counted there, not in its parent
+        parent = span['parent_id']
+        if parent in own and span['name'] in stage_of:
+            own[parent] -= (span['end_ns'] - span['start_ns']) / 1e9
+    times = {stage: 0.0 for stage in STAGES}
+    for span in spans:
+        if span['name'] in stage_of:
+            times[stage_of[span['name']]] += own[span['span_id']]
+    return times
+
+def run_pipeline(posts: int, profile: str) -> Dict:
+    """Scan, script and render the corpus once, with the environment already set"""
+    from src import tracing
+    from src.ffmpeg import probe_duration
+    from src.processors import BlogProcessor, ScriptProcessor, VideoProcessor
+
+    tracing.enable()
+    tracing.collect()
+    timings = {}
+
+    start = time.perf_counter()
+    items = BlogProcessor().process(num_posts=posts)
+    timings['blog'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    script_processor = ScriptProcessor()
+    scripts = [script_processor.process(post)[0] for post in items]
+    timings['script'] = time.perf_counter() - start
+
+    video_processor = VideoProcessor()
+    video_processor.set_profile(profile)
+    video_seconds = 0.0
+    start = time.perf_counter()
+    for script in scripts:
+        video_processor.process(script)
+        video_seconds += sum(probe_duration(output) for output in video_processor.outputs)
+    timings['render'] = time.perf_counter() - start
+    timings.update(_stage_times(tracing.collect()))
+    tracing.disable()
+
+    wall = timings['blog'] + timings['script'] + timings['render']
+    return {
+        'wall_seconds': round(wall, 3),
+        'video_seconds': round(video_seconds, 3),
+        'realtime_factor': round(video_seconds / timings['render'], 3),
+        'stages': {stage: round(seconds, 3) for stage, seconds in timings.items()},
+    }
+
+def summarize(runs: List[Dict]) -> Dict:
+    """Median of each measure over the runs"""
+    return {
+        'wall_seconds': statistics.median(r['wall_seconds'] for r in runs),
+        'video_seconds': statistics.median(r['video_seconds'] for r in runs),
+        'realtime_factor': statistics.median(r['realtime_factor'] for r in runs),
+        'stages': {stage: statistics.median(r['stages'][stage] for r in runs)
+                   for stage in runs[0]['stages']},
+    }
+
+def compare(results: Dict, baseline: Dict, tolerance: float, min_seconds: float) -> List[str]:
+    """Regressions of `results` against `baseline`, printed as a table"""
+    regressions = []
+    print(f"\n{'stage':<16}{'baseline':>10}{'current':>10}{'change':>9}")
+    current, previous = results['stages'], baseline['results']['stages']
+    for stage in list(current) + ['wall_seconds']:
+        now = results[stage] if stage == 'wall_seconds' else current[stage]
+        before = baseline['results'][stage] if stage == 'wall_seconds' else previous.get(stage)
+        if before is None:
+            continue
+        change = (now - before) / before if before else 0.0
+        flag = ''
+        if now > before * (1 + tolerance) and now - before > min_seconds:
+            flag = '  REGRESSION'
+            regressions.append(f"{stage}: {before:.3f}s -> {now:.3f}s ({change:+.0%})")
+        print(f"{stage:<16}{before:>9.3f}s{now:>9.3f}s{change:>+9.0%}{flag}")
+    factor, before = results['realtime_factor'], baseline['results']['realtime_factor']
+    if factor < before / (1 + tolerance):
+        regressions.append(f"realtime_factor: {before:.2f} -> {factor:.2f}")
+    print(f"{'realtime factor':<16}{before:>10.2f}{factor:>10.2f}")
+    return regressions
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=3)
+    parser.add_argument('--sections', type=int, default=4, help='H2 sections per post')
+    parser.add_argument('--sentences', type=int, default=5, help='sentences per section')
+    parser.add_argument('--list-items', type=int, default=3, help='items of the lists (every other section)')
+    parser.add_argument('--emoji', type=float, default=0.2, help='share of sentences ending with an emoji')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--runs', type=int, default=3, help='fresh runs, the median is reported')
+    parser.add_argument('--profile', default='draft', help='render profile (draft or final)')
+    parser.add_argument('--text-renderer', default='pil', choices=['pil', 'ass', 'soft'])
+    parser.add_argument('--output', type=Path, help='write the results to this JSON file')
+    parser.add_argument('--baseline', type=Path, help='results of a previous run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown (0.2 = 20%%)')
+    parser.add_argument('--min-seconds', type=float, default=0.05,
+                        help='ignore slowdowns smaller than this')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        corpus = generate_corpus(workdir / 'content', args.posts, args.sections, args.sentences,
+                                 args.list_items, args.emoji, args.seed)
+        # Set before the first import of src: the configuration reads them once
+        os.environ.update(
+            CONTENT_DIR=str(workdir / 'content'), SCRIPT_DIR=str(workdir / 'scripts'),
+            OUTPUT_DIR=str(workdir / 'output'), APP_ENV='dev', DEV_TTS_PROVIDER='synthetic',
+            TEXT_RENDERER=args.text_renderer, INCREMENTAL_BUILDS='false', LOG_LEVEL='WARNING',
+        )
+        runs = []
+        for n in range(args.runs):
+            for directory in ('scripts', 'output'):
+                shutil.rmtree(workdir / directory, ignore_errors=True)
+            result = run_pipeline(args.posts, args.profile)
+            stages = ', '.join(f"{stage} {seconds:.2f}s" for stage, seconds in result['stages'].items())
+            print(f"run {n + 1}: {result['wall_seconds']:.2f}s, "
+                  f"{result['realtime_factor']:.2f}x realtime ({stages})")
+            runs.append(result)
+
+    import resource
+    results = summarize(runs)
+    results['peak_rss_mb'] = _peak_rss_mb(resource.RUSAGE_SELF)
+    document = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'corpus': corpus,
+        'settings': {'profile': args.profile, 'text_renderer': args.text_renderer, 'runs': args.runs},
+        'results': results,
+        'runs': runs,
+    }
+    print(f"median: {results['wall_seconds']:.2f}s for {results['video_seconds']:.1f}s of video "
+          f"({results['realtime_factor']:.2f}x realtime), peak RSS {results['peak_rss_mb']:.0f} MB")
+    if args.output:
+        args.output.write_text(json.dumps(document, indent=2), encoding='utf-8')
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding='utf-8'))
+        if baseline['corpus'] != corpus or baseline['settings'] != document['settings']:
+            print("warning: the baseline was measured on another corpus or with other settings")
+        regressions = compare(results, baseline, args.tolerance, args.min_seconds)
+        if regressions:
+            print('\nRegressions:\n  ' + '\n  '.join(regressions))
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
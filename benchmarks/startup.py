@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Startup-time benchmark for the md2video CLI
+
+Every measurement runs in a fresh interpreter so that nothing is served from
+an already populated ``sys.modules``. Usage:
+
+    python benchmarks/startup.py [--runs 10] [--max-seconds 1.0]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Modules that must not be loaded before a render actually starts
+HEAVY_MODULES = ['moviepy.editor', 'numpy', 'imageio', 'azure.cognitiveservices.speech', 'gtts']
+
+SCENARIOS = {
+    'import': "import src.cli",
+    'cli_prompt': (
+        "import io\n"
+        "from src.cli import VideoGeneratorCLI\n"
+        "VideoGeneratorCLI(stdout=io.StringIO())"
+    ),
+    'script_command': (
+        "import io\n"
+        "from src.cli import VideoGeneratorCLI\n"
+        "VideoGeneratorCLI(stdout=io.StringIO()).onecmd('script')"
+    ),
+}
+
+def _run_once(code: str, workdir: Path) -> float:
+    check = (
+        "\nimport sys\n"
+        f"loaded = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "if loaded:\n"
+        "    sys.exit('heavy modules loaded at startup: ' + ', '.join(loaded))\n"
+    )
+    env = dict(os.environ,
+               CONTENT_DIR=str(workdir / 'content'),
+               SCRIPT_DIR=str(workdir / 'scripts'),
+               OUTPUT_DIR=str(workdir / 'output'))
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', code + check], cwd=ROOT, env=env, check=True)
+    return time.perf_counter() - start
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--max-seconds', type=float, default=1.0,
+                        help='fail if the median of a scenario exceeds this')
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        baseline = statistics.median(_run_once('pass', workdir) for _ in range(args.runs))
+        print(f"{'interpreter':<16} median {baseline:.3f}s")
+
+        for name, code in SCENARIOS.items():
+            timings = [_run_once(code, workdir) for _ in range(args.runs)]
+            median = statistics.median(timings)
+            print(f"{name:<16} median {median:.3f}s  min {min(timings):.3f}s  "
+                  f"(+{median - baseline:.3f}s over bare interpreter)")
+            failed |= median > args.max_seconds
+
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
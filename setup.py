@@ -9,7 +9,7 @@ setup(
         'beautifulsoup4>=4.12.2',
         'python-docx>=1.0.0',
         'requests>=2.31.0',
-        'gTTS>=2.3.2',
+        'gTTS==2.3.2',  # src/tts/providers/gtts.py mirrors its internals
         'moviepy>=1.0.3',
         'Pillow>=9.5.0',
         'python-frontmatter>=1.0.0',
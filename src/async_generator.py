@@ -0,0 +1,274 @@
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+from .config import Config
+from . import metrics, tracing
+from .processors import BlogProcessor, ScriptProcessor, VideoProcessor, RenderSelection
+from .tts import EnhancedTTSFactory, TTSProvider, CoalescingTTSProvider
+
+class _PrefetchedTTSProvider(TTSProvider):
+    """Serves audio synthesized ahead of the render, delegating anything else"""
+
+    def __init__(self, provider: TTSProvider, audio_files: Dict[str, Path], **kwargs):
+        super().__init__(**kwargs)
+        self.provider = provider
+        self.audio_files = audio_files
+
+    @property
+    def identity(self) -> str:
+        return self.provider.identity
+
+    @property
+    def audio_format(self):
+        return self.provider.audio_format
+
+    @property
+    def degraded(self) -> bool:
+        return self.provider.degraded
+
+    def synthesize(self, text: str, output_path: Path, language: str = 'it-IT') -> bool:
+        prefetched = self.audio_files.get(text)
+        if prefetched is not None and prefetched.exists():
+            shutil.copyfile(prefetched, output_path)
+            return True
+        return self.provider.synthesize(text, output_path, language)
+
+class RenderJob:
+    """Handle on a running render: await it, iterate its progress or cancel it"""
+
+    _DONE = object()
+
+    def __init__(self, script_path: str):
+        self.script_path = script_path
+        self.cancel_event = threading.Event()
+        self._events: asyncio.Queue = asyncio.Queue()
+        self._loop = asyncio.get_running_loop()
+        self._task: Optional[asyncio.Task] = None
+
+    def __await__(self):
+        return self._task.__await__()
+
+    def emit(self, event: Dict):
+        """Queue a progress event, can be called from any thread"""
+        self._loop.call_soon_threadsafe(self._events.put_nowait, event)
+
+    def _finish(self, task: asyncio.Task):
+        if task.cancelled():
+            self._events.put_nowait({'type': 'cancelled'})
+        elif task.exception() is not None:
+            self._events.put_nowait({'type': 'error', 'error': str(task.exception())})
+        else:
+            self._events.put_nowait({'type': 'done', 'video_file': task.result()})
+        self._events.put_nowait(self._DONE)
+
+    async def progress(self) -> AsyncIterator[Dict]:
+        """Yield the job events (stage, message, progress) until it ends
+
+        The last event is one of `done`, `error` or `cancelled`.
+        """
+        while True:
+            event = await self._events.get()
+            if event is self._DONE:
+                return
+            yield event
+
+    def cancel(self):
+        """Stop the render at the next speech boundary"""
+        self.cancel_event.set()
+        if self._task is not None:
+            self._task.cancel()
+
+    def done(self) -> bool:
+        return self._task is not None and self._task.done()
+
+class AsyncVideoGenerator:
+    """Asyncio facade over the video generation pipeline
+
+    Post scanning, script writing and TTS requests are I/O bound and run on a
+    small shared I/O pool, with TTS synthesized ahead of the render and
+    concurrently across speeches. Frame rendering and encoding are CPU bound
+    and run on the render executor, at most `max_renders` at a time, so many
+    concurrent jobs share a fixed number of threads.
+    """
+
+    def __init__(self, max_renders: Optional[int] = None, tts_concurrency: int = 4,
+                 render_executor: Optional[Executor] = None,
+                 tts_provider: Optional[TTSProvider] = None):
+        self.config = Config()
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.blog_processor = BlogProcessor()
+        self.script_processor = ScriptProcessor()
+        self.max_renders = max_renders or os.cpu_count() or 1
+        self.tts_concurrency = tts_concurrency
+        self._tts_provider = tts_provider
+        self._owns_render_executor = render_executor is None
+        self._render_executor = render_executor or ThreadPoolExecutor(
+            max_workers=self.max_renders, thread_name_prefix='md2video-render'
+        )
+        self._io_executor = ThreadPoolExecutor(
+            max_workers=tts_concurrency, thread_name_prefix='md2video-io'
+        )
+        self._render_slots: Optional[asyncio.Semaphore] = None
+        # Stage trace of every job, written by aclose() (TRACE_FILE, empty = off)
+        if self.config.TRACE_FILE:
+            tracing.enable()
+
+    @property
+    def tts_provider(self) -> TTSProvider:
+        """TTS provider shared by all jobs, created on first use"""
+        if self._tts_provider is None:
+            self._tts_provider = EnhancedTTSFactory.create_provider()
+        return self._tts_provider
+
+    async def _in_io(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._io_executor, func, *args)
+
+    async def agenerate_scripts(self, num_posts: Optional[int] = None,
+                                since: Optional[date] = None) -> List[Dict]:
+        """Only generate scripts from posts"""
+        try:
+            posts = await self._in_io(self.blog_processor.process, num_posts, since)
+            results = []
+            for post in posts:
+                script_file, _ = await self._in_io(self.script_processor.process, post)
+                results.append({
+                    'title': post['title'],
+                    'script_file': script_file,
+                    'url': post['url']
+                })
+            return results
+
+        except Exception as e:
+            raise Exception(f"Error generating scripts: {str(e)}")
+
+    def start_video(self, script_path: str, profile: Optional[str] = None,
+                    selection: Optional[RenderSelection] = None) -> RenderJob:
+        """Schedule the render of a script (or a selection of it) and return its job handle"""
+        job = RenderJob(script_path)
+        job._task = asyncio.create_task(self._run_job(job, profile, selection))
+        job._task.add_done_callback(job._finish)
+        return job
+
+    async def agenerate_video(self, script_path: str, profile: Optional[str] = None,
+                              selection: Optional[RenderSelection] = None) -> str:
+        """Generate a video from an existing script"""
+        try:
+            return await self.start_video(script_path, profile, selection)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error generating video: {str(e)}")
+
+    async def aprocess_recent_posts(self, num_posts: Optional[int] = None,
+                                    since: Optional[date] = None) -> List[Dict]:
+        """Complete process: from post to video, rendering the posts concurrently"""
+        script_results = await self.agenerate_scripts(num_posts, since)
+        jobs = [self.start_video(item['script_file']) for item in script_results]
+        try:
+            video_files = await asyncio.gather(*jobs)
+        except BaseException as e:
+            for job in jobs:
+                job.cancel()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise Exception(f"Error processing posts: {str(e)}")
+
+        return [{**item, 'video_file': video_file}
+                for item, video_file in zip(script_results, video_files)]
+
+    async def _run_job(self, job: RenderJob, profile: Optional[str] = None,
+                       selection: Optional[RenderSelection] = None) -> str:
+        processor = VideoProcessor()
+        processor.set_profile(profile)
+        processor.cancel_event = job.cancel_event
+        # Speech is prefetched (and coalesced) here, ahead of the render
+        processor.coalesce = False
+        processor.set_callbacks(
+            message_callback=lambda msg: job.emit({'type': 'message', 'message': msg}),
+            progress_callback=lambda info: job.emit({'type': 'progress', **info})
+        )
+
+        if self._render_slots is None:
+            self._render_slots = asyncio.Semaphore(self.max_renders)
+
+        await asyncio.to_thread(self.config.ensure_directories)
+        prefetch_dir = Path(tempfile.mkdtemp(prefix='prefetch_', dir=self.config.TEMP_DIR))
+        try:
+            job.emit({'type': 'stage', 'stage': 'tts'})
+            audio_files = await self._prefetch_speech(processor, job.script_path,
+                                                      prefetch_dir, selection)
+            processor.tts_provider = _PrefetchedTTSProvider(self.tts_provider, audio_files)
+
+            metrics.QUEUE_DEPTH.inc(queue='render_slot')
+            try:
+                await self._render_slots.acquire()
+            finally:
+                metrics.QUEUE_DEPTH.dec(queue='render_slot')
+            try:
+                job.emit({'type': 'stage', 'stage': 'render'})
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(
+                    self._render_executor, processor.process, job.script_path, selection
+                )
+            finally:
+                self._render_slots.release()
+        except asyncio.CancelledError:
+            # The executor thread cannot be interrupted, it stops at the next speech
+            job.cancel_event.set()
+            raise
+        finally:
+            await asyncio.to_thread(shutil.rmtree, prefetch_dir, True)
+
+    async def _prefetch_speech(self, processor: VideoProcessor, script_path: str,
+                               prefetch_dir: Path,
+                               selection: Optional[RenderSelection] = None) -> Dict[str, Path]:
+        """Synthesize every distinct speech of the (selected) script concurrently
+
+        With TTS_COALESCE the speeches of each section are first batched into
+        fewer requests, the sections still running concurrently.
+        """
+        script = await self._in_io(processor._parse_script, script_path)
+        sections = [
+            [speech['text'] for speech in section['speeches'] if speech['text']]
+            for i, section in enumerate(script['content'])
+            if selection is None or selection.matches(i, section)
+        ]
+        texts = list(dict.fromkeys(text for section in sections for text in section))
+
+        provider = self.tts_provider
+        if self.config.TTS_COALESCE:
+            provider = CoalescingTTSProvider(
+                self.tts_provider, prefetch_dir / 'coalesced',
+                max_chars=self.config.TTS_COALESCE_MAX_CHARS or None
+            )
+            await asyncio.gather(*(self._in_io(provider.prefetch, section, self.config.SPEECH_LANG)
+                                   for section in sections))
+
+        async def synthesize(index: int, text: str):
+            path = prefetch_dir / f'speech_{index}.{provider.audio_format.extension}'
+            ok = await self._in_io(provider.synthesize, text, path, self.config.SPEECH_LANG)
+            return text, path if ok else None
+
+        results = await asyncio.gather(*(synthesize(i, t) for i, t in enumerate(texts)))
+        return {text: path for text, path in results if path is not None}
+
+    async def aclose(self):
+        """Release the executors owned by the generator and write the trace"""
+        self._io_executor.shutdown(wait=False, cancel_futures=True)
+        if self._owns_render_executor:
+            self._render_executor.shutdown(wait=False, cancel_futures=True)
+        if self.config.TRACE_FILE:
+            tracing.export(Path(self.config.TRACE_FILE), self.config.TRACE_FORMAT)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
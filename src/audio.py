@@ -0,0 +1,103 @@
+from pathlib import Path
+from typing import List, Optional, Tuple, TYPE_CHECKING
+from .ffmpeg import run_ffmpeg
+
+if TYPE_CHECKING:
+    import numpy as np
+
+def decode_pcm(path: Path, rate: int) -> 'np.ndarray':
+    """Decode an audio file to mono float32 samples in [-1, 1] at `rate` Hz"""
+    import numpy as np
+
+    result = run_ffmpeg(['-i', path, '-f', 'f32le', '-acodec', 'pcm_f32le',
+                         '-ac', '1', '-ar', rate, 'pipe:1'])
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+def encode_pcm(samples: 'np.ndarray', rate: int, output_path: Path, sample_format: str = 's16le'):
+    """Encode mono float32 samples, the format is taken from the file extension
+
+    WAV files hold PCM in `sample_format` (s16le, s24le, s32le, f32le...).
+    """
+    import numpy as np
+
+    codec = ['-acodec', f'pcm_{sample_format}'] if Path(output_path).suffix == '.wav' else []
+    pcm = np.clip(samples, -1.0, 1.0).astype('<f4').tobytes()
+    run_ffmpeg(['-f', 'f32le', '-ar', rate, '-ac', '1', '-i', 'pipe:0', *codec, output_path],
+               input_bytes=pcm)
+
+def probe_sample_rate(path: Path) -> int:
+    """Sample rate of the audio stream of a file"""
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+    return ffmpeg_parse_infos(str(path))['audio_fps']
+
+def pcm_clip(samples: 'np.ndarray', rate: int):
+    """Mono moviepy AudioClip playing `samples` at their own rate
+
+    moviepy's AudioFileClip and AudioArrayClip always produce stereo frames,
+    this keeps a single channel so mixing works on half the data.
+    """
+    import numpy as np
+    from moviepy.audio.AudioClip import AudioClip
+
+    duration = len(samples) / rate
+    if not len(samples):
+        samples = np.zeros(1, dtype=np.float32)
+
+    def make_frame(t):
+        index = np.round(np.asarray(t) * rate).astype(int)
+        inside = (index >= 0) & (index < len(samples))
+        frame = np.where(inside, samples[np.clip(index, 0, len(samples) - 1)], 0.0)
+        return frame[..., None]
+
+    return AudioClip(make_frame, duration=duration, fps=rate)
+
+def find_silences(samples: 'np.ndarray', rate: int, threshold_db: float = -40.0,
+                  min_duration: float = 0.1, window: float = 0.01) -> List[Tuple[float, float]]:
+    """Return the (start, end) seconds of the stretches quieter than `threshold_db`
+
+    The level is measured as RMS over `window`-second frames, relative to
+    full scale. Leading and trailing silence is included.
+    """
+    import numpy as np
+
+    frame = max(1, int(rate * window))
+    frames = len(samples) // frame
+    if frames == 0:
+        return []
+    rms = np.sqrt(np.mean(samples[:frames * frame].reshape(frames, frame) ** 2, axis=1))
+    quiet = 20 * np.log10(np.maximum(rms, 1e-10)) < threshold_db
+
+    # Edges of the quiet runs
+    edges = np.diff(np.concatenate(([0], quiet.astype(np.int8), [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    return [(s * window, e * window) for s, e in zip(starts, ends)
+            if (e - s) * window >= min_duration]
+
+def split_points(silences: List[Tuple[float, float]], duration: float,
+                 weights: List[float], max_ratio: float = 3.0) -> Optional[List[Tuple[float, float]]]:
+    """Choose the gaps splitting an audio of `duration` into len(weights) pieces
+
+    The separators between the pieces are expected to be the longest interior
+    silences. `weights` are the expected relative lengths of the pieces (e.g.
+    character counts) and serve as a sanity check: returns the chosen (start,
+    end) gaps in order, or None when the audio cannot be split unambiguously
+    (too few gaps, or a piece more than `max_ratio` off its expected length).
+    """
+    pieces = len(weights)
+    if pieces <= 1:
+        return []
+    gaps = [g for g in silences if 0 < g[0] and g[1] < duration]
+    if len(gaps) < pieces - 1:
+        return None
+
+    chosen = sorted(sorted(gaps, key=lambda g: g[1] - g[0], reverse=True)[:pieces - 1])
+    bounds = [0.0] + [t for gap in chosen for t in gap] + [duration]
+    lengths = [end - start for start, end in zip(bounds[::2], bounds[1::2])]
+    voiced = sum(lengths)
+    total = float(sum(weights)) or 1.0
+    for length, weight in zip(lengths, weights):
+        expected = voiced * weight / total
+        if not expected / max_ratio <= length <= expected * max_ratio:
+            return None
+    return chosen
@@ -17,13 +17,17 @@ class ProcessorCallback:
             except Exception as e:
                 logging.error(f"Error in message callback: {str(e)}")
 
-    def update_progress(self, progress: float, status: str):
-        """Update progress using the callback if available"""
+    def update_progress(self, progress: float, status: str, **details):
+        """Update progress using the callback if available
+
+        `details` (stage, eta, speed...) are added to the event.
+        """
         if self.progress_callback:
             try:
                 self.progress_callback({
                     "value": progress,
-                    "status": status
+                    "status": status,
+                    **details
                 })
             except Exception as e:
                 logging.error(f"Error in progress callback: {str(e)}")
@@ -0,0 +1,93 @@
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+def fingerprint(*parts: Any) -> str:
+    """Stable hash of JSON-serializable parts (paths and dates as strings)"""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def file_fingerprint(path: Path) -> str:
+    """Hash of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class BuildGraph:
+    """Make-like record of the produced files and the inputs they were built from
+
+    Each node (e.g. `script:<post>` or `video:<script>`) stores the fingerprint
+    of its inputs and the files it produced. A node is fresh when the
+    fingerprint is unchanged and its outputs were not deleted or overwritten
+    since (e.g. by a script with the same title); fresh nodes are
+    skipped, stale ones rebuilt. Built and skipped nodes are counted per kind
+    (the part of the id before ':') for reporting.
+    """
+
+    def __init__(self, manifest_path: Path):
+        self.manifest_path = Path(manifest_path)
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.nodes: Dict[str, Dict] = self._load()
+        self.report: Dict[str, Dict[str, int]] = {}
+
+    def _load(self) -> Dict[str, Dict]:
+        if not self.manifest_path.exists():
+            return {}
+        try:
+            return json.loads(self.manifest_path.read_text(encoding='utf-8'))['nodes']
+        except (ValueError, KeyError) as e:
+            self.logger.warning(f"Ignoring unreadable build manifest {self.manifest_path}: {str(e)}")
+            return {}
+
+    @staticmethod
+    def _stamp(path: str) -> Optional[int]:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def is_fresh(self, node_id: str, node_fingerprint: str) -> bool:
+        node = self.nodes.get(node_id)
+        return (node is not None
+                and node['fingerprint'] == node_fingerprint
+                and all(self._stamp(output) == stamp and stamp is not None
+                        for output, stamp in node['outputs'].items()))
+
+    def outputs(self, node_id: str) -> List[str]:
+        return list(self.nodes.get(node_id, {}).get('outputs', {}))
+
+    def record(self, node_id: str, node_fingerprint: str, outputs: List[str]):
+        """Store a rebuilt node"""
+        self.nodes[node_id] = {
+            'fingerprint': node_fingerprint,
+            'outputs': {str(o): self._stamp(str(o)) for o in outputs}
+        }
+        self.count(node_id.split(':', 1)[0], built=True)
+
+    def skip(self, node_id: str):
+        """Count a fresh node that was not rebuilt"""
+        self.count(node_id.split(':', 1)[0], built=False)
+
+    def count(self, kind: str, built: bool, amount: int = 1):
+        stats = self.report.setdefault(kind, {'built': 0, 'skipped': 0})
+        stats['built' if built else 'skipped'] += amount
+
+    def merge_report(self, report: Optional[Dict[str, Dict[str, int]]]):
+        """Add counts reported by a render (possibly in another process)"""
+        for kind, stats in (report or {}).items():
+            self.count(kind, True, stats.get('built', 0))
+            self.count(kind, False, stats.get('skipped', 0))
+
+    def save(self):
+        """Write the manifest atomically"""
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.manifest_path.parent, suffix='.part')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'nodes': self.nodes}, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.manifest_path)
@@ -1,11 +1,18 @@
 #!/usr/bin/env python3
+import argparse
 import cmd
+import contextlib
+import glob
+import json
 import sys
 import os
-from datetime import datetime
-from typing import Optional
+import time
+from datetime import datetime, date
+from typing import Optional, List, Dict
 from pathlib import Path
 from .video_generator import VideoGenerator
+from .processors import RenderSelection
+from . import metrics, profiling, tracing
 
 class VideoGeneratorCLI(cmd.Cmd):
     intro = f"""\033[1m{'-'*50}
@@ -20,12 +27,15 @@ Type 'help' o '?' for command list.
         self.generator = VideoGenerator()
         self.generator.set_callbacks(
             message_callback=lambda msg: print(msg, file=self.stdout),
-            progress_callback=lambda info: print(
-                f"Progress: {info['value']}% - {info['status']}",
-                file=self.stdout
-            )
+            progress_callback=self._print_progress
         )
 
+    def _print_progress(self, info: dict) -> None:
+        line = f"Progress: {info['value']}% - {info['status']}"
+        if info.get('eta') is not None:
+            line += f" (ETA {info['eta']:.0f}s)"
+        print(line, file=self.stdout)
+
     def do_script(self, arg: str) -> None:
         """Generating script from recent posts"""
         try:
@@ -140,8 +150,246 @@ Type 'help' o '?' for command list.
         except Exception as e:
             print(f"\n⚠️ Error while cleaning: {str(e)}", file=self.stdout)
 
-def main():
+def _parse_date(value: str) -> date:
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date '{value}', expected YYYY-MM-DD")
+
+def _parse_indices(value: str) -> List[int]:
+    """Parse section indices such as 0,2,4-6"""
+    indices = []
+    try:
+        for part in value.split(','):
+            first, _, last = part.partition('-')
+            indices.extend(range(int(first), int(last or first) + 1))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid section list '{value}', expected e.g. 0,2,4-6")
+    return indices
+
+def _parse_time(value: str) -> float:
+    try:
+        return RenderSelection.parse_time(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid time '{value}', expected SS, MM:SS or HH:MM:SS")
+
+def _parse_aspects(value: str) -> List[str]:
+    """Parse aspect ratios such as 16:9,9:16"""
+    aspects = [part.strip() for part in value.split(',') if part.strip()]
+    for aspect in aspects:
+        w, _, h = aspect.partition(':')
+        if not (w.isdigit() and h.isdigit() and int(w) and int(h)):
+            raise argparse.ArgumentTypeError(f"invalid aspect ratio '{aspect}', expected e.g. 16:9,9:16")
+    return aspects
+
+def build_parser() -> argparse.ArgumentParser:
+    """Parser of the non-interactive subcommands"""
+    from .config import Config
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--since', type=_parse_date, metavar='YYYY-MM-DD',
+                        help='only posts (or scripts) dated on or after this day')
+    common.add_argument('--limit', type=int, metavar='N',
+                        help='maximum number of posts (or scripts) to process')
+    common.add_argument('--json', action='store_true',
+                        help='print machine-readable results on stdout')
+    common.add_argument('--incremental', action='store_true',
+                        help='skip scripts, slides, sections and videos whose inputs are unchanged')
+    common.add_argument('--trace', metavar='FILE',
+                        help='write a trace of the pipeline stages to FILE (default: TRACE_FILE)')
+    common.add_argument('--trace-format', choices=tracing.FORMATS,
+                        help='trace file format, Chrome trace events or OTLP JSON (default: TRACE_FORMAT)')
+    common.add_argument('--metrics-file', metavar='FILE',
+                        help='write Prometheus metrics to FILE, e.g. for the node_exporter '
+                             'textfile collector (default: METRICS_FILE)')
+    common.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help='serve Prometheus metrics on http://localhost:PORT/metrics '
+                             'while the command runs (default: METRICS_PORT)')
+    common.add_argument('--profile-cpu', nargs='?', const='', metavar='DIR',
+                        help='write CPU profiles of every render (flamegraph stacks and pstats) '
+                             'to DIR (default: PROFILE_DIR, else OUTPUT_DIR/profiles)')
+    common.add_argument('--profile-workers', action='store_true',
+                        help='profile the worker processes of parallel renders too')
+
+    render = argparse.ArgumentParser(add_help=False)
+    render.add_argument('--jobs', '-j', type=int, default=1, metavar='N',
+                        help='videos rendered concurrently (0 = one per CPU)')
+    render.add_argument('--quality', choices=list(Config().QUALITY_PRESETS),
+                        help='encoder preset and bitrate')
+    render.add_argument('--profile', choices=list(Config().render_profiles),
+                        help='render profile, "draft" for fast previews')
+    render.add_argument('--aspects', type=_parse_aspects, metavar='LIST',
+                        help='aspect ratios rendered from one narration, e.g. 16:9,9:16')
+
+    parser = argparse.ArgumentParser(
+        prog='md2video',
+        description='Convert Markdown posts into narrated videos. '
+                    'Run without arguments for the interactive shell.'
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('script', parents=[common],
+                        help='generate XML scripts from recent posts')
+    render_cmd = commands.add_parser('render', parents=[common, render],
+                                     help='render videos from existing XML scripts')
+    render_cmd.add_argument('paths', nargs='+',
+                            help='script files, directories or glob patterns')
+    partial = render_cmd.add_argument_group('partial render')
+    partial.add_argument('--sections', type=_parse_indices, default=[], metavar='LIST',
+                         help='only these sections, by index (0 = intro), e.g. 0,2,4-6')
+    partial.add_argument('--heading', action='append', default=[], metavar='TEXT',
+                         help='only the section with this heading (repeatable)')
+    partial.add_argument('--start', type=_parse_time, metavar='TIME',
+                         help='start of the time range, SS, MM:SS or HH:MM:SS')
+    partial.add_argument('--end', type=_parse_time, metavar='TIME',
+                         help='end of the time range')
+    commands.add_parser('generate', parents=[common, render],
+                        help='generate scripts and videos from recent posts')
+    return parser
+
+class BatchCLI:
+    """Non-interactive commands, meant to be driven by cron, CI or other schedulers"""
+
+    def __init__(self, args: argparse.Namespace, stdout=None):
+        self.args = args
+        self.stdout = stdout or sys.stdout
+        self.generator = VideoGenerator()
+        if args.incremental:
+            self.generator.set_incremental(True)
+        if getattr(args, 'aspects', None):
+            self.generator.video_processor.set_aspects(args.aspects)
+        if getattr(args, 'metrics_file', None):
+            self.generator.metrics_file = args.metrics_file
+        metrics_port = getattr(args, 'metrics_port', None) or self.generator.config.METRICS_PORT
+        self.metrics_server = metrics.serve(metrics_port) if metrics_port else None
+        trace_file = getattr(args, 'trace', None)
+        trace_format = getattr(args, 'trace_format', None)
+        if trace_file or (trace_format and self.generator.trace_file):
+            self.generator.set_tracing(trace_file or self.generator.trace_file, trace_format)
+        profile_dir = getattr(args, 'profile_cpu', None)
+        if profile_dir is not None:
+            config = self.generator.config
+            self.generator.set_profiling(
+                profile_dir or config.PROFILE_DIR or str(config.OUTPUT_DIR / 'profiles'),
+                args.profile_workers or config.PROFILE_WORKERS
+            )
+        if not args.json:
+            self.generator.set_callbacks(
+                message_callback=lambda msg: print(msg, file=sys.stderr)
+            )
+
+    def run(self) -> int:
+        """Run the selected command, returns the process exit code"""
+        start = time.perf_counter()
+        payload = {'command': self.args.command, 'ok': True, 'results': []}
+        # moviepy reports on stdout: keep it clean for the JSON document
+        quiet = contextlib.redirect_stdout(sys.stderr) if self.args.json else contextlib.nullcontext()
+        try:
+            with quiet, tracing.span('command', command=self.args.command):
+                payload['results'] = getattr(self, f"_{self.args.command}")()
+            payload['ok'] = all(r.get('status', 'ok') in ('ok', 'skipped') for r in payload['results'])
+        except Exception as e:
+            payload['ok'] = False
+            payload['error'] = str(e)
+        finally:
+            self.generator.cleanup()
+        if self.generator.trace_file is not None:
+            # Written by the cleanup
+            payload['trace'] = str(self.generator.trace_file)
+        if self.generator.metrics_file:
+            metrics.write_textfile(Path(self.generator.metrics_file))
+            payload['metrics'] = str(self.generator.metrics_file)
+        if self.metrics_server is not None:
+            self.metrics_server.shutdown()
+            self.metrics_server.server_close()
+        if profiling.enabled():
+            payload['profiles'] = str(profiling.directory())
+        if self.generator.build_report:
+            payload['build'] = self.generator.build_report
+        payload['seconds'] = round(time.perf_counter() - start, 3)
+
+        self._report(payload)
+        return 0 if payload['ok'] else 1
+
+    def _script(self) -> List[Dict]:
+        return self.generator.generate_scripts(self.args.limit, self.args.since)
+
+    def _render(self) -> List[Dict]:
+        scripts = self._resolve_scripts(self.args.paths)
+        return self.generator.render_scripts(
+            [str(path) for path in scripts], self._jobs(), self.args.quality,
+            self.args.profile, self._selection()
+        )
+
+    def _generate(self) -> List[Dict]:
+        scripts = self.generator.generate_scripts(self.args.limit, self.args.since)
+        rendered = self.generator.render_scripts(
+            [item['script_file'] for item in scripts], self._jobs(),
+            self.args.quality, self.args.profile
+        )
+        return [{'title': item['title'], 'url': item['url'], **result}
+                for item, result in zip(scripts, rendered)]
+
+    def _selection(self) -> Optional[RenderSelection]:
+        selection = RenderSelection(self.args.sections, self.args.heading,
+                                    self.args.start, self.args.end)
+        return selection if selection != RenderSelection() else None
+
+    def _jobs(self) -> int:
+        return self.args.jobs if self.args.jobs > 0 else (os.cpu_count() or 1)
+
+    def _resolve_scripts(self, patterns: List[str]) -> List[Path]:
+        """Expand files, directories and glob patterns, keeping the given order"""
+        scripts = []
+        for pattern in patterns:
+            path = Path(pattern)
+            if path.is_dir():
+                matches = sorted(path.glob('*.xml'))
+            elif glob.has_magic(pattern):
+                matches = sorted(Path(m) for m in glob.glob(pattern, recursive=True))
+            else:
+                matches = [path]
+            scripts.extend(m for m in matches if m not in scripts)
+
+        if self.args.since is not None:
+            scripts = [s for s in scripts if s.exists() and
+                       date.fromtimestamp(s.stat().st_mtime) >= self.args.since]
+        if self.args.limit is not None:
+            scripts = scripts[:self.args.limit]
+        return scripts
+
+    def _report(self, payload: Dict):
+        if self.args.json:
+            print(json.dumps(payload, indent=2, default=str), file=self.stdout)
+            return
+
+        if payload.get('error'):
+            print(f"❌ Error: {payload['error']}", file=self.stdout)
+        for item in payload['results']:
+            status = {'ok': '✅', 'skipped': '⏭ '}.get(item.get('status', 'ok'), '❌')
+            print(f"{status} {item.get('title') or item.get('script_file')}", file=self.stdout)
+            for key, label in (('script_file', '📝 Script'), ('video_file', '🎥 Video'),
+                               ('error', 'Error'), ('seconds', '⏱  Seconds')):
+                if item.get(key) is not None:
+                    print(f"   {label}: {item[key]}", file=self.stdout)
+        for stage, stats in payload.get('build', {}).items():
+            print(f"   {stage}: {stats['built']} built, {stats['skipped']} skipped", file=self.stdout)
+        print(f"\nDone: {len(payload['results'])} item(s) in {payload['seconds']}s", file=self.stdout)
+
+def run_batch(argv: List[str], stdout=None) -> int:
+    """Parse argv and run a non-interactive command"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    start, end = getattr(args, 'start', None), getattr(args, 'end', None)
+    if end is not None and end <= (start or 0.0):
+        parser.error(f"--end ({end:g}s) must come after --start ({start or 0.0:g}s)")
+    return BatchCLI(args, stdout).run()
+
+def main(argv: Optional[List[str]] = None):
     """Main entry point"""
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        sys.exit(run_batch(argv))
+
     cli = None
     try:
         cli = VideoGeneratorCLI()
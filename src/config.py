@@ -1,9 +1,38 @@
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+from dataclasses import dataclass, replace
 import os
 import logging
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class RenderProfile:
+    """Output settings of a render
+
+    All profiles share the same layout: sizes and offsets are expressed for
+    VIDEO_WIDTH x VIDEO_HEIGHT and multiplied by `scale`, so a reduced
+    resolution draft looks like the final video.
+    """
+    name: str
+    width: int
+    height: int
+    fps: int
+    codec: str
+    preset: str
+    bitrate: str
+    scale: float = 1.0
+    effects: bool = True     # False renders plain cuts without animations
+    tts_cache: bool = False  # Reuse speech synthesized by previous renders
+    aspect: str = ''         # Set on outputs reframed to another ratio, e.g. 9x16
+    still: bool = False      # Still-content encoding: repeated frames dropped, keyframes on slides
+    crf: Optional[int] = None  # Quality-targeted rate control, `bitrate` becomes a cap
+
+    def scaled(self, size: float) -> int:
+        """Scale a size expressed for the full resolution layout"""
+        return max(1, round(size * self.scale))
+
 class Config:
     """Configuration management"""
     _instance = None
@@ -28,13 +57,13 @@ class Config:
         self.ASSETS_DIR = self.OUTPUT_DIR / 'assets'
 
         # Log path directories are initialized
-        logging.info(f"=== Config Debug Info ===")
-        logging.info(f"CONTENT_DIR from env: {os.getenv('CONTENT_DIR')}")
-        logging.info(f"SCRIPT_DIR from env: {os.getenv('SCRIPT_DIR')}")
-        logging.info(f"OUTPUT_DIR from env: {os.getenv('OUTPUT_DIR')}")
-        logging.info(f"Resolved CONTENT_DIR: {self.CONTENT_DIR}")
-        logging.info(f"Resolved SCRIPT_DIR: {self.SCRIPT_DIR}")
-        logging.info(f"Resolved OUTPUT_DIR: {self.OUTPUT_DIR}")
+        logger.debug(f"=== Config Debug Info ===")
+        logger.debug(f"CONTENT_DIR from env: {os.getenv('CONTENT_DIR')}")
+        logger.debug(f"SCRIPT_DIR from env: {os.getenv('SCRIPT_DIR')}")
+        logger.debug(f"OUTPUT_DIR from env: {os.getenv('OUTPUT_DIR')}")
+        logger.debug(f"Resolved CONTENT_DIR: {self.CONTENT_DIR}")
+        logger.debug(f"Resolved SCRIPT_DIR: {self.SCRIPT_DIR}")
+        logger.debug(f"Resolved OUTPUT_DIR: {self.OUTPUT_DIR}")
 
         # Video settings
         self.VIDEO_WIDTH = int(os.getenv('VIDEO_WIDTH', '1920'))
@@ -42,15 +71,81 @@ class Config:
         self.VIDEO_FPS = int(os.getenv('VIDEO_FPS', '24'))
         self.VIDEO_BITRATE = os.getenv('VIDEO_BITRATE', '4000k')
         self.VIDEO_CODEC = os.getenv('VIDEO_CODEC', 'libx264')
+        # Still-content encoding (variable frame rate, keyframes at slide changes, still-image
+        # tune) and constant quality (CRF, empty = constant bitrate), per render profile
+        self.VIDEO_STILL = os.getenv('VIDEO_STILL', 'false').lower() == 'true'
+        self.VIDEO_CRF = int(os.getenv('VIDEO_CRF')) if os.getenv('VIDEO_CRF') else None
+
+        # Encoder presets selectable per render (e.g. `md2video render --quality low`)
+        self.QUALITY_PRESETS = {
+            'low': {'preset': 'veryfast', 'bitrate': os.getenv('QUALITY_LOW_BITRATE', '1500k')},
+            'medium': {'preset': 'medium', 'bitrate': os.getenv('QUALITY_MEDIUM_BITRATE', '4000k')},
+            'high': {'preset': 'slow', 'bitrate': os.getenv('QUALITY_HIGH_BITRATE', '8000k')},
+        }
 
         # Audio settings
         self.AUDIO_FPS = int(os.getenv('AUDIO_FPS', '44100'))
         self.AUDIO_NBYTES = int(os.getenv('AUDIO_NBYTES', '2'))
-        self.AUDIO_CODEC = os.getenv('AUDIO_CODEC', 'libmp3lame')
         self.AUDIO_BITRATE = os.getenv('AUDIO_BITRATE', '192k')
         self.AUDIO_CHANNELS = int(os.getenv('AUDIO_CHANNELS', '2'))
         self.AUDIO_SAMPLE_FORMAT = os.getenv('AUDIO_SAMPLE_FORMAT', 's16le')
 
+        # Render profiles (e.g. `md2video render --profile draft`)
+        self.RENDER_PROFILE = os.getenv('RENDER_PROFILE', 'final')
+        self.DRAFT_SCALE = float(os.getenv('DRAFT_SCALE', '0.5'))
+        self.DRAFT_FPS = int(os.getenv('DRAFT_FPS', '10'))
+        self.DRAFT_PRESET = os.getenv('DRAFT_PRESET', 'ultrafast')
+        self.DRAFT_BITRATE = os.getenv('DRAFT_BITRATE', '1000k')
+        self.DRAFT_STILL = os.getenv('DRAFT_STILL', 'true').lower() == 'true'
+        self.DRAFT_CRF = int(os.getenv('DRAFT_CRF', '30')) if os.getenv('DRAFT_CRF', '30') else None
+        # Progressive output: off, hls (MPEG-TS segments) or fmp4 (CMAF segments), an HLS
+        # stream published section by section while the video renders
+        self.STREAM_FORMAT = os.getenv('STREAM_FORMAT', 'off').lower()
+        self.STREAM_SEGMENT_TIME = float(os.getenv('STREAM_SEGMENT_TIME', '4'))
+        # Extra renditions of the stream, HEIGHT:BITRATE pairs (e.g. 720:2500k,480:1000k)
+        self.STREAM_LADDER = os.getenv('STREAM_LADDER', '')
+        # Bounded-resource rendering: PIL sections are encoded in windows of at most
+        # RENDER_MAX_CLIPS speeches and released, so memory does not grow with the script
+        self.RENDER_BOUNDED = os.getenv('RENDER_BOUNDED', 'false').lower() == 'true'
+        self.RENDER_MAX_CLIPS = int(os.getenv('RENDER_MAX_CLIPS', '20'))
+        # Budgets checked at every rendering step (0 = unchecked); strict turns warnings into errors
+        self.RENDER_MAX_RSS_MB = int(os.getenv('RENDER_MAX_RSS_MB', '0'))
+        self.RENDER_MAX_OPEN_FILES = int(os.getenv('RENDER_MAX_OPEN_FILES', '0'))
+        self.RENDER_MAX_PROCESSES = int(os.getenv('RENDER_MAX_PROCESSES', '0'))
+        self.RENDER_BUDGET_STRICT = os.getenv('RENDER_BUDGET_STRICT', 'false').lower() == 'true'
+        # Prometheus metrics: textfile for the node_exporter collector (empty = off), HTTP port (0 = off)
+        self.METRICS_FILE = os.getenv('METRICS_FILE', '')
+        self.METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+        # Job progress: share of each stage (STAGE:WEIGHT pairs of sections, encode and
+        # finalize) and the least number of seconds between two progress events
+        self.PROGRESS_WEIGHTS = os.getenv('PROGRESS_WEIGHTS', '')
+        self.PROGRESS_INTERVAL = float(os.getenv('PROGRESS_INTERVAL', '1'))
+        # CPU profiles of every render (empty = off): sampled stacks per stage and pstats,
+        # seconds between samples, and whether worker processes are profiled too
+        self.PROFILE_DIR = os.getenv('PROFILE_DIR', '')
+        self.PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', '0.01'))
+        self.PROFILE_WORKERS = os.getenv('PROFILE_WORKERS', 'false').lower() == 'true'
+        # Stage tracing: file written when the generator is cleaned up (empty = off), chrome or otlp JSON
+        self.TRACE_FILE = os.getenv('TRACE_FILE', '')
+        self.TRACE_FORMAT = os.getenv('TRACE_FORMAT', 'chrome').lower()
+        # Aspect ratios rendered from one narration, e.g. "16:9,9:16" (empty = VIDEO_WIDTH:VIDEO_HEIGHT)
+        self.OUTPUT_ASPECTS = [a.strip() for a in os.getenv('OUTPUT_ASPECTS', '').split(',') if a.strip()]
+        self.TTS_CACHE_DIR = self.OUTPUT_DIR / 'cache' / 'tts'
+
+        # Batch the speeches of a section into fewer TTS requests (0 = provider limit)
+        self.TTS_COALESCE = os.getenv('TTS_COALESCE', 'false').lower() == 'true'
+        self.TTS_COALESCE_MAX_CHARS = int(os.getenv('TTS_COALESCE_MAX_CHARS', '0'))
+
+        # Intro/outro sections rendered once and spliced into every video
+        self.REUSE_BUMPERS = os.getenv('REUSE_BUMPERS', 'true').lower() == 'true'
+        self.BUMPER_CACHE_DIR = self.OUTPUT_DIR / 'cache' / 'bumpers'
+
+        # Incremental builds: skip posts, scripts, slides, sections and videos whose inputs are unchanged
+        self.INCREMENTAL_BUILDS = os.getenv('INCREMENTAL_BUILDS', 'false').lower() == 'true'
+        self.BUILD_MANIFEST = self.OUTPUT_DIR / 'build_manifest.json'
+        self.SEGMENT_CACHE_DIR = self.OUTPUT_DIR / 'cache' / 'segments'
+        self.SLIDE_CACHE_DIR = self.OUTPUT_DIR / 'cache' / 'slides'
+
         # Styling
         self.BGCOLOR = os.getenv('VIDEO_BGCOLOR', '#291d38')
         self.TEXT_COLOR = os.getenv('VIDEO_TEXT_COLOR', '#ffffff')
@@ -68,6 +163,9 @@ class Config:
         # Text settings
         self.TEXT_LINE_SPACING = float(os.getenv('TEXT_LINE_SPACING', '1.2'))
         self.TEXT_MARGIN = float(os.getenv('TEXT_MARGIN', '0.15'))
+        # 'pil' draws a slide image per speech; 'ass' burns the text as ASS subtitles
+        # over the section background with ffmpeg/libass; 'soft' muxes them as a subtitle track
+        self.TEXT_RENDERER = os.getenv('TEXT_RENDERER', 'pil').lower()
 
         # Video content
         self.INTRO_TEXT = os.getenv('INTRO_TEXT', 'Ciao a tutti e bentornati sul canale!')
@@ -95,14 +193,80 @@ class Config:
             self.TTS_PROVIDER = os.getenv('DEV_TTS_PROVIDER', 'gtts')
             self.SPEECH_LANG = os.getenv('DEV_TTS_LANG', 'it')
 
-        self._create_directories()
+    def ensure_directories(self):
+        """Create necessary directories
 
-    def _create_directories(self):
-        """Create necessary directories"""
+        Called by the stages that write to disk rather than at construction,
+        so that loading the configuration has no filesystem side effects.
+        """
         for dir_path in [self.CONTENT_DIR, self.SCRIPT_DIR, self.OUTPUT_DIR,
-                        self.TEMP_DIR, self.ASSETS_DIR]:
+                        self.TEMP_DIR, self.ASSETS_DIR, self.TTS_CACHE_DIR,
+                        self.BUMPER_CACHE_DIR]:
             dir_path.mkdir(parents=True, exist_ok=True)
 
+    @property
+    def render_profiles(self) -> Dict[str, RenderProfile]:
+        """Available render profiles by name"""
+        final = RenderProfile(
+            name='final',
+            width=self.VIDEO_WIDTH,
+            height=self.VIDEO_HEIGHT,
+            fps=self.VIDEO_FPS,
+            codec=self.VIDEO_CODEC,
+            preset='medium',
+            bitrate=self.VIDEO_BITRATE,
+            still=self.VIDEO_STILL,
+            crf=self.VIDEO_CRF
+        )
+        # Encoders need even dimensions
+        draft_width = int(self.VIDEO_WIDTH * self.DRAFT_SCALE) // 2 * 2
+        draft = replace(
+            final,
+            name='draft',
+            width=draft_width,
+            height=int(self.VIDEO_HEIGHT * self.DRAFT_SCALE) // 2 * 2,
+            fps=self.DRAFT_FPS,
+            preset=self.DRAFT_PRESET,
+            bitrate=self.DRAFT_BITRATE,
+            scale=draft_width / self.VIDEO_WIDTH,
+            effects=False,
+            tts_cache=True,
+            still=self.DRAFT_STILL,
+            crf=self.DRAFT_CRF
+        )
+        return {profile.name: profile for profile in (final, draft)}
+
+    def get_render_profile(self, name: Optional[str] = None) -> RenderProfile:
+        """Return a render profile, RENDER_PROFILE by default"""
+        name = name or self.RENDER_PROFILE
+        profiles = self.render_profiles
+        if name not in profiles:
+            raise ValueError(
+                f"Unknown render profile '{name}', expected one of: {', '.join(profiles)}"
+            )
+        return profiles[name]
+
+    def aspect_profile(self, profile: RenderProfile, aspect: str) -> RenderProfile:
+        """`profile` reframed to an aspect ratio given as W:H (e.g. 9:16)
+
+        The short side is kept, so fonts and margins keep their size. The
+        ratio of the profile itself returns it unchanged.
+        """
+        try:
+            w, h = (int(part) for part in aspect.split(':'))
+            if w <= 0 or h <= 0:
+                raise ValueError(aspect)
+        except ValueError:
+            raise ValueError(f"Invalid aspect ratio '{aspect}', expected W:H such as 9:16")
+        if w * profile.height == h * profile.width:
+            return profile
+
+        short = min(profile.width, profile.height)
+        width, height = (short * w / h, short) if w >= h else (short, short * h / w)
+        # Encoders need even dimensions
+        return replace(profile, width=int(width) // 2 * 2, height=int(height) // 2 * 2,
+                       aspect=f"{w}x{h}")
+
     @property
     def video_config(self) -> Dict[str, Any]:
         """Returns the configuration for video"""
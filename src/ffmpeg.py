@@ -0,0 +1,85 @@
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import logging
+import subprocess
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+def ffmpeg_binary() -> str:
+    """The ffmpeg executable used by moviepy (FFMPEG_BINARY or the imageio-ffmpeg build)"""
+    from moviepy.config import get_setting
+    return get_setting("FFMPEG_BINARY")
+
+def probe_duration(path: Path) -> float:
+    """Duration in seconds of a media file"""
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+    return ffmpeg_parse_infos(str(path))['duration']
+
+def run_ffmpeg(args: List[str], input_bytes: Optional[bytes] = None,
+               progress: Optional[Callable[[Dict[str, str]], None]] = None) -> subprocess.CompletedProcess:
+    """Run ffmpeg with the given arguments, raising RuntimeError on failure
+
+    `input_bytes` is fed to stdin (for `-i pipe:0`); stdout is returned as bytes.
+    With `progress`, stdout carries the `-progress` reports instead: each
+    block of key=value pairs (out_time_us, frame, speed...) is passed to it.
+    """
+    reports = ['-progress', 'pipe:1', '-nostats'] if progress is not None else []
+    cmd = [*_base_cmd(reports), *map(str, args)]
+    logger.debug(f"Running: {' '.join(cmd)}")
+    if progress is not None:
+        result = _run_with_progress(cmd, input_bytes, progress)
+    else:
+        result = subprocess.run(cmd, input=input_bytes, capture_output=True,
+                                stdin=subprocess.DEVNULL if input_bytes is None else None)
+    if result.returncode != 0:
+        stderr = result.stderr.decode('utf-8', 'replace').strip()
+        raise RuntimeError(f"ffmpeg failed ({result.returncode}): {stderr[-500:]}")
+    return result
+
+def _base_cmd(extra: List[str]) -> List[str]:
+    """The ffmpeg invocation and global options that precede the arguments"""
+    return [ffmpeg_binary(), '-y', '-hide_banner', '-loglevel', 'error', *extra]
+
+def _run_with_progress(cmd: List[str], input_bytes: Optional[bytes],
+                       progress: Callable[[Dict[str, str]], None]) -> subprocess.CompletedProcess:
+    # stderr goes to a file: a full pipe would block ffmpeg while stdout is read
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr,
+                                   stdin=subprocess.DEVNULL if input_bytes is None else subprocess.PIPE)
+        if input_bytes is not None:
+            def feed():
+                with process.stdin:
+                    process.stdin.write(input_bytes)
+            threading.Thread(target=feed, daemon=True).start()
+        block: Dict[str, str] = {}
+        for line in process.stdout:
+            key, _, value = line.decode('utf-8', 'replace').strip().partition('=')
+            block[key] = value
+            if key == 'progress':
+                try:
+                    progress(block)
+                except Exception as e:
+                    logger.debug(f"Error in ffmpeg progress callback: {str(e)}")
+                block = {}
+        process.stdout.close()
+        returncode = process.wait()
+        stderr.seek(0)
+        return subprocess.CompletedProcess(cmd, returncode, b'', stderr.read())
+
+def concat_copy(inputs: List[Path], output: Path):
+    """Join encoded segments with the concat demuxer, without re-encoding
+
+    All inputs must share codecs, resolution, frame rate and audio format.
+    Every stream is kept, subtitle tracks included.
+    """
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as listing:
+        for path in inputs:
+            escaped = str(Path(path).resolve()).replace("'", "'\\''")
+            listing.write(f"file '{escaped}'\n")
+    try:
+        run_ffmpeg(['-f', 'concat', '-safe', '0', '-i', listing.name,
+                    '-map', '0', '-c', 'copy', '-movflags', '+faststart', output])
+    finally:
+        Path(listing.name).unlink(missing_ok=True)
@@ -0,0 +1,247 @@
+"""Prometheus metrics of the pipeline
+
+Metrics are always recorded, at the cost of a lock and a dict update, and
+exported on demand in the Prometheus text format: `write_textfile()` for the
+node_exporter textfile collector (METRICS_FILE), `serve()` for an HTTP
+endpoint scraped directly (METRICS_PORT). Worker processes send what they
+recorded back with the job result, see `collect()` and `Registry.merge()`.
+"""
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple, TYPE_CHECKING
+import logging
+import os
+import threading
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Seconds, for request latencies (shared with the TTS latency histograms)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Metric:
+    """A metric family: one value per combination of label values"""
+    kind = 'untyped'
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labels) or set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def _selector(self, key: Tuple[str, ...], extra: str = '') -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labels, key)]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+    def value(self, **labels):
+        """Current value for these labels (None when never recorded)"""
+        with self._lock:
+            return self._values.get(self._key(labels))
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{self._selector(key)} {_format(value)}"
+                    for key, value in sorted(self._values.items())]
+
+    def collect(self) -> Dict:
+        """Take the recorded values, e.g. to send them from a worker process"""
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values: Dict):
+        with self._lock:
+            for key, value in values.items():
+                self._values[key] = self._values.get(key, 0) + value
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    """A value that goes up and down, such as a queue depth"""
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def collect(self) -> Dict:
+        # The current state of this process, meaningless once sent to another one
+        return {}
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip([*self.buckets, float('inf')], counts):
+                cumulative += count
+                le = f'le="{_format(bound)}"'
+                lines.append(f"{self.name}_bucket{self._selector(key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._selector(key)} {_format(total)}")
+            lines.append(f"{self.name}_count{self._selector(key)} {cumulative}")
+        return lines
+
+    def merge(self, values: Dict):
+        with self._lock:
+            for key, (counts, total) in values.items():
+                current, current_total = self._values.get(key) or ([0] * len(counts), 0.0)
+                self._values[key] = ([a + b for a, b in zip(current, counts)], current_total + total)
+
+class Registry:
+    """The metrics of the process, by name"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def exposition(self) -> str:
+        """All metrics in the Prometheus text format"""
+        lines = []
+        for metric in self.metrics.values():
+            lines += [f"# HELP {metric.name} {metric.help}", f"# TYPE {metric.name} {metric.kind}"]
+            lines += metric.samples()
+        return '\n'.join(lines) + '\n'
+
+    def collect(self) -> Dict[str, Dict]:
+        return {name: values for name, metric in self.metrics.items()
+                if (values := metric.collect())}
+
+    def merge(self, snapshot: Dict[str, Dict]):
+        """Add the values collected in another process"""
+        for name, values in snapshot.items():
+            self.metrics[name].merge(values)
+
+REGISTRY = Registry()
+
+VIDEOS_RENDERED = REGISTRY.counter(
+    'md2video_videos_rendered_total', 'Videos rendered, by render profile and outcome', ('profile', 'status'))
+VIDEO_SECONDS = REGISTRY.counter(
+    'md2video_video_seconds_total', 'Seconds of video rendered', ('profile',))
+RENDER_SECONDS = REGISTRY.histogram(
+    'md2video_render_duration_seconds', 'Wall time of a render job', ('profile',),
+    buckets=(5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600))
+ENCODE_REALTIME = REGISTRY.histogram(
+    'md2video_encode_realtime_factor', 'Seconds of video encoded per second of wall time',
+    ('profile', 'renderer'), buckets=(0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128))
+JOB_PEAK_RSS = REGISTRY.histogram(
+    'md2video_job_peak_rss_megabytes', 'Peak resident memory of render jobs', ('profile',),
+    buckets=(128, 256, 512, 1024, 2048, 4096, 8192))
+TTS_REQUESTS = REGISTRY.counter(
+    'md2video_tts_requests_total', 'TTS requests, by provider and outcome (ok or error)',
+    ('provider', 'outcome'))
+TTS_LATENCY = REGISTRY.histogram(
+    'md2video_tts_request_duration_seconds', 'Latency of successful TTS requests', ('provider',))
+TTS_EVENTS = REGISTRY.counter(
+    'md2video_tts_events_total', 'Hedged requests, hedge wins, timeouts and failovers', ('event',))
+CACHE_LOOKUPS = REGISTRY.counter(
+    'md2video_cache_lookups_total', 'Cache lookups (speech audio, slides, segments), by result',
+    ('cache', 'result'))
+QUEUE_DEPTH = REGISTRY.gauge(
+    'md2video_queue_depth', 'Work waiting: scripts of a batch (batch), jobs waiting for a render '
+    'slot (render_slot), TTS requests waiting for the concurrency limiter (tts)', ('queue',))
+POSTS_SCANNED = REGISTRY.counter(
+    'md2video_posts_scanned_total', 'Markdown posts read from the content directory')
+SCRIPTS_WRITTEN = REGISTRY.counter(
+    'md2video_scripts_written_total', 'XML scripts written')
+SCRIPT_BYTES = REGISTRY.counter(
+    'md2video_script_bytes_total', 'Bytes of XML scripts written')
+
+def collect() -> Dict[str, Dict]:
+    """Take the values recorded so far, e.g. to send them from a worker process"""
+    return REGISTRY.collect()
+
+def write_textfile(path: Path):
+    """Write the metrics for the node_exporter textfile collector (atomically)"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(f".{path.name}.{os.getpid()}")
+    partial.write_text(REGISTRY.exposition(), encoding='utf-8')
+    os.replace(partial, path)
+
+def serve(port: int, host: str = '') -> 'ThreadingHTTPServer':
+    """Serve /metrics on `port` from a daemon thread (0 picks a free port)"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = REGISTRY.exposition().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='md2video-metrics', daemon=True).start()
+    logger.info(f"Serving metrics on port {server.server_address[1]}")
+    return server
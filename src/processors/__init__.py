@@ -1,5 +1,5 @@
 from .blog_processor import BlogProcessor
 from .script_processor import ScriptProcessor
-from .video_processor import VideoProcessor
+from .video_processor import VideoProcessor, RenderCancelled, RenderSelection
 
-__all__ = ['BlogProcessor', 'ScriptProcessor', 'VideoProcessor']
\ No newline at end of file
+__all__ = ['BlogProcessor', 'ScriptProcessor', 'VideoProcessor', 'RenderCancelled', 'RenderSelection']
\ No newline at end of file
@@ -1,16 +1,17 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 import frontmatter
-from datetime import datetime
+from datetime import datetime, date
 from pathlib import Path
 import re
 from ..base_processor import BaseProcessor
+from .. import metrics, tracing
 import logging
 
 class BlogProcessor(BaseProcessor):
     """Processor for blog posts"""
 
-    def process(self, num_posts: int = None) -> List[Dict]:
-        """Retrieve and process the most recent posts"""
+    def process(self, num_posts: int = None, since: Optional[date] = None) -> List[Dict]:
+        """Retrieve and process the most recent posts, optionally only those dated on or after `since`"""
         if num_posts is None:
             num_posts = self.config.NUM_POSTS
 
@@ -21,14 +22,20 @@ class BlogProcessor(BaseProcessor):
             content_path = Path(self.config.CONTENT_DIR)
 
             # Collect all .md files recursively
-            for md_file in content_path.rglob('*.md'):
-                post = frontmatter.load(md_file)
-                md_files.append({
-                    'path': md_file,
-                    'date': post.get('date', datetime.min),
-                    'metadata': post.metadata,
-                    'content': post.content
-                })
+            with tracing.span('scan', directory=str(content_path)) as scan:
+                for md_file in content_path.rglob('*.md'):
+                    post = frontmatter.load(md_file)
+                    md_files.append({
+                        'path': md_file,
+                        'date': post.get('date', datetime.min),
+                        'metadata': post.metadata,
+                        'content': post.content
+                    })
+                scan.set(posts=len(md_files))
+            metrics.POSTS_SCANNED.inc(len(md_files))
+
+            if since is not None:
+                md_files = [f for f in md_files if self._as_date(f['date']) >= since]
 
             # Sort by date descending
             md_files.sort(key=lambda x: x['date'], reverse=True)
@@ -45,14 +52,29 @@ class BlogProcessor(BaseProcessor):
             self.logger.error(f"Error processing blog posts: {str(e)}")
             raise
 
+    @staticmethod
+    def _as_date(value) -> date:
+        """Normalize a front matter date (date, datetime or ISO string) to a date"""
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        try:
+            return date.fromisoformat(str(value)[:10])
+        except ValueError:
+            return date.min
+
     def _process_post(self, file_data: Dict) -> Dict:
         """Process a single post"""
         try:
-            sections = self._parse_content(file_data['content'])
+            with tracing.span('parse', source=str(file_data['path']), chars=len(file_data['content'])) as parse:
+                sections = self._parse_content(file_data['content'])
+                parse.set(sections=len(sections))
 
             return {
                 'title': file_data['metadata'].get('title', ''),
                 'url': file_data['metadata'].get('url', ''),
+                'source': str(file_data['path']),
                 'date': file_data['date'].strftime('%Y-%m-%d'),
                 'content': file_data['content'],
                 'sections': sections
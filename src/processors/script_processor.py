@@ -6,6 +6,7 @@ import re
 import os
 import emoji
 from ..base_processor import BaseProcessor
+from .. import metrics, tracing
 import logging
 
 class ScriptProcessor(BaseProcessor):
@@ -58,6 +59,7 @@ class ScriptProcessor(BaseProcessor):
         """Save the script to a file"""
         filename = f"script_{title[:30]}_{datetime.now():%Y%m%d_%H%M%S}.xml"
         filepath = Path(self.config.SCRIPT_DIR) / filename
+        self.config.ensure_directories()
 
         self.logger.info(f"=== Script Debug Info ===")
         self.logger.info(f"Config SCRIPT_DIR: {self.config.SCRIPT_DIR}")
@@ -67,8 +69,12 @@ class ScriptProcessor(BaseProcessor):
         self.logger.info(f"SCRIPT_DIR is writable: {os.access(self.config.SCRIPT_DIR, os.W_OK)}")
 
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(xml_str)
+            with tracing.span('script_write', file=str(filepath)) as write:
+                with open(filepath, 'w', encoding='utf-8') as f:
+                    f.write(xml_str)
+                write.set_file(filepath)
+            metrics.SCRIPTS_WRITTEN.inc()
+            metrics.SCRIPT_BYTES.inc(filepath.stat().st_size)
             self.logger.info(f"Script successfully saved to: {filepath}")
             self.logger.info(f"File exists after save: {filepath.exists()}")
         except Exception as e:
@@ -1,12 +1,101 @@
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple, Union, TYPE_CHECKING
+from dataclasses import dataclass, field, asdict
+from concurrent.futures import Future, ThreadPoolExecutor
 from PIL import Image, ImageDraw, ImageFont
-from moviepy.editor import *
 from pathlib import Path
+import copy
+import gc
+import math
 import os
+import shutil
+import tempfile
+import threading
+import time
 import xml.etree.ElementTree as ET
 from ..base_processor import BaseProcessor
+from ..ffmpeg import concat_copy, probe_duration, run_ffmpeg
+from ..audio import decode_pcm, encode_pcm, pcm_clip, probe_sample_rate
+from ..subtitles import AssDocument, ass_filter
+from ..streaming import HlsWriter, bits_per_second, parse_ladder
+from ..resources import ResourceBudget
+from ..progress import JobProgress, ffmpeg_reporter, moviepy_logger, parse_weights
+from .. import metrics, profiling, tracing
+from ..build_graph import fingerprint, file_fingerprint
+from ..config import RenderProfile
 import logging
-from ..tts import EnhancedTTSFactory
+from ..tts import EnhancedTTSFactory, TTSProvider, CachedTTSProvider, CoalescingTTSProvider
+
+if TYPE_CHECKING:
+    # moviepy pulls in numpy, imageio and the ffmpeg probing: it is only
+    # imported by the methods that actually render
+    from moviepy.editor import AudioClip, VideoClip
+
+class RenderCancelled(Exception):
+    """Raised when a render is cancelled through VideoProcessor.cancel_event"""
+
+@dataclass
+class RenderSelection:
+    """Part of a script to render
+
+    Sections are picked by index (0 is the intro) or by heading; with neither,
+    every section is kept. `start`/`end` (seconds) then cut a time range out of
+    the timeline of the kept sections, which is the full video timeline when
+    no section is picked.
+    """
+    sections: List[int] = field(default_factory=list)
+    headings: List[str] = field(default_factory=list)
+    start: Optional[float] = None
+    end: Optional[float] = None
+
+    def __post_init__(self):
+        if self.start is not None and self.start < 0:
+            raise ValueError(f"Start of the time range must not be negative, got {self.start:g}")
+        if self.end is not None and self.end <= (self.start or 0.0):
+            raise ValueError(f"End of the time range ({self.end:g}s) must come after "
+                             f"its start ({self.start or 0.0:g}s)")
+
+    @property
+    def has_time_range(self) -> bool:
+        return self.start is not None or self.end is not None
+
+    def matches(self, index: int, section: Dict) -> bool:
+        """Whether a section is part of the selection"""
+        if not self.sections and not self.headings:
+            return True
+        headings = {heading.casefold() for heading in self.headings}
+        return index in self.sections or (section.get('heading') or '').casefold() in headings
+
+    def clip_cues(self, cues: List[Dict], offset: float) -> Tuple[List[Dict], float]:
+        """Keep the cues overlapping the time range
+
+        `offset` is the timeline position of the first cue. Cues crossing a
+        boundary get a `trim` (start, end) relative to the cue. Returns the
+        kept cues and the position after the last one.
+        """
+        start = self.start or 0.0
+        kept = []
+        for cue in cues:
+            cue_start, cue_end = offset, offset + cue['duration']
+            offset = cue_end
+            low = max(cue_start, start)
+            high = cue_end if self.end is None else min(cue_end, self.end)
+            if high <= low:
+                continue
+            if low > cue_start or high < cue_end:
+                cue = {**cue, 'trim': (low - cue_start, high - cue_start)}
+            kept.append(cue)
+        return kept, offset
+
+    @staticmethod
+    def parse_time(value: str) -> float:
+        """Parse seconds given as SS, MM:SS or HH:MM:SS (fractions allowed, not negative)"""
+        seconds = 0.0
+        for part in str(value).split(':'):
+            number = float(part)
+            if number < 0:
+                raise ValueError(f"negative time '{value}'")
+            seconds = seconds * 60 + number
+        return seconds
 
 class VideoEffect:
     """Strategy pattern for video effects"""
@@ -60,56 +149,415 @@ class VideoProcessor(BaseProcessor):
 
     def __init__(self):
         super().__init__()
-        # Initialize the TTS provider through the factory
-        self.tts_provider = EnhancedTTSFactory.create_provider()
+        # The TTS provider is created through the factory on first use
+        self._tts_provider: Optional[TTSProvider] = None
+        self.quality: Optional[str] = None
+        self.profile = self.config.get_render_profile()
+        # Per-job scratch directory below TEMP_DIR, so concurrent renders never collide
+        self.temp_dir: Optional[Path] = None
+        # Set by the caller (e.g. the asyncio facade) to stop a render between speeches
+        self.cancel_event: Optional[threading.Event] = None
+        # Reuse cached speech, slides and section segments whose inputs are unchanged
+        self.incremental = self.config.INCREMENTAL_BUILDS
+        # Built/skipped counts per stage of the last render
+        self.stage_report: Dict[str, Dict[str, int]] = {}
+        # Batch the speeches of each section into fewer TTS requests
+        self.coalesce = self.config.TTS_COALESCE
+        self._job_source: Optional[TTSProvider] = None
+        self._job_speech: Optional[TTSProvider] = None
+        self._job_tts: Optional[CachedTTSProvider] = None
+        self._coalescer: Optional[CoalescingTTSProvider] = None
+        # Aspect ratios rendered from the narration of each job (empty = the profile's own)
+        self.aspects: List[str] = list(self.config.OUTPUT_ASPECTS)
+        # Every video written by the last render, the main one first
+        self.outputs: List[str] = []
+        # Master playlists of the HLS streams of the last render (STREAM_FORMAT)
+        self.streams: List[str] = []
+        # Resource limits of the current job, and the peak usage of the last one
+        self.budget: Optional[ResourceBudget] = None
+        self.resources: Dict[str, float] = {}
+        # Weighted progress and ETA of the current job, shared by its outputs
+        self.progress = JobProgress(self.callback)
+        # Cues and joined narration of the sections of the current job, shared by its outputs
+        self._job_cues: Dict[int, List[Dict]] = {}
+        self._job_narration: Dict[int, Tuple[Path, List[Tuple[float, float]]]] = {}
+        self._narration_lock = threading.Lock()
         self.effects = {
             'fade': VideoEffect.fade,
-            'slide_left': lambda clip: VideoEffect.slide_left(clip, self.config.VIDEO_WIDTH),
+            # Slides are as wide as the output they belong to
+            'slide_left': lambda clip: VideoEffect.slide_left(clip, clip.w),
             'zoom_in': VideoEffect.zoom_in,
             'rotate': VideoEffect.rotate_cw
         }
 
-    def process(self, script_path: str) -> str:
-        """Main video generation process"""
+    @property
+    def tts_provider(self) -> TTSProvider:
+        """TTS provider, created on first use"""
+        if self._tts_provider is None:
+            self._tts_provider = EnhancedTTSFactory.create_provider()
+        return self._tts_provider
+
+    @tts_provider.setter
+    def tts_provider(self, provider: TTSProvider):
+        self._tts_provider = provider
+
+    def set_quality(self, quality: Optional[str]):
+        """Select one of Config.QUALITY_PRESETS for the next renders (None for defaults)"""
+        if quality is not None and quality not in self.config.QUALITY_PRESETS:
+            raise ValueError(
+                f"Unknown quality '{quality}', expected one of: "
+                f"{', '.join(self.config.QUALITY_PRESETS)}"
+            )
+        self.quality = quality
+
+    def set_profile(self, name: Optional[str]):
+        """Select the render profile for the next renders (None for RENDER_PROFILE)"""
+        self.profile = self.config.get_render_profile(name)
+
+    def set_aspects(self, aspects: Optional[List[str]]):
+        """Select the aspect ratios (W:H) of the next renders (None for OUTPUT_ASPECTS)"""
+        aspects = list(self.config.OUTPUT_ASPECTS if aspects is None else aspects)
+        for aspect in aspects:
+            self.config.aspect_profile(self.profile, aspect)
+        self.aspects = aspects
+
+    def output_profiles(self) -> List[RenderProfile]:
+        """Profile of each output of a render, the main one first"""
+        profiles = []
+        for aspect in self.aspects or [None]:
+            profile = self.profile if aspect is None else self.config.aspect_profile(self.profile, aspect)
+            if profile not in profiles:
+                profiles.append(profile)
+        return profiles
+
+    def _output_processors(self) -> List['VideoProcessor']:
+        """One processor per output of the current job
+
+        With a single output this is the processor itself. Otherwise they are
+        shallow copies with their own profile and scratch directory, sharing
+        the speech provider, cues and narration of the job, so each extra
+        format costs only its layout and encode.
+        """
+        profiles = self.output_profiles()
+        if profiles == [self.profile]:
+            return [self]
+
+        self._speech_provider()
+        outputs = []
+        for profile in profiles:
+            output = copy.copy(self)
+            output.profile = profile
+            output.temp_dir = self.temp_dir / f"output_{profile.aspect or 'main'}"
+            output.temp_dir.mkdir()
+            outputs.append(output)
+        return outputs
+
+    def _speech_provider(self) -> TTSProvider:
+        """Provider used by the current render
+
+        Coalesced when enabled, cached for drafts and incremental builds.
+        """
+        if self._job_speech is None or self._job_source is not self.tts_provider:
+            self._job_source = provider = self.tts_provider
+            self._coalescer = self._job_tts = None
+            if self.coalesce:
+                provider = self._coalescer = CoalescingTTSProvider(
+                    provider, (self.temp_dir or Path(self.config.TEMP_DIR)) / 'coalesced',
+                    max_chars=self.config.TTS_COALESCE_MAX_CHARS or None
+                )
+            if self.profile.tts_cache or self.incremental:
+                provider = self._job_tts = CachedTTSProvider(provider, self.config.TTS_CACHE_DIR)
+            self._job_speech = provider
+        return self._job_speech
+
+    def _prefetch_speech(self, section: Dict):
+        """Synthesize the speeches of a section in batches, skipping cached ones"""
+        self._speech_provider()
+        if self._coalescer is None:
+            return
+        language = self.config.SPEECH_LANG
+        texts = [speech['text'] for speech in section['speeches'] if speech['text']]
+        if self._job_tts is not None:
+            texts = [t for t in texts if not self._job_tts.cache_path(t, language).exists()]
+        requests = self._coalescer.requests
+        self._coalescer.prefetch(texts, language)
+        self.logger.debug(f"Coalesced {len(texts)} speeches into "
+                          f"{self._coalescer.requests - requests} requests")
+
+    def _count_stage(self, stage: str, built: bool, amount: int = 1):
+        stats = self.stage_report.setdefault(stage, {'built': 0, 'skipped': 0})
+        stats['built' if built else 'skipped'] += amount
+        if amount:
+            metrics.CACHE_LOOKUPS.inc(amount, cache=stage, result='miss' if built else 'hit')
+
+    def _render_settings(self) -> Dict:
+        """Every setting that affects the rendered output, for cache keys"""
+        return {
+            'style': self.config.style_config,
+            'profile': asdict(self.profile),
+            'encoder': self._encoder_settings(),
+            'tts': [self.tts_provider.identity, self.config.SPEECH_LANG],
+            'text_renderer': self.config.TEXT_RENDERER,
+            'audio': [self.config.AUDIO_FPS, self.config.AUDIO_CHANNELS, self.config.AUDIO_BITRATE,
+                      self.config.AUDIO_NBYTES, self.config.AUDIO_SAMPLE_FORMAT],
+        }
+
+    def _background_mtime(self, section: Dict) -> Optional[int]:
+        background = section.get('background')
+        bg_path = Path(self.config.ASSETS_DIR) / background if background else None
+        return bg_path.stat().st_mtime_ns if bg_path and bg_path.exists() else None
+
+    def render_fingerprint(self, script_path: str) -> str:
+        """Fingerprint of a full render: script content, assets and settings"""
+        sections = self._parse_script(script_path)['content']
+        return fingerprint(
+            file_fingerprint(Path(script_path)),
+            [self._background_mtime(section) for section in sections],
+            self._render_settings(),
+            self.config.REUSE_BUMPERS,
+            [asdict(profile) for profile in self.output_profiles()]
+        )
+
+    def process(self, script_path: str, selection: Optional[RenderSelection] = None) -> str:
+        """Main video generation process, optionally rendering only a selection"""
+        start = time.perf_counter()
+        status = 'error'
+        try:
+            with profiling.job(Path(script_path).stem), \
+                    tracing.span('render', script=str(script_path), profile=self.profile.name,
+                                 partial=selection is not None) as render:
+                video = self._render(script_path, selection)
+                render.set(outputs=len(self.outputs))
+                render.set_file(video)
+            status = 'ok'
+            for output, profile in zip(self.outputs, self.output_profiles()):
+                metrics.VIDEOS_RENDERED.inc(profile=profile.name, status='ok')
+                try:
+                    metrics.VIDEO_SECONDS.inc(probe_duration(output), profile=profile.name)
+                except Exception as e:
+                    self.logger.warning(f"Could not measure the duration of {output}: {str(e)}")
+            return video
+        except RenderCancelled:
+            status = 'cancelled'
+            raise
+        finally:
+            if status != 'ok':
+                metrics.VIDEOS_RENDERED.inc(profile=self.profile.name, status=status)
+            metrics.RENDER_SECONDS.observe(time.perf_counter() - start, profile=self.profile.name)
+            if self.resources.get('rss_mb'):
+                metrics.JOB_PEAK_RSS.observe(self.resources['rss_mb'], profile=self.profile.name)
+
+    def _render(self, script_path: str, selection: Optional[RenderSelection]) -> str:
         try:
+            self.config.ensure_directories()
+            self.temp_dir = Path(tempfile.mkdtemp(prefix='job_', dir=self.config.TEMP_DIR))
+            self.stage_report = {}
+            self.outputs, self.streams = [], []
+            self._job_speech = self._job_tts = self._coalescer = None
+            self._job_cues, self._job_narration = {}, {}
+            self.budget = ResourceBudget(
+                self.config.RENDER_MAX_RSS_MB, self.config.RENDER_MAX_OPEN_FILES,
+                self.config.RENDER_MAX_PROCESSES, strict=self.config.RENDER_BUDGET_STRICT
+            )
             sections = self._parse_script(script_path)
             metadata = sections['metadata']
+            self.progress = JobProgress(self.callback, parse_weights(self.config.PROGRESS_WEIGHTS),
+                                        self.config.PROGRESS_INTERVAL)
+            self.progress.plan('sections', sum(
+                1 for i, section in enumerate(sections['content'])
+                if selection is None or selection.matches(i, section)
+            ))
+            self.progress.plan('finalize', 1)
 
             self.callback.log_message(f"Creating video for: {metadata['title']}")
-            clips = []
-
-            for i, section in enumerate(sections['content']):
-                segment_clip = self._create_segment(section, i)
-                if segment_clip:
-                    clips.append(segment_clip)
-
-            if not clips:
-                raise ValueError("No valid clips generated")
-
-            return self._render_final_video(clips, metadata['title'])
+            outputs = self._output_processors()
+            clips: List[List] = [[] for _ in outputs]
+            writers = [output._stream_writer(metadata['title'], selection is not None)
+                       for output in outputs]
+            position = 0.0
+
+            # Sections are encoded (TEXT_RENDERER ass/soft) and outputs written in parallel
+            with ThreadPoolExecutor(max_workers=len(outputs)) as pool:
+                for i, section in enumerate(sections['content']):
+                    self._raise_if_cancelled()
+                    if selection is not None:
+                        if not selection.matches(i, section):
+                            continue
+                        if selection.end is not None and position >= selection.end:
+                            break
+
+                    cues = None
+                    with tracing.span('section', index=i, type=section.get('type', '')):
+                        for output, output_clips, writer in zip(outputs, clips, writers):
+                            cache_dir = output._segment_cache_dir(section) if selection is None else None
+                            if cache_dir is not None:
+                                segment = output._cached_segment(section, i, cache_dir)
+                                if segment:
+                                    output._queue_segment(output_clips, segment, writer, pool, i)
+                                    continue
+
+                            if cues is None:
+                                cues = self._synthesize_section(section, i)
+                                if selection is not None and selection.has_time_range:
+                                    cues, position = selection.clip_cues(cues, position)
+                            # Only outputs that encode the section plan its encode
+                            output._plan_encode(cues)
+
+                            if self.config.TEXT_RENDERER != 'pil':
+                                segment = pool.submit(tracing.propagate(output._encode_section), section, i,
+                                                      cues, output.temp_dir / f"section_{i}.mp4")
+                                output._queue_segment(output_clips, segment, writer, pool, i)
+                                continue
+                            for part, window in enumerate(self._cue_windows(cues)):
+                                segment = output._create_segment(section, i, window)
+                                if segment:
+                                    output._queue_segment(output_clips, segment, writer, pool, i, part)
+                    if i not in self._job_cues:
+                        # Reused segments, nothing narrated
+                        self.progress.advance('sections', 1, f"Reused section {i}")
+
+                queued = [len(output_clips) for output_clips in clips]
+                clips = [[c.result() if isinstance(c, Future) else c for c in output_clips]
+                         for output_clips in clips]
+                clips = [[c for c in output_clips if c] for output_clips in clips]
+                if not all(clips):
+                    raise ValueError("No valid clips generated")
+                for writer, count in zip(writers, queued):
+                    if writer is not None:
+                        writer.close(count)
+                        self.streams.append(str(writer.playlist))
+
+                self._raise_if_cancelled()
+                videos = [pool.submit(tracing.propagate(output._render_final_video), output_clips, metadata['title'],
+                                      partial=selection is not None)
+                          for output, output_clips in zip(outputs, clips)]
+                self.outputs = [video.result() for video in videos]
+            self.budget.check('final video')
+            self.progress.finish()
+            return self.outputs[0]
 
         except Exception as e:
             self.logger.error(f"Error creating video: {str(e)}")
             raise
+        finally:
+            if self._job_tts is not None:
+                self._count_stage('audio', True, self._job_tts.misses)
+                self._count_stage('audio', False, self._job_tts.hits)
+            self.resources = dict(self.budget.peak) if self.budget is not None else {}
+            self._remove_job_dir()
+
+    def _raise_if_cancelled(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise RenderCancelled("Render cancelled")
+
+    def _cue_windows(self, cues: List[Dict]) -> List[List[Dict]]:
+        """Split the cues of a section into the windows laid out at once"""
+        size = self.config.RENDER_MAX_CLIPS if self.config.RENDER_BOUNDED else 0
+        if size <= 0:
+            return [cues]
+        return [cues[start:start + size] for start in range(0, len(cues), size)]
+
+    def _queue_segment(self, clips: List, segment: Union['VideoClip', Path, Future],
+                       writer: Optional[HlsWriter], pool: ThreadPoolExecutor, segment_number: int,
+                       part: int = 0):
+        """Append a section to the clips of the output, and to its stream once encoded
+
+        Bounded renders encode each window of slides right away and keep only
+        the file, so the clips held in memory never depend on the script length.
+        """
+        if not isinstance(segment, (Path, Future)):
+            section_file = self.temp_dir / f"section_{segment_number}_{part}.mp4"
+            if self.config.RENDER_BOUNDED:
+                segment = self._write_section(segment, section_file)
+                # moviepy clips reference each other: free their frames now, not at the next GC run
+                gc.collect()
+            elif writer is not None:
+                # Streamed sections are encoded on their own, as soon as they are laid out
+                segment = pool.submit(tracing.propagate(self._write_section), segment, section_file)
+        if self.budget is not None:
+            self.budget.check(f"section {segment_number}")
+        if writer is None:
+            clips.append(segment)
+            return
+
+        position = len(clips)
+        clips.append(segment)
+        if isinstance(segment, Future):
+            segment.add_done_callback(tracing.propagate(
+                lambda done: writer.add(position, None if done.exception() else done.result())
+            ))
+        else:
+            writer.add(position, segment)
+
+    def _write_section(self, clip: 'VideoClip', output_file: Path) -> Path:
+        """Encode a section on its own and release its clips"""
+        try:
+            self._write_video(clip, str(output_file))
+        finally:
+            clip.close()
+        return output_file
+
+    def _stream_writer(self, title: str, partial: bool = False) -> Optional[HlsWriter]:
+        """HLS writer of the current output, None unless STREAM_FORMAT is set"""
+        stream_format = self.config.STREAM_FORMAT
+        if stream_format == 'off':
+            return None
+        video = Path(self._output_path(title, partial))
+        encoder = self._encoder_settings()
+        return HlsWriter(
+            video.with_name(f"{video.stem}_stream"),
+            self.profile.width, self.profile.height, encoder['bitrate'], self.config.AUDIO_BITRATE,
+            codec=self.profile.codec, preset=encoder['preset'],
+            segment_time=self.config.STREAM_SEGMENT_TIME,
+            segment_type='fmp4' if stream_format == 'fmp4' else 'mpegts',
+            ladder=parse_ladder(self.config.STREAM_LADDER)
+        )
 
-    def _render_final_video(self, clips: List[VideoFileClip], title: str) -> str:
-        """Render final video"""
-        output_file = os.path.join(
+    def _output_path(self, title: str, partial: bool = False) -> str:
+        """File of the video of the current output"""
+        suffix = '' if self.profile.name == 'final' else f"_{self.profile.name}"
+        if self.profile.aspect:
+            suffix += f"_{self.profile.aspect}"
+        if partial:
+            suffix += '_partial'
+        return os.path.join(
             self.config.OUTPUT_DIR,
-            f"video_{title[:30].replace(' ', '_')}.mp4"
+            f"video_{title[:30].replace(' ', '_')}{suffix}.mp4"
         )
 
-        self.logger.info(f"Creating video for: {title}")
+    def _render_final_video(self, clips: List[Union['VideoClip', Path]], title: str,
+                            partial: bool = False) -> str:
+        """Render final video
+
+        `clips` may contain already encoded segments (shared bumpers): the
+        clips between them are encoded on their own and everything is joined
+        with stream copy.
+        """
+        output_file = self._output_path(title, partial)
+
+        self.logger.info(f"Creating video for: {title} (profile: {self.profile.name})")
 
         try:
-            final_video = concatenate_videoclips(clips, method="compose")
-            final_video.write_videofile(
-                output_file,
-                fps=self.config.VIDEO_FPS,
-                codec='libx264',
-                audio_codec='aac',
-                bitrate="4000k"
-            )
+            if not any(isinstance(clip, Path) for clip in clips):
+                final_video = self._concatenate(clips)
+                self._write_video(final_video, output_file)
+            else:
+                segments, pending = [], []
+                for clip in clips + [None]:
+                    if isinstance(clip, Path) or clip is None:
+                        if pending:
+                            body = self.temp_dir / f"body_{len(segments)}.mp4"
+                            self._write_video(self._concatenate(pending), str(body))
+                            segments.append(body)
+                            pending = []
+                        if clip is not None:
+                            segments.append(clip)
+                    else:
+                        pending.append(clip)
+                self.progress.advance('finalize', status=f"Joining {len(segments)} segments")
+                with tracing.span('concat', inputs=len(segments)) as concat:
+                    concat_copy(segments, Path(output_file))
+                    concat.set_file(output_file)
 
             self.logger.info(f"Video saved to: {output_file}")
             return output_file
@@ -117,16 +565,182 @@ class VideoProcessor(BaseProcessor):
         except Exception as e:
             self.logger.error(f"Error creating video: {str(e)}")
             raise
+
+    @staticmethod
+    def _concatenate(clips: List['VideoClip']) -> 'VideoClip':
+        """Join clips, keeping track of where their slides start"""
+        from moviepy.editor import concatenate_videoclips
+
+        joined = concatenate_videoclips(clips, method="compose")
+        joined.slide_times, offset = [], 0.0
+        for clip in clips:
+            joined.slide_times += [offset + t for t in getattr(clip, 'slide_times', [0.0])]
+            offset += clip.duration
+        return joined
+
+    def _encoder_settings(self) -> Dict:
+        """Encoder arguments of the current profile and quality"""
+        encoder = {'preset': self.profile.preset, 'bitrate': self.profile.bitrate}
+        if self.quality:
+            encoder.update(self.config.QUALITY_PRESETS[self.quality])
+        if self.config.STREAM_FORMAT != 'off':
+            # Keyframes on the segment boundaries, so streams are cut without re-encoding
+            encoder['keyframe_interval'] = self.config.STREAM_SEGMENT_TIME
+        return encoder
+
+    def _video_params(self, slide_times: List[float], duration: float,
+                      filters: Optional[List[str]] = None) -> List[str]:
+        """ffmpeg video arguments: rate control, filters and forced keyframes
+
+        Still profiles drop repeated frames (the output has a variable frame
+        rate and a slide held for seconds costs about a frame per second),
+        tune x264 for still images and force a keyframe where each slide starts.
+        Streamed videos keep every frame: a dropped tail would end the video
+        track of a section at its last slide change, and the renditions of
+        the stream would each guess how long that frame is held.
+        """
+        encoder = self._encoder_settings()
+        params = []
+        if self.profile.crf is not None:
+            # Constant quality, capped at the bitrate for the busiest frames
+            cap = bits_per_second(encoder['bitrate'])
+            params += ['-crf', str(self.profile.crf), '-maxrate', str(cap), '-bufsize', str(2 * cap)]
+        else:
+            params += ['-b:v', encoder['bitrate']]
+
+        filters = list(filters or [])
+        keyframes = set()
+        if self.profile.still:
+            if self.profile.codec == 'libx264':
+                params += ['-tune', 'stillimage']
+            if self.config.STREAM_FORMAT == 'off':
+                # At least a frame per second, so the video track still spans the audio
+                filters.append(f"mpdecimate=hi=64*4:lo=64:frac=0.1:max={self.profile.fps}")
+                params += ['-fps_mode', 'vfr']
+            keyframes.update(slide_times)
+        if filters:
+            params += ['-vf', ','.join(filters)]
+
+        interval = encoder.get('keyframe_interval')
+        if interval:
+            keyframes.update(n * interval for n in range(math.ceil(duration / interval)))
+        if keyframes:
+            params += ['-force_key_frames', ','.join(f"{t:.3f}" for t in sorted(keyframes))]
+        return params
+
+    def _write_video(self, clip: 'VideoClip', output_file: str):
+        """Encode a clip with the settings of the current profile
+
+        Every encoded file (final video, bumpers, bodies) goes through here, so
+        they can be joined with stream copy.
+        """
+        start = time.perf_counter()
+        with tracing.span('encode', file=Path(output_file).name, duration=clip.duration) as encode:
+            audio_file = None
+            if clip.audio is not None:
+                audio_file = (self.temp_dir or Path(self.config.TEMP_DIR)) / f"{Path(output_file).stem}_audio.m4a"
+                self._write_audio(clip.audio, audio_file)
+
+            report = self.progress.encoder(f"Encoding {Path(output_file).name}")
+            clip.write_videofile(
+                output_file,
+                logger=moviepy_logger(report, self.profile.fps),
+                fps=self.profile.fps,
+                codec=self.profile.codec,
+                audio=str(audio_file) if audio_file else False,
+                preset=self._encoder_settings()['preset'],
+                bitrate=None,
+                ffmpeg_params=self._video_params(getattr(clip, 'slide_times', [0.0]), clip.duration)
+            )
+            if audio_file is not None:
+                audio_file.unlink(missing_ok=True)
+            encode.set_file(output_file)
+        metrics.ENCODE_REALTIME.observe(clip.duration / (time.perf_counter() - start),
+                                        profile=self.profile.name, renderer='pil')
+
+    def _write_audio(self, audio: 'AudioClip', output_file: Path):
+        """Encode the soundtrack of an output file
+
+        The narration is mixed at its own sample rate and channel layout; this
+        is the single place where it is resampled and upmixed, by ffmpeg, to
+        AUDIO_FPS and AUDIO_CHANNELS.
+        """
+        with tracing.span('encode.audio', file=output_file.name):
+            audio.write_audiofile(
+                str(output_file),
+                fps=getattr(audio, 'fps', None) or self.config.AUDIO_FPS,
+                nbytes=self.config.AUDIO_NBYTES,
+                codec='aac',
+                bitrate=self.config.AUDIO_BITRATE,
+                ffmpeg_params=['-ar', str(self.config.AUDIO_FPS), '-ac', str(self.config.AUDIO_CHANNELS)],
+                logger=None
+            )
+
+    def _is_bumper(self, section: Dict) -> bool:
+        """Intro/outro sections are the same in every video and are rendered once"""
+        return self.config.REUSE_BUMPERS and section.get('type') in ('intro', 'outro')
+
+    def _segment_cache_dir(self, section: Dict) -> Optional[Path]:
+        """Where the encoded segment of a section is cached, None to render it inline"""
+        if self._is_bumper(section):
+            return Path(self.config.BUMPER_CACHE_DIR)
+        if self.incremental:
+            return Path(self.config.SEGMENT_CACHE_DIR)
+        return None
+
+    def _segment_key(self, section: Dict) -> str:
+        """Hash of everything that affects how a section looks and sounds"""
+        return fingerprint(section, self._background_mtime(section), self._render_settings())[:16]
+
+    def _cached_segment(self, section: Dict, segment_number: int, cache_dir: Path) -> Optional[Path]:
+        """Return the encoded segment of a section, rendering it on first use"""
+        segment = cache_dir / f"{section['type']}_{self._segment_key(section)}.mp4"
+        if segment.exists():
+            self.logger.info(f"Reusing {section['type']} segment: {segment.name}")
+            self._count_stage('segment', built=False)
+            return segment
+
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        # Encode next to the entry then rename, concurrent renders never see a partial file
+        partial_file = segment.with_name(f"{segment.stem}_{os.getpid()}_{threading.get_ident()}.mp4")
+        try:
+            if not self._render_segment(section, segment_number, partial_file):
+                return None
+            if self._speech_provider().degraded:
+                # Narrated by the fallback voice: used for this video only
+                self.logger.warning(f"TTS failover active, not caching the {section['type']} segment")
+                segment = (self.temp_dir or Path(self.config.TEMP_DIR)) / segment.name
+            shutil.move(partial_file, segment)
         finally:
-            temp_dir = Path(self.config.TEMP_DIR)
-            if temp_dir.exists():
-                for file in temp_dir.glob('*'):
-                    file.unlink()
-                temp_dir.rmdir()
+            partial_file.unlink(missing_ok=True)
+        self.logger.info(f"Rendered {section['type']} segment: {segment.name}")
+        self._count_stage('segment', built=True)
+        return segment
+
+    def _render_segment(self, section: Dict, segment_number: int, output_file: Path) -> bool:
+        """Render and encode a section on its own, False when it has no content"""
+        cues = self._synthesize_section(section, segment_number)
+        self._plan_encode(cues)
+        if self.config.TEXT_RENDERER != 'pil':
+            return self._encode_section(section, segment_number, cues, output_file) is not None
+
+        clip = self._create_segment(section, segment_number, cues)
+        if clip is None:
+            return False
+        self._write_video(clip, str(output_file))
+        return True
+
+    def _remove_job_dir(self):
+        """Delete the scratch directory of the current job"""
+        if self.temp_dir is not None:
+            with tracing.span('cleanup', directory=self.temp_dir.name):
+                shutil.rmtree(self.temp_dir, ignore_errors=True)
+            self.temp_dir = None
 
     def _parse_script(self, script_path: str) -> Dict:
         """XML script parser"""
-        tree = ET.parse(script_path)
+        with tracing.span('parse', source=str(script_path)):
+            tree = ET.parse(script_path)
         root = tree.getroot()
 
         metadata = root.find("metadata")
@@ -156,75 +770,90 @@ class VideoProcessor(BaseProcessor):
             })
         return sections
 
-    def _create_segment(self, section: Dict, segment_number: int) -> VideoFileClip:
-        """Create video segment for section"""
-        temp_path = Path(self.config.TEMP_DIR)
+    def _synthesize_section(self, section: Dict, segment_number: int) -> List[Dict]:
+        """Synthesize the narration of a section
+
+        Returns one cue per speech with its text, audio file, sample rate and
+        duration (pause included); speeches that fail are logged and left out.
+        A section is synthesized once per job, whatever the number of outputs.
+        """
+        if segment_number in self._job_cues:
+            return self._job_cues[segment_number]
+        temp_path = self.temp_dir or Path(self.config.TEMP_DIR)
+        temp_path.mkdir(parents=True, exist_ok=True)
+
+        self._prefetch_speech(section)
+        cues = []
+        speeches = section['speeches']
+        for i, speech in enumerate(speeches):
+            self._raise_if_cancelled()
+            audio_path = temp_path / f'audio_{segment_number}_{i}.wav'
+            try:
+                sample_rate, duration = self._create_audio(speech['text'], audio_path, speech['pause'])
+            except Exception as e:
+                self.logger.error(f"Error synthesizing speech {i}: {str(e)}")
+                continue
+            finally:
+                self.progress.advance('sections', 1 / len(speeches),
+                                      f"Narrating section {segment_number}, speech {i + 1}/{len(speeches)}")
+
+            cues.append({
+                'index': i,
+                'text': speech['text'],
+                'audio_path': audio_path,
+                'sample_rate': sample_rate,
+                'duration': duration
+            })
+        if not speeches:
+            self.progress.advance('sections', 1)
+        self._job_cues[segment_number] = cues
+        return cues
+
+    def _plan_encode(self, cues: List[Dict]):
+        """This output encodes the narration of `cues`, trimmed to the selection"""
+        self.progress.plan('encode', sum(cue['trim'][1] - cue['trim'][0] if 'trim' in cue else cue['duration']
+                                         for cue in cues), source='sections')
+
+    def _create_segment(self, section: Dict, segment_number: int,
+                        cues: Optional[List[Dict]] = None) -> Optional['VideoClip']:
+        """Create video segment for section, from its synthesized cues"""
+        from moviepy.editor import ImageClip
+
+        if cues is None:
+            cues = self._synthesize_section(section, segment_number)
+
+        temp_path = self.temp_dir or Path(self.config.TEMP_DIR)
         temp_path.mkdir(parents=True, exist_ok=True)
         self.logger.info(f"Using temp directory: {temp_path}")
 
         clips = []
-        total_speeches = len(section['speeches'])
-        for i, speech in enumerate(section['speeches']):
-            self.callback.update_progress(
-                (i * 100) // total_speeches,
-                f"Processing segment {segment_number}, speech {i+1}/{total_speeches}"
+        total_speeches = len(cues)
+        for n, cue in enumerate(cues):
+            i = cue['index']
+            self._raise_if_cancelled()
+            self.progress.advance(
+                'sections', status=f"Processing segment {segment_number}, speech {n+1}/{total_speeches}"
             )
 
             image_path = temp_path / f'slide_{segment_number}_{i}.png'
-            audio_path = temp_path / f'audio_{segment_number}_{i}.mp3'
 
             try:
-                # Gestione dello sfondo personalizzato
-                if section.get('background'):
-                    bg_path = Path(self.config.ASSETS_DIR) / section['background']
-                    if bg_path.exists():
-                        # Creiamo una copia dello sfondo
-                        background = Image.open(bg_path)
-                        if background.size != (self.config.VIDEO_WIDTH, self.config.VIDEO_HEIGHT):
-                            background = background.resize((self.config.VIDEO_WIDTH, self.config.VIDEO_HEIGHT))
-
-                        # Aggiungiamo il testo sullo sfondo
-                        draw = ImageDraw.Draw(background)
-                        font_size = self.config.FONT_SIZES.get(
-                            f'h{section["level"]}' if section["level"] in [1,2,3] else 'text'
-                        )
-                        font = ImageFont.truetype(self.config.FONT_PATH, font_size)
-
-                        # Calcoliamo il layout del testo
-                        margin = int(self.config.VIDEO_WIDTH * self.config.TEXT_MARGIN)
-                        max_width = self.config.VIDEO_WIDTH - (2 * margin)
-                        lines = self._wrap_text(speech['text'], font, max_width)
-
-                        # Disegniamo il testo con ombra
-                        y = (self.config.VIDEO_HEIGHT - (len(lines) * font_size * self.config.TEXT_LINE_SPACING)) / 2
-                        for line in lines:
-                            x = (self.config.VIDEO_WIDTH - font.getlength(line)) / 2
-                            # Ombra
-                            draw.text((x + 2, y + 2), line, font=font, fill='black')
-                            # Testo principale
-                            draw.text((x, y), line, font=font, fill=self.config.TEXT_COLOR)
-                            y += font_size * self.config.TEXT_LINE_SPACING
-
-                        background.save(image_path)
-                    else:
-                        self.logger.warning(f"Background image not found: {bg_path}, using default")
-                        self._create_slide(speech['text'], image_path, section['level'])
-                else:
-                    self._create_slide(speech['text'], image_path, section['level'])
+                with tracing.span('slide', chars=len(cue['text'])) as slide:
+                    slide.set(cached=self._cached_slide(section, cue['text'], image_path))
 
-                self._create_audio(speech['text'], audio_path, speech['pause'])
-
-                audio = AudioFileClip(str(audio_path))
+                audio = pcm_clip(decode_pcm(cue['audio_path'], cue['sample_rate']), cue['sample_rate'])
                 video = ImageClip(str(image_path)).set_duration(audio.duration)
 
-                # Applicazione dell'animazione specificata
+                # Applicazione dell'animazione specificata (plain cuts without effects)
                 animation = section.get('animation')
-                if animation and animation in self.effects:
-                    video = self.effects[animation](video)
-                else:
-                    video = self.effects['fade'](video)
+                if self.profile.effects:
+                    effect = animation if animation in self.effects else 'fade'
+                    with tracing.span('effect', animation=effect):
+                        video = self.effects[effect](video)
 
                 video = video.set_audio(audio)
+                if 'trim' in cue:
+                    video = video.subclip(*cue['trim'])
                 clips.append(video)
 
             except Exception as e:
@@ -233,7 +862,7 @@ class VideoProcessor(BaseProcessor):
 
         if clips:
             try:
-                final = concatenate_videoclips(clips, method="compose")
+                final = self._concatenate(clips)
                 self.logger.info(f"Created final segment with {len(clips)} clips")
                 return final
             except Exception as e:
@@ -241,16 +870,87 @@ class VideoProcessor(BaseProcessor):
                 return clips[0] if clips else None
         return None
 
+    def _cached_slide(self, section: Dict, text: str, image_path: Path) -> bool:
+        """Create the slide of a speech, reusing a cached copy in incremental builds
+
+        Returns True when the cached copy was used.
+        """
+        if not self.incremental:
+            self._create_section_slide(section, text, image_path)
+            return False
+
+        key = fingerprint(
+            text, section['level'], section.get('background'), self._background_mtime(section),
+            self.config.style_config, self.profile.width, self.profile.height
+        )
+        cached = Path(self.config.SLIDE_CACHE_DIR) / f"{key[:32]}.png"
+        if cached.exists():
+            shutil.copyfile(cached, image_path)
+            self._count_stage('slide', built=False)
+            return True
+
+        self._create_section_slide(section, text, image_path)
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        partial_file = cached.with_name(f"{cached.stem}_{os.getpid()}_{threading.get_ident()}.png")
+        shutil.copyfile(image_path, partial_file)
+        os.replace(partial_file, cached)
+        self._count_stage('slide', built=True)
+        return False
+
+    def _create_section_slide(self, section: Dict, text: str, image_path: Path):
+        """Create the slide of a speech, over the section background if it has one"""
+        # Gestione dello sfondo personalizzato
+        if section.get('background'):
+            bg_path = Path(self.config.ASSETS_DIR) / section['background']
+            if bg_path.exists():
+                # Creiamo una copia dello sfondo
+                width, height = self.profile.width, self.profile.height
+                background = Image.open(bg_path)
+                if background.size != (width, height):
+                    background = background.resize((width, height))
+
+                # Aggiungiamo il testo sullo sfondo
+                draw = ImageDraw.Draw(background)
+                font, font_size, lines, y = self._text_layout(text, section['level'])
+
+                # Disegniamo il testo con ombra
+                shadow = self.profile.scaled(2)
+                for line in lines:
+                    x = (width - font.getlength(line)) / 2
+                    # Ombra
+                    draw.text((x + shadow, y + shadow), line, font=font, fill='black')
+                    # Testo principale
+                    draw.text((x, y), line, font=font, fill=self.config.TEXT_COLOR)
+                    y += font_size * self.config.TEXT_LINE_SPACING
+
+                background.save(image_path)
+                return
+
+            self.logger.warning(f"Background image not found: {bg_path}, using default")
+
+        self._create_slide(text, image_path, section['level'])
+
     def _create_slide(self, text: str, output_path: Path, heading_level: int):
         """Crea una slide con testo"""
         # Create background
         image = self._create_background()
         draw = ImageDraw.Draw(image)
 
+        # Draw text
+        font, font_size, lines, y = self._text_layout(text, heading_level)
+        for line in lines:
+            x = (self.profile.width - font.getlength(line)) / 2
+            draw.text((x, y), line, font=font, fill=self.config.TEXT_COLOR)
+            y += font_size * self.config.TEXT_LINE_SPACING
+
+        image.save(output_path)
+
+    def _text_layout(self, text: str, heading_level: int) -> Tuple[ImageFont.FreeTypeFont, int, List[str], float]:
+        """Font, font size, wrapped lines and top of the text block of a slide"""
         # Configure font
-        font_size = self.config.FONT_SIZES.get(
+        font_size = self.profile.scaled(self.config.FONT_SIZES.get(
             f'h{heading_level}' if heading_level in [1,2,3] else 'text'
-        )
+        ))
         try:
             font = ImageFont.truetype(self.config.FONT_PATH, font_size)
         except:
@@ -258,112 +958,212 @@ class VideoProcessor(BaseProcessor):
             font = ImageFont.load_default()
 
         # Calculate text layout
-        margin = int(self.config.VIDEO_WIDTH * self.config.TEXT_MARGIN)
-        max_width = self.config.VIDEO_WIDTH - (2 * margin)
-        lines = self._wrap_text(text, font, max_width)
-
-        # Draw text
-        y = (self.config.VIDEO_HEIGHT - (len(lines) * font_size * self.config.TEXT_LINE_SPACING)) / 2
-
+        width, height = self.profile.width, self.profile.height
+        margin = int(width * self.config.TEXT_MARGIN)
+        lines = self._wrap_text(text, font, width - (2 * margin))
+        y = (height - (len(lines) * font_size * self.config.TEXT_LINE_SPACING)) / 2
+        return font, font_size, lines, y
+
+    def _section_background(self, section: Dict) -> Path:
+        """Background image shared by the speeches of a section, created once per job"""
+        temp_path = self.temp_dir or Path(self.config.TEMP_DIR)
+        bg_path = Path(self.config.ASSETS_DIR) / section['background'] if section.get('background') else None
+        if bg_path is not None and not bg_path.exists():
+            self.logger.warning(f"Background image not found: {bg_path}, using default")
+            bg_path = None
+
+        output_path = temp_path / f"background_{bg_path.stem if bg_path else 'default'}.png"
+        if not output_path.exists():
+            if bg_path is None:
+                background = self._create_background()
+            else:
+                background = Image.open(bg_path).convert('RGB')
+                if background.size != (self.profile.width, self.profile.height):
+                    background = background.resize((self.profile.width, self.profile.height))
+            background.save(output_path)
+        return output_path
+
+    def _subtitle_document(self, title: str = '') -> AssDocument:
+        """ASS script with one style per heading level, matching the PIL slides"""
+        document = AssDocument(self.profile.width, self.profile.height, title)
+        soft = self.config.TEXT_RENDERER == 'soft'
+        for level in (1, 2, 3, 4):
+            font, font_size, _, _ = self._text_layout('', level)
+            name, _ = font.getname() if isinstance(font, ImageFont.FreeTypeFont) else ('Sans', '')
+            # libass sizes fonts by line height (ascent + descent), PIL by em
+            size = sum(font.getmetrics()) if isinstance(font, ImageFont.FreeTypeFont) else font_size
+            document.add_style(
+                f'h{level}' if level <= 3 else 'text', name, size, color=self.config.TEXT_COLOR,
+                alignment=2 if soft else 8,
+                margin_h=int(self.profile.width * self.config.TEXT_MARGIN),
+                margin_v=self.profile.scaled(40) if soft else 0
+            )
+        return document
+
+    def _add_subtitle(self, document: AssDocument, section: Dict, text: str, start: float, end: float):
+        """Add the text of a speech, laid out line by line as on the PIL slides"""
+        level = section['level']
+        style = f'h{level}' if level in [1,2,3] else 'text'
+        if self.config.TEXT_RENDERER == 'soft':
+            document.add_event(start, end, text, style)
+            return
+
+        font, font_size, lines, y = self._text_layout(text, level)
+        duration = end - start
+        effect = ''
+        animation = section.get('animation') if section.get('animation') in self.effects else 'fade'
+        if self.profile.effects:
+            effect = {
+                'fade': r'\fad(500,500)',
+                'slide_left': r'\fad(300,0)',
+                'zoom_in': f"\\t(\\fscx{100 + 50 * duration:.0f}\\fscy{100 + 50 * duration:.0f})",
+                'rotate': f"\\t(\\frz{-360 * duration:.0f})",
+            }[animation]
+        if section.get('background') and (Path(self.config.ASSETS_DIR) / section['background']).exists():
+            effect += f"\\shad{self.profile.scaled(2)}"
+
+        x = self.profile.width / 2
         for line in lines:
-            x = (self.config.VIDEO_WIDTH - font.getlength(line)) / 2
-            draw.text((x, y), line, font=font, fill=self.config.TEXT_COLOR)
+            if self.profile.effects and animation == 'slide_left':
+                position = (f"\\move({x + self.profile.width:.0f},{y:.0f},{x:.0f},{y:.0f},"
+                            f"0,{duration * 500:.0f})")
+            else:
+                position = f"\\pos({x:.0f},{y:.0f})"
+            document.add_event(start, end, line, style, f"\\an8{position}{effect}")
             y += font_size * self.config.TEXT_LINE_SPACING
 
-        image.save(output_path)
-
-    def _create_audio(self, text: str, output_path: Path, pause: float):
-            """Crea l'audio da testo"""
-            try:
-                # Temporary dir for audio files
-                temp_path = str(output_path).replace('.mp3', '_temp.mp3')
-
-                # Generate audio using the configured TTS provider
-                success = self.tts_provider.synthesize(
+    def _encode_section(self, section: Dict, segment_number: int, cues: List[Dict],
+                        output_file: Path) -> Optional[Path]:
+        """Encode a section in a single ffmpeg pass, without rasterizing slides
+
+        The narration of the speeches is joined into one track and the text
+        becomes an ASS subtitle track over the section background: burned in
+        by libass (TEXT_RENDERER=ass) or muxed as a soft subtitle stream
+        (TEXT_RENDERER=soft).
+        """
+        if not cues:
+            return None
+        self._raise_if_cancelled()
+        temp_path = self.temp_dir or Path(self.config.TEMP_DIR)
+        audio_path, timings = self._section_narration(segment_number, cues)
+        document = self._subtitle_document(section.get('heading') or '')
+        for cue, (start, end) in zip(cues, timings):
+            self._add_subtitle(document, section, cue['text'], start, end)
+        position = timings[-1][1]
+
+        subtitles_path = temp_path / f'text_{segment_number}.ass'
+        document.save(subtitles_path)
+
+        soft = self.config.TEXT_RENDERER == 'soft'
+        args = ['-loop', '1', '-framerate', self.profile.fps, '-i', self._section_background(section),
+                '-i', audio_path]
+        if soft:
+            args += ['-i', subtitles_path, '-map', '0:v', '-map', '1:a', '-map', '2:s', '-c:s', 'mov_text']
+            filters = ['format=yuv420p']
+        else:
+            fonts_dir = Path(self.config.FONT_PATH).parent
+            args += ['-map', '0:v', '-map', '1:a']
+            filters = [ass_filter(subtitles_path, fonts_dir), 'format=yuv420p']
+        slide_times = [start for start, _ in timings]
+        encode_start = time.perf_counter()
+        with tracing.span('encode', file=Path(output_file).name, duration=position,
+                          renderer=self.config.TEXT_RENDERER) as encode:
+            run_ffmpeg(args + [
+                '-c:v', self.profile.codec, '-preset', self._encoder_settings()['preset'],
+                *self._video_params(slide_times, position, filters),
+                '-c:a', 'aac', '-b:a', self.config.AUDIO_BITRATE,
+                '-ar', self.config.AUDIO_FPS, '-ac', self.config.AUDIO_CHANNELS,
+                '-t', f"{position:.3f}", '-movflags', '+faststart', output_file
+            ], progress=ffmpeg_reporter(self.progress.encoder(f"Encoding section {segment_number}")))
+            encode.set_file(output_file)
+        metrics.ENCODE_REALTIME.observe(position / (time.perf_counter() - encode_start),
+                                        profile=self.profile.name, renderer=self.config.TEXT_RENDERER)
+        self.logger.info(f"Encoded section {segment_number} with {len(cues)} speeches ({position:.1f}s)")
+        return output_file
+
+    def _section_narration(self, segment_number: int,
+                           cues: List[Dict]) -> Tuple[Path, List[Tuple[float, float]]]:
+        """Join the speeches of a section into one WAV file, once per job
+
+        Returns the file and the start and end of each cue within it.
+        """
+        import numpy as np
+
+        with self._narration_lock:
+            if segment_number not in self._job_narration:
+                rate = cues[0]['sample_rate']
+                narration, timings, position = [], [], 0.0
+                for cue in cues:
+                    samples = decode_pcm(cue['audio_path'], rate)
+                    if 'trim' in cue:
+                        start, end = cue['trim']
+                        samples = samples[int(round(start * rate)):int(round(end * rate))]
+                    duration = len(samples) / rate
+                    timings.append((position, position + duration))
+                    narration.append(samples)
+                    position += duration
+
+                audio_path = cues[0]['audio_path'].with_name(f'narration_{segment_number}.wav')
+                encode_pcm(np.concatenate(narration), rate, audio_path, self.config.AUDIO_SAMPLE_FORMAT)
+                self._job_narration[segment_number] = (audio_path, timings)
+            return self._job_narration[segment_number]
+
+    def _create_audio(self, text: str, output_path: Path, pause: float) -> Tuple[int, float]:
+        """Crea l'audio da testo, seguito da `pause` secondi di silenzio
+
+        The speech keeps the provider's sample rate, mono, and is written as
+        WAV in AUDIO_SAMPLE_FORMAT: it is resampled only once, when the
+        soundtrack of the video is encoded. Returns the sample rate and the
+        duration.
+        """
+        import numpy as np
+
+        provider = self._speech_provider()
+        tts_path = output_path.with_name(f"{output_path.stem}_tts.{provider.audio_format.extension}")
+        try:
+            # Generate audio using the configured TTS provider
+            with tracing.span('tts', chars=len(text)) as tts:
+                hits = self._job_tts.hits if self._job_tts is not None else 0
+                success = provider.synthesize(
                     text=text,
-                    output_path=Path(temp_path),
+                    output_path=tts_path,
                     language=self.config.SPEECH_LANG
                 )
+                if self._job_tts is not None:
+                    tts.set(cache_hit=self._job_tts.hits > hits)
 
-                if not success:
-                    self.logger.error("TTS synthesis failed")
-                    raise Exception("Speech synthesis failed")
-
-                # Run generated audio
-                audio = AudioFileClip(temp_path)
-
-                if pause > 0:
-                    # Create silence
-                    silence = AudioClip(
-                        lambda t: 0,
-                        duration=pause
-                    ).set_fps(self.config.AUDIO_FPS)
-
-                    # Combine audio and silence
-                    final_audio = CompositeAudioClip([
-                        audio,
-                        silence.set_start(audio.duration)
-                    ])
-
-                    # Get the total expected duration
-                    expected_duration = audio.duration + pause
-
-                    # Salve final audio
-                    final_audio.write_audiofile(
-                        str(output_path),
-                        fps=self.config.AUDIO_FPS,
-                        codec=self.config.AUDIO_CODEC,
-                        bitrate=self.config.AUDIO_BITRATE,
-                        write_logfile=False,
-                        verbose=False
-                    )
-
-                    # Check the final duration
-                    check_audio = AudioFileClip(str(output_path))
-                    if abs(check_audio.duration - expected_duration) > 0.01:
-                        self.logger.warning(
-                            f"Audio duration mismatch. Expected: {expected_duration:.2f}s, "
-                            f"Got: {check_audio.duration:.2f}s"
-                        )
-                    check_audio.close()
-
-                else:
-                    # If there is no pause, use the original audio directly
-                    os.rename(temp_path, str(output_path))
+            if not success:
+                self.logger.error("TTS synthesis failed")
+                raise Exception("Speech synthesis failed")
 
-            except Exception as e:
-                self.logger.error(f"Error creating audio: {str(e)}")
-                raise
+            rate = provider.audio_format.sample_rate or probe_sample_rate(tts_path)
+            samples = decode_pcm(tts_path, rate)
+            if pause > 0:
+                samples = np.concatenate([samples, np.zeros(int(round(pause * rate)), dtype=np.float32)])
+            encode_pcm(samples, rate, output_path, self.config.AUDIO_SAMPLE_FORMAT)
+            return rate, len(samples) / rate
 
-            finally:
-                # Clean
-                if os.path.exists(temp_path):
-                    try:
-                        os.remove(temp_path)
-                    except:
-                        pass
-
-                # Close audio clips
-                if 'audio' in locals():
-                    audio.close()
-                if 'silence' in locals():
-                    silence.close()
-                if 'final_audio' in locals():
-                    final_audio.close()
+        except Exception as e:
+            self.logger.error(f"Error creating audio: {str(e)}")
+            raise
+
+        finally:
+            tts_path.unlink(missing_ok=True)
 
     def _create_background(self) -> Image:
         """Create the background for the slides"""
-        image = Image.new('RGB', (self.config.VIDEO_WIDTH, self.config.VIDEO_HEIGHT))
+        width, height = self.profile.width, self.profile.height
+        image = Image.new('RGB', (width, height))
         draw = ImageDraw.Draw(image)
 
         ## Convert hex color to RGB
         bg_color = tuple(int(self.config.BGCOLOR[i:i+2], 16) for i in (1, 3, 5))
 
         # Create vertical gradient
-        for y in range(self.config.VIDEO_HEIGHT):
-            factor = 1 - y/self.config.VIDEO_HEIGHT * 0.2
+        for y in range(height):
+            factor = 1 - y/height * 0.2
             color = tuple(int(c * factor) for c in bg_color)
-            draw.line([(0, y), (self.config.VIDEO_WIDTH, y)], fill=color)
+            draw.line([(0, y), (width, y)], fill=color)
 
         return image
 
@@ -392,10 +1192,18 @@ class VideoProcessor(BaseProcessor):
 
     def cleanup(self):
         """Cleans temporary files"""
-        temp_dir = Path(self.config.TEMP_DIR)
-        if temp_dir.exists():
-            for file in temp_dir.glob('*'):
-                try:
-                    file.unlink()
-                except Exception as e:
-                    self.logger.error(f"Error deleting temporary file {file}: {str(e)}")
+        with tracing.span('cleanup') as span:
+            self._remove_job_dir()
+            temp_dir = Path(self.config.TEMP_DIR)
+            removed = 0
+            if temp_dir.exists():
+                for file in temp_dir.glob('*'):
+                    # Job directories of concurrent renders are left to their owners
+                    if file.is_dir():
+                        continue
+                    try:
+                        file.unlink()
+                        removed += 1
+                    except Exception as e:
+                        self.logger.error(f"Error deleting temporary file {file}: {str(e)}")
+            span.set(files=removed)
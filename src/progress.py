@@ -0,0 +1,205 @@
+"""Progress of a whole render job, with an estimated time of arrival
+
+A job is split into stages with a weight each (their share of the job):
+the narration and layout of the sections, the encoding of the video and
+its finalization (joins, stream playlists). Each stage is planned in its
+own units, such as sections or seconds of video, and advanced as the work
+gets done; the job progress is the weighted sum of the stage fractions.
+
+Events go through ProcessorCallback.update_progress, at most one every
+`interval` seconds (the start of each stage and the end of the job always go out).
+"""
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+import threading
+import time
+
+# Share of the job of each stage, when PROGRESS_WEIGHTS does not say otherwise
+DEFAULT_WEIGHTS = {'sections': 30.0, 'encode': 65.0, 'finalize': 5.0}
+
+def parse_weights(value: str) -> Dict[str, float]:
+    """Parse STAGE:WEIGHT pairs such as sections:30,encode:65,finalize:5"""
+    weights = dict(DEFAULT_WEIGHTS)
+    for part in (p.strip() for p in value.split(',')):
+        if not part:
+            continue
+        stage, _, weight = part.partition(':')
+        if stage not in DEFAULT_WEIGHTS:
+            raise ValueError(f"Unknown progress stage '{stage}', expected one of: {', '.join(DEFAULT_WEIGHTS)}")
+        try:
+            weights[stage] = float(weight)
+        except ValueError:
+            raise ValueError(f"Invalid progress weight '{part}', expected STAGE:WEIGHT such as encode:65")
+    return weights
+
+@dataclass
+class Stage:
+    weight: float
+    total: float = 0.0
+    done: float = 0.0
+    started: Optional[float] = None
+    # Stage whose progress plans this one (the encode is planned as sections are narrated)
+    source: Optional[str] = None
+
+    @property
+    def fraction(self) -> float:
+        if self.total <= 0:
+            return 0.0
+        return min(1.0, self.done / self.total)
+
+class JobProgress:
+    """Weighted progress of a job, reported through a ProcessorCallback
+
+    The ETA is measured, not guessed: a stage under way finishes at its own
+    observed rate (sections per second, seconds of video encoded per second)
+    and the stages not started yet at the rate of the job so far. Stages
+    under way overlap (sections are encoded while the next ones are
+    narrated), so the longest of them counts.
+    """
+
+    def __init__(self, callback, weights: Optional[Dict[str, float]] = None,
+                 interval: float = 1.0, clock: Callable[[], float] = time.monotonic):
+        self.callback = callback
+        self.stages = {name: Stage(weight) for name, weight in (weights or DEFAULT_WEIGHTS).items()}
+        self.interval = interval
+        self.clock = clock
+        self.start = clock()
+        self.value = 0.0
+        self._emitted = float('-inf')
+        self._lock = threading.Lock()
+
+    def plan(self, stage: str, amount: float, source: Optional[str] = None):
+        """Add `amount` units of work to a stage
+
+        With `source`, the work is planned as that stage goes: until it is
+        done, the total is projected from the part planned so far.
+        """
+        with self._lock:
+            self.stages[stage].total += amount
+            if source is not None:
+                self.stages[stage].source = source
+
+    def _total(self, stage: Stage) -> float:
+        source = self.stages.get(stage.source) if stage.source else None
+        if source is not None and 0 < source.fraction < 1:
+            return stage.total / source.fraction
+        return stage.total
+
+    def _fraction(self, stage: Stage) -> float:
+        total = self._total(stage)
+        return min(1.0, stage.done / total) if total > 0 else 0.0
+
+    def advance(self, stage: str, amount: float = 0.0, status: str = '', **details):
+        """Record `amount` units of a stage as done and report"""
+        with self._lock:
+            current = self.stages[stage]
+            current.done += amount
+            self._report(stage, status, details)
+
+    def update(self, stage: str, done: float, status: str = '', **details):
+        """Record that `done` units of a stage are done (never going back) and report"""
+        with self._lock:
+            current = self.stages[stage]
+            current.done = max(current.done, done)
+            self._report(stage, status, details)
+
+    def finish(self, status: str = 'Done'):
+        """Report the job as complete"""
+        with self._lock:
+            for stage in self.stages.values():
+                stage.done = stage.total = max(stage.total, 1.0)
+            self._report(list(self.stages)[-1], status, {}, force=True)
+
+    def encoder(self, status: str) -> Callable[..., None]:
+        """Reporter of an encode: call it with the position reached (seconds of
+        video) and the encoder speed, it advances the encode stage"""
+        position = 0.0
+
+        def report(seconds: float, speed: Optional[float] = None):
+            nonlocal position
+            if seconds <= position:
+                return
+            amount, position = seconds - position, seconds
+            details = {'speed': round(speed, 2)} if speed else {}
+            self.advance('encode', amount, status, **details)
+        return report
+
+    @property
+    def fraction(self) -> float:
+        # Stages without planned work yet count as not started
+        weight = sum(s.weight for s in self.stages.values())
+        if not weight:
+            return 0.0
+        return sum(s.weight * self._fraction(s) for s in self.stages.values()) / weight
+
+    def eta(self, now: Optional[float] = None) -> Optional[float]:
+        """Seconds left, None until there is a rate to measure"""
+        now = self.clock() if now is None else now
+        elapsed = now - self.start
+        fraction = self.fraction
+        if fraction <= 0 or elapsed <= 0:
+            return None
+        if fraction >= 1:
+            return 0.0
+        job_rate = fraction / elapsed
+        weight = sum(s.weight for s in self.stages.values())
+        running, pending = 0.0, 0.0
+        for stage in self.stages.values():
+            stage_fraction = self._fraction(stage)
+            if stage_fraction >= 1:
+                continue
+            if stage.started is not None and stage.done > 0 and now > stage.started:
+                rate = stage.done / (now - stage.started)
+                running = max(running, (self._total(stage) - stage.done) / rate)
+            else:
+                pending += stage.weight / weight * (1 - stage_fraction) / job_rate
+        return running + pending
+
+    def _report(self, stage: str, status: str, details: Dict, force: bool = False):
+        now = self.clock()
+        current = self.stages[stage]
+        started = current.started is None
+        if started:
+            current.started = now
+        # Work planned as the job goes may lower the fraction: the reported value never goes back
+        self.value = max(self.value, round(self.fraction * 100, 1))
+        if not (force or started or now - self._emitted >= self.interval):
+            return
+        self._emitted = now
+        eta = self.eta(now)
+        self.callback.update_progress(
+            self.value, status or stage, stage=stage, elapsed=round(now - self.start, 1),
+            eta=None if eta is None else round(eta, 1), **details
+        )
+
+def moviepy_logger(report: Callable[..., None], fps: float):
+    """proglog logger for moviepy's write_videofile, feeding an `encoder()` reporter"""
+    from proglog import ProgressBarLogger
+
+    class EncodeLogger(ProgressBarLogger):
+        def __init__(self):
+            # Not logged: the default keeps a line of history per frame
+            super().__init__(logged_bars=None)
+            self.start = time.monotonic()
+
+        def bars_callback(self, bar, attr, value, old_value=None):
+            if bar == 't' and attr == 'index' and value > 0:
+                seconds = value / fps
+                elapsed = time.monotonic() - self.start
+                report(seconds, seconds / elapsed if elapsed > 0 else None)
+
+    return EncodeLogger()
+
+def ffmpeg_reporter(report: Callable[..., None]) -> Callable[[Dict[str, str]], None]:
+    """Callback of `run_ffmpeg(progress=...)`, feeding an `encoder()` reporter"""
+    def on_progress(block: Dict[str, str]):
+        try:
+            seconds = int(block.get('out_time_us', '')) / 1_000_000
+        except ValueError:
+            return
+        try:
+            speed = float(block.get('speed', '').rstrip('x'))
+        except ValueError:
+            speed = None
+        report(seconds, speed)
+    return on_progress
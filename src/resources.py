@@ -0,0 +1,88 @@
+from dataclasses import dataclass, asdict
+from typing import Dict, List
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+class ResourceBudgetExceeded(RuntimeError):
+    """Raised by a strict ResourceBudget when a render goes over a limit"""
+
+@dataclass
+class ResourceUsage:
+    """Resources held by this process: resident memory, open files and child processes"""
+    rss_mb: float
+    open_files: int
+    processes: int
+
+def _rss_mb() -> float:
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except OSError:
+        # No procfs (macOS): the peak is the best available figure, in bytes there
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**20
+
+def _open_files() -> int:
+    for fd_dir in ('/proc/self/fd', '/dev/fd'):
+        try:
+            return len(os.listdir(fd_dir))
+        except OSError:
+            continue
+    return 0
+
+def _processes() -> int:
+    """Direct children of this process (ffmpeg encoders, worker processes)"""
+    pid = str(os.getpid())
+    count = 0
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return 0
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as stat:
+                # The command name may contain spaces: fields start after the last ')'
+                fields = stat.read().rsplit(')', 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        if fields[1] == pid:
+            count += 1
+    return count
+
+def current_usage() -> ResourceUsage:
+    return ResourceUsage(round(_rss_mb(), 1), _open_files(), _processes())
+
+class ResourceBudget:
+    """Limits on the resources of a render, checked at each step
+
+    A limit of 0 is not checked. Going over one logs a warning (once per
+    resource), or raises ResourceBudgetExceeded when `strict`. `peak` keeps
+    the highest usage seen, for reports.
+    """
+
+    def __init__(self, max_rss_mb: float = 0, max_open_files: int = 0, max_processes: int = 0,
+                 strict: bool = False):
+        self.limits = {'rss_mb': max_rss_mb, 'open_files': max_open_files, 'processes': max_processes}
+        self.strict = strict
+        self.peak: Dict[str, float] = {name: 0 for name in self.limits}
+        self._warned: List[str] = []
+
+    def check(self, step: str) -> ResourceUsage:
+        """Measure the usage after `step`, enforcing the limits"""
+        usage = current_usage()
+        for name, value in asdict(usage).items():
+            self.peak[name] = max(self.peak[name], value)
+            limit = self.limits[name]
+            if not limit or value <= limit:
+                continue
+            message = f"Resource budget exceeded after {step}: {name} {value} > {limit}"
+            if self.strict:
+                raise ResourceBudgetExceeded(message)
+            if name not in self._warned:
+                self._warned.append(name)
+                logger.warning(message)
+        return usage
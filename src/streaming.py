@@ -0,0 +1,247 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import logging
+import math
+import os
+import shutil
+import threading
+from .ffmpeg import probe_duration, run_ffmpeg
+from . import tracing
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class Rendition:
+    """One rung of the ladder: video height and bitrate"""
+    height: int
+    bitrate: str
+
+    @property
+    def name(self) -> str:
+        return f"{self.height}p"
+
+def parse_ladder(value: str) -> List[Rendition]:
+    """Parse HEIGHT:BITRATE pairs such as 720:2500k,480:1000k"""
+    ladder = []
+    for part in (p.strip() for p in value.split(',')):
+        if not part:
+            continue
+        height, _, bitrate = part.partition(':')
+        if not height.isdigit() or not bitrate:
+            raise ValueError(f"Invalid rendition '{part}', expected HEIGHT:BITRATE such as 720:2500k")
+        ladder.append(Rendition(int(height), bitrate))
+    return ladder
+
+def bits_per_second(rate: str) -> int:
+    """'2500k' -> 2500000"""
+    rate = str(rate).strip().lower()
+    factor = {'k': 1000, 'm': 1000000}.get(rate[-1:], 1)
+    return int(float(rate.rstrip('km')) * factor)
+
+class HlsWriter:
+    """Publish the encoded sections of a video as an HLS stream, while it renders
+
+    Sections are handed over with `add(position, file)` as soon as they are
+    encoded, in any order: they are published in timeline order. Each one is
+    cut into segments of about `segment_time` seconds by a single ffmpeg run
+    that copies the source rendition and encodes every rung of `ladder` from
+    the same decode. The media playlists (type EVENT) are rewritten after
+    each section, so players and uploaders can start on the first ones;
+    `close()` ends them.
+
+    `segment_type` is 'mpegts' (.ts segments) or 'fmp4' (CMAF .m4s segments
+    with one init segment per section). Sections are encoded independently,
+    hence a discontinuity between them; timestamps still follow the timeline:
+    each section starts where the previous one ends (its probed duration,
+    not the sum of its segments, which stops at its last video frame when
+    the frame rate is variable). Rungs keep the timestamps of the source
+    frames, so every rendition has the same timeline.
+    """
+
+    def __init__(self, directory: Path, width: int, height: int, bitrate: str, audio_bitrate: str,
+                 codec: str = 'libx264', preset: str = 'medium', segment_time: float = 4.0,
+                 segment_type: str = 'mpegts', ladder: Optional[List[Rendition]] = None):
+        if segment_type not in ('mpegts', 'fmp4'):
+            raise ValueError(f"Unknown segment type '{segment_type}', expected mpegts or fmp4")
+        self.directory = Path(directory)
+        self.width = width
+        self.height = height
+        self.bitrate = bitrate
+        self.audio_bitrate = audio_bitrate
+        self.codec = codec
+        self.preset = preset
+        self.segment_time = segment_time
+        self.segment_type = segment_type
+        # Rungs at or above the source resolution would only waste bits
+        self.ladder = [r for r in ladder or [] if r.height < height]
+        self.renditions = [Rendition(height, bitrate)] + self.ladder
+        # Published segments per rendition: (duration, uri, init segment or None)
+        self._segments: Dict[str, List[Tuple[float, str, Optional[str]]]] = {
+            r.name: [] for r in self.renditions
+        }
+        self._positions = {r.name: 0.0 for r in self.renditions}
+        # Index of the first segment of each section, where a discontinuity starts
+        self._section_starts = {r.name: set() for r in self.renditions}
+        self._pending: Dict[int, Optional[Path]] = {}
+        self._next = 0
+        # A thread is publishing the pending sections (outside the lock)
+        self._publishing = False
+        self._closed = False
+        self.error: Optional[Exception] = None
+        self._cond = threading.Condition()
+
+        shutil.rmtree(self.directory, ignore_errors=True)
+        for rendition in self.renditions:
+            (self.directory / rendition.name).mkdir(parents=True)
+        self._write_master()
+
+    @property
+    def playlist(self) -> Path:
+        """The master playlist"""
+        return self.directory / 'master.m3u8'
+
+    def add(self, position: int, section: Optional[Path]):
+        """Hand over the encoded section at `position` (None: nothing to publish there)
+
+        The thread handing over the next section in order publishes it, and
+        the sections that follow it, without holding the lock: other encoder
+        threads only leave their section and go on encoding.
+        """
+        with self._cond:
+            self._pending[position] = section
+            if self._publishing:
+                return
+            self._publishing = True
+        while True:
+            with self._cond:
+                if self._next not in self._pending:
+                    self._publishing = False
+                    return
+                position = self._next
+                section = self._pending.pop(position)
+                failed = self.error is not None
+            error = None
+            try:
+                if section is not None and not failed:
+                    self._publish(position, Path(section))
+            except Exception as e:
+                # Called from encoder threads: keep the order going, close() reports it
+                logger.error(f"Error publishing section {position}: {str(e)}")
+                error = e
+            with self._cond:
+                if error is not None:
+                    self.error = error
+                self._next += 1
+                self._cond.notify_all()
+
+    def close(self, count: int):
+        """End the playlists once the first `count` positions are published"""
+        with self._cond:
+            while self._next < count:
+                self._cond.wait()
+            if self.error is not None:
+                raise RuntimeError(f"Stream publishing failed: {str(self.error)}")
+            self._closed = True
+            for rendition in self.renditions:
+                self._write_media(rendition)
+        logger.info(f"Stream complete: {self.playlist}")
+
+    def _publish(self, position: int, section: Path):
+        fmp4 = self.segment_type == 'fmp4'
+        extension = 'm4s' if fmp4 else 'ts'
+        args = ['-i', section]
+        if self.ladder:
+            scaled = ''.join(f"[v{i}]scale=-2:{r.height}[o{i}];" for i, r in enumerate(self.ladder))
+            split = ''.join(f"[v{i}]" for i in range(len(self.ladder)))
+            args += ['-filter_complex', f"[0:v]split={len(self.ladder)}{split};{scaled.rstrip(';')}"]
+
+        for i, rendition in enumerate(self.renditions):
+            if i == 0:
+                args += ['-map', '0:v', '-map', '0:a?', '-c', 'copy']
+            else:
+                # No frames duplicated or dropped: a VFR source keeps the timeline of the copy
+                args += ['-map', f"[o{i - 1}]", '-map', '0:a?', '-fps_mode', 'passthrough',
+                         '-c:v', self.codec, '-preset', self.preset, '-b:v', rendition.bitrate, '-pix_fmt', 'yuv420p',
+                         *keyframe_params(self.segment_time), '-c:a', 'copy']
+            folder = self.directory / rendition.name
+            args += ['-output_ts_offset', f"{self._positions[rendition.name]:.6f}",
+                     '-f', 'hls', '-hls_time', self.segment_time, '-hls_playlist_type', 'vod',
+                     '-hls_segment_type', self.segment_type,
+                     '-hls_segment_filename', folder / f"section{position:03d}_%03d.{extension}"]
+            if fmp4:
+                args += ['-hls_fmp4_init_filename', f"init{position:03d}.mp4"]
+            args.append(folder / f"section{position:03d}.m3u8")
+        with tracing.span('stream.publish', position=position, renditions=len(self.renditions)):
+            run_ffmpeg(args)
+        duration = probe_duration(section)
+
+        for rendition in self.renditions:
+            part = self.directory / rendition.name / f"section{position:03d}.m3u8"
+            segments = self._parse_media(part)
+            part.unlink()
+            self._section_starts[rendition.name].add(len(self._segments[rendition.name]))
+            self._segments[rendition.name].extend(segments)
+            self._positions[rendition.name] += duration
+            self._write_media(rendition)
+        logger.info(f"Published section {position} to {self.directory.name} "
+                    f"({self._positions[self.renditions[0].name]:.1f}s streamable)")
+
+    @staticmethod
+    def _parse_media(path: Path) -> List[Tuple[float, str, Optional[str]]]:
+        """Segments of a media playlist written by ffmpeg"""
+        segments, duration, init = [], None, None
+        for line in path.read_text(encoding='utf-8').splitlines():
+            if line.startswith('#EXT-X-MAP:URI='):
+                init = line.split('=', 1)[1].strip('"')
+            elif line.startswith('#EXTINF:'):
+                duration = float(line[len('#EXTINF:'):].split(',')[0])
+            elif line and not line.startswith('#') and duration is not None:
+                segments.append((duration, line, init))
+                duration = None
+        return segments
+
+    def _write_media(self, rendition: Rendition):
+        segments = self._segments[rendition.name]
+        target = max([self.segment_time] + [duration for duration, _, _ in segments])
+        lines = [
+            '#EXTM3U',
+            f"#EXT-X-VERSION:{7 if self.segment_type == 'fmp4' else 3}",
+            f"#EXT-X-TARGETDURATION:{math.ceil(target)}",
+            '#EXT-X-MEDIA-SEQUENCE:0',
+            '#EXT-X-PLAYLIST-TYPE:EVENT',
+        ]
+        for i, (duration, uri, init) in enumerate(segments):
+            if i in self._section_starts[rendition.name]:
+                # A new section: new encoder state, and init segment for fMP4
+                if i > 0:
+                    lines.append('#EXT-X-DISCONTINUITY')
+                if init is not None:
+                    lines.append(f'#EXT-X-MAP:URI="{init}"')
+            lines += [f"#EXTINF:{duration:.6f},", uri]
+        if self._closed:
+            lines.append('#EXT-X-ENDLIST')
+        self._replace(self.directory / rendition.name / 'index.m3u8', '\n'.join(lines) + '\n')
+
+    def _write_master(self):
+        audio = bits_per_second(self.audio_bitrate)
+        lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-INDEPENDENT-SEGMENTS']
+        for rendition in self.renditions:
+            width = self.width * rendition.height // self.height // 2 * 2
+            lines += [
+                f"#EXT-X-STREAM-INF:BANDWIDTH={bits_per_second(rendition.bitrate) + audio},"
+                f"RESOLUTION={width}x{rendition.height}",
+                f"{rendition.name}/index.m3u8"
+            ]
+        self._replace(self.playlist, '\n'.join(lines) + '\n')
+
+    @staticmethod
+    def _replace(path: Path, content: str):
+        """Write a playlist atomically, readers never see half of it"""
+        partial = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}")
+        partial.write_text(content, encoding='utf-8')
+        os.replace(partial, path)
+
+def keyframe_params(segment_time: float) -> List[str]:
+    """Encoder arguments forcing a keyframe every `segment_time` seconds"""
+    return ['-force_key_frames', f"expr:gte(t,n_forced*{segment_time:g})"]
@@ -0,0 +1,88 @@
+from pathlib import Path
+from typing import List, Optional
+
+def ass_color(hex_color: str, alpha: int = 0) -> str:
+    """Convert '#rrggbb' to the ASS &HAABBGGRR notation"""
+    r, g, b = (hex_color[i:i + 2] for i in (1, 3, 5))
+    return f"&H{alpha:02X}{b}{g}{r}".upper()
+
+def ass_time(seconds: float) -> str:
+    """Format seconds as H:MM:SS.cc (ASS has centisecond precision)"""
+    centiseconds = int(round(max(0.0, seconds) * 100))
+    hours, centiseconds = divmod(centiseconds, 360000)
+    minutes, centiseconds = divmod(centiseconds, 6000)
+    return f"{hours}:{minutes:02d}:{centiseconds // 100:02d}.{centiseconds % 100:02d}"
+
+def ass_escape(text: str) -> str:
+    """Make text safe for a Dialogue line
+
+    Braces would open an override block and a backslash could form a \\N
+    escape: they are replaced by look-alikes; newlines become spaces.
+    """
+    return (text.replace('\\', '⧵').replace('{', '｛').replace('}', '｝')
+            .replace('\r', ' ').replace('\n', ' '))
+
+class AssDocument:
+    """An Advanced SubStation Alpha script, in pixels of a `width` x `height` video"""
+
+    STYLE_FORMAT = ('Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, '
+                    'BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, '
+                    'Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, '
+                    'Encoding')
+    EVENT_FORMAT = 'Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text'
+
+    def __init__(self, width: int, height: int, title: str = ''):
+        self.width = width
+        self.height = height
+        self.title = title
+        self.styles: List[str] = []
+        self.events: List[str] = []
+
+    def add_style(self, name: str, font: str, size: int, color: str = '#ffffff',
+                  shadow: int = 0, alignment: int = 8, margin_h: int = 0, margin_v: int = 0):
+        """Add a style; `alignment` is the numpad position (8 = top center, 2 = bottom center)"""
+        self.styles.append(
+            f"Style: {name},{font},{size},{ass_color(color)},{ass_color(color)},&H00000000,"
+            f"&H00000000,0,0,0,0,100,100,0,0,1,0,{shadow},{alignment},"
+            f"{margin_h},{margin_h},{margin_v},1"
+        )
+
+    def add_event(self, start: float, end: float, text: str, style: str, tags: str = ''):
+        """Add a Dialogue line; `text` is escaped, `tags` are override tags such as \\pos(x,y)"""
+        override = f"{{{tags}}}" if tags else ''
+        self.events.append(
+            f"Dialogue: 0,{ass_time(start)},{ass_time(end)},{style},,0,0,0,,{override}{ass_escape(text)}"
+        )
+
+    def dump(self) -> str:
+        return '\n'.join([
+            '[Script Info]',
+            f'Title: {self.title}',
+            'ScriptType: v4.00+',
+            'WrapStyle: 2',
+            'ScaledBorderAndShadow: yes',
+            f'PlayResX: {self.width}',
+            f'PlayResY: {self.height}',
+            '',
+            '[V4+ Styles]',
+            f'Format: {self.STYLE_FORMAT}',
+            *self.styles,
+            '',
+            '[Events]',
+            f'Format: {self.EVENT_FORMAT}',
+            *self.events,
+            ''
+        ])
+
+    def save(self, path: Path):
+        Path(path).write_text(self.dump(), encoding='utf-8')
+
+def ass_filter(path: Path, fonts_dir: Optional[Path] = None) -> str:
+    """ffmpeg filter burning an ASS file (paths escaped for the filtergraph)"""
+    def escape(value) -> str:
+        return str(value).replace('\\', '\\\\').replace(':', '\\:').replace("'", "\\'")
+
+    graph = f"ass=filename={escape(path)}"
+    if fonts_dir is not None:
+        graph += f":fontsdir={escape(fonts_dir)}"
+    return graph
@@ -0,0 +1,244 @@
+"""Hierarchical timing spans of the pipeline stages
+
+Tracing is off until `enable()` is called (TRACE_FILE or `--trace`); until
+then `span()` returns a shared no-op object, so instrumented code costs a
+function call. Spans nest through a context variable: a span opened inside
+another becomes its child, also in threads started with `propagate()`.
+
+    with tracing.span('tts', chars=len(text)) as current:
+        ...
+        current.set(cache_hit=True)
+
+`export()` writes Chrome trace-event JSON (chrome://tracing, Perfetto) or
+OTLP/JSON (`resourceSpans`, as sent to an OpenTelemetry collector).
+
+`track_stages()` opens spans without recording them: only the stage each
+thread is in is kept (`active_stages()`), for the sampling profiler.
+"""
+from contextvars import ContextVar, copy_context
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+import json
+import os
+import secrets
+import threading
+import time
+
+FORMATS = ('chrome', 'otlp')
+
+class Span:
+    """A timed stage with its attributes"""
+    __slots__ = ('name', 'span_id', 'parent_id', 'start_ns', 'end_ns', 'attributes',
+                 'pid', 'tid', 'error', '_token')
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.pid = os.getpid()
+        self.tid = threading.get_ident()
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+        self._token = None
+
+    def set(self, **attributes):
+        """Add attributes, e.g. results known only at the end of the stage"""
+        self.attributes.update(attributes)
+
+    def set_file(self, path):
+        """Record the size of a written file as `bytes`"""
+        try:
+            self.attributes['bytes'] = os.path.getsize(path)
+        except OSError:
+            pass
+
+    def __enter__(self) -> 'Span':
+        self._token = _current.set(self)
+        _active[self.tid] = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        _current.reset(self._token)
+        parent = _current.get()
+        if parent is not None:
+            _active[self.tid] = parent
+        else:
+            _active.pop(self.tid, None)
+        if _tracer is not None:
+            _tracer.record(self)
+        return False
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__ if name != '_token'}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Span':
+        span = cls.__new__(cls)
+        for name, value in data.items():
+            setattr(span, name, value)
+        span._token = None
+        return span
+
+class _NoopSpan:
+    """What `span()` returns while tracing is off"""
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+    def set_file(self, path):
+        pass
+
+    def __enter__(self) -> '_NoopSpan':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+class Tracer:
+    """Collects the finished spans of this process"""
+
+    def __init__(self):
+        self.trace_id = secrets.token_hex(16)
+        self.pid = os.getpid()
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def record(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def merge(self, spans: List[Dict]):
+        """Add spans recorded by another process (see `collect()`)
+
+        Their root spans become children of the current span.
+        """
+        parent = _current.get()
+        merged = [Span.from_dict(data) for data in spans]
+        for span in merged:
+            if span.parent_id is None and parent is not None:
+                span.parent_id = parent.span_id
+        with self._lock:
+            self.spans.extend(merged)
+
+    def chrome_trace(self) -> Dict:
+        events = []
+        for span in sorted(self.spans, key=lambda s: s.start_ns):
+            args = dict(span.attributes)
+            if span.error:
+                args['error'] = span.error
+            events.append({
+                'name': span.name,
+                'cat': span.name.split('.')[0],
+                'ph': 'X',
+                'ts': span.start_ns / 1000,
+                'dur': (span.end_ns - span.start_ns) / 1000,
+                'pid': span.pid,
+                'tid': span.tid,
+                'args': args,
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def otlp_trace(self) -> Dict:
+        spans = []
+        for span in sorted(self.spans, key=lambda s: s.start_ns):
+            attributes = {**span.attributes, 'process.pid': span.pid, 'thread.id': span.tid}
+            otlp_span = {
+                'traceId': self.trace_id,
+                'spanId': span.span_id,
+                'name': span.name,
+                'kind': 1,
+                'startTimeUnixNano': str(span.start_ns),
+                'endTimeUnixNano': str(span.end_ns),
+                'attributes': [{'key': key, 'value': _otlp_value(value)}
+                               for key, value in attributes.items()],
+                'status': {'code': 2, 'message': span.error} if span.error else {'code': 1},
+            }
+            if span.parent_id:
+                otlp_span['parentSpanId'] = span.parent_id
+            spans.append(otlp_span)
+        return {'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': 'md2video'}}]},
+            'scopeSpans': [{'scope': {'name': 'md2video'}, 'spans': spans}],
+        }]}
+
+    def export(self, path: Path, trace_format: str = 'chrome'):
+        if trace_format not in FORMATS:
+            raise ValueError(f"Unknown trace format '{trace_format}', expected one of: {', '.join(FORMATS)}")
+        document = self.chrome_trace() if trace_format == 'chrome' else self.otlp_trace()
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(document, default=str), encoding='utf-8')
+
+def _otlp_value(value: Any) -> Dict:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+_tracer: Optional[Tracer] = None
+_current: ContextVar[Optional[Span]] = ContextVar('md2video_span', default=None)
+# Innermost open span of each thread, read by the sampling profiler from its own thread
+_active: Dict[int, Span] = {}
+_NOOP = _NoopSpan()
+# Spans are opened for `active_stages()` even while not recorded
+_tracking = False
+
+def enable() -> Tracer:
+    """Start recording spans in this process (idempotent)"""
+    global _tracer
+    # A forked worker starts its own tracer, the parent's spans are not its own
+    if _tracer is None or _tracer.pid != os.getpid():
+        _tracer = Tracer()
+    return _tracer
+
+def disable():
+    global _tracer
+    _tracer = None
+
+def enabled() -> bool:
+    return _tracer is not None
+
+def track_stages(enabled: bool = True):
+    """Keep the stage of each thread up to date, recording spans or not"""
+    global _tracking
+    _tracking = enabled
+
+def span(name: str, /, **attributes):
+    """Time a stage: `with span('encode', file=...) as current: ...`"""
+    if _tracer is None and not _tracking:
+        return _NOOP
+    parent = _current.get()
+    return Span(name, parent.span_id if parent is not None else None, attributes)
+
+def propagate(function: Callable) -> Callable:
+    """Bind `function` to the current span, for work handed to another thread"""
+    if _tracer is None and not _tracking:
+        return function
+    context = copy_context()
+    return lambda *args, **kwargs: context.run(function, *args, **kwargs)
+
+def active_stages() -> Dict[int, str]:
+    """Name of the innermost open span of each thread, by thread id"""
+    return {tid: span.name for tid, span in list(_active.items())}
+
+def collect() -> List[Dict]:
+    """Take the spans recorded so far, e.g. to send them from a worker process"""
+    if _tracer is None:
+        return []
+    with _tracer._lock:
+        spans, _tracer.spans = _tracer.spans, []
+    return [span.to_dict() for span in spans]
+
+def export(path: Path, trace_format: str = 'chrome'):
+    """Write the recorded spans, no-op while tracing is off"""
+    if _tracer is not None:
+        _tracer.export(path, trace_format)
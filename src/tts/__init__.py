@@ -1,12 +1,38 @@
-from .providers import TTSProvider, GttsTTSProvider, AzureTTSProvider
+from .providers import TTSProvider, AudioTTSProvider, AudioFormat, SynthesizedAudio, TTSError
 from .factory import TTSProviderType, TTSConfig, TTSConfiguration, EnhancedTTSFactory
+from .cache import CachedTTSProvider
+from .coalesce import CoalescingTTSProvider
+from .resilient import ResilientTTSProvider, CircuitBreaker, LatencyHistogram
+from .limiter import AdaptiveLimiter, FileAdaptiveLimiter, RateLimitedTTSProvider
+from .metered import MeteredTTSProvider
+
+def __getattr__(name: str):
+    # Concrete providers are resolved lazily by the providers package
+    if name in ('GttsTTSProvider', 'AzureTTSProvider', 'SyntheticTTSProvider'):
+        from . import providers
+        return getattr(providers, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 __all__ = [
     'TTSProvider',
+    'AudioTTSProvider',
+    'AudioFormat',
+    'SynthesizedAudio',
+    'TTSError',
     'GttsTTSProvider',
     'AzureTTSProvider',
+    'SyntheticTTSProvider',
     'TTSProviderType',
     'TTSConfig',
     'TTSConfiguration',
-    'EnhancedTTSFactory'
-]
\ No newline at end of file
+    'EnhancedTTSFactory',
+    'CachedTTSProvider',
+    'CoalescingTTSProvider',
+    'ResilientTTSProvider',
+    'CircuitBreaker',
+    'LatencyHistogram',
+    'AdaptiveLimiter',
+    'FileAdaptiveLimiter',
+    'RateLimitedTTSProvider',
+    'MeteredTTSProvider'
+]
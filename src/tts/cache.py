@@ -0,0 +1,67 @@
+from pathlib import Path
+import hashlib
+import os
+import shutil
+import tempfile
+from .providers import TTSProvider
+
+class CachedTTSProvider(TTSProvider):
+    """Decorator caching the audio of another provider on disk
+
+    Entries are keyed by provider identity (class and voice), audio format,
+    language and text, so changing voice, provider or format never serves
+    stale audio; they keep the extension of the provider's format.
+    """
+
+    def __init__(self, provider: TTSProvider, cache_dir: Path, **kwargs):
+        super().__init__(**kwargs)
+        self.provider = provider
+        self.cache_dir = Path(cache_dir)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def identity(self) -> str:
+        return self.provider.identity
+
+    @property
+    def audio_format(self):
+        return self.provider.audio_format
+
+    @property
+    def degraded(self) -> bool:
+        return self.provider.degraded
+
+    def cache_path(self, text: str, language: str) -> Path:
+        audio_format = self.provider.audio_format
+        key = hashlib.sha256('\0'.join([
+            self.provider.identity, audio_format.codec, str(audio_format.sample_rate),
+            str(audio_format.channels), language, text
+        ]).encode('utf-8')).hexdigest()
+        return self.cache_dir / key[:2] / f"{key}.{audio_format.extension}"
+
+    def synthesize(self, text: str, output_path: Path, language: str = 'it-IT') -> bool:
+        cached = self.cache_path(text, language)
+        if cached.exists():
+            self.logger.debug(f"TTS cache hit: {cached.name}")
+            shutil.copyfile(cached, output_path)
+            self.hits += 1
+            return True
+
+        self.misses += 1
+        if not self.provider.synthesize(text, output_path, language):
+            return False
+        if self.provider.degraded:
+            # Possibly another voice (runtime failover): not stored under this identity
+            return True
+
+        try:
+            # Write then rename, so concurrent renders never read a partial entry
+            cached.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=cached.parent, suffix='.part')
+            os.close(fd)
+            shutil.copyfile(output_path, tmp)
+            os.replace(tmp, cached)
+        except OSError as e:
+            self.logger.warning(f"Could not store TTS cache entry: {str(e)}")
+        return True
@@ -0,0 +1,115 @@
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import itertools
+import shutil
+import threading
+from .providers import TTSProvider
+
+class CoalescingTTSProvider(TTSProvider):
+    """Decorator batching consecutive speeches into fewer provider requests
+
+    `prefetch` joins runs of texts (up to `max_chars`) with a paragraph break,
+    synthesizes each run with a single request and splits the audio back at
+    the silences between the texts, so every speech keeps its own audio and
+    the slide timings stay exact. `synthesize` serves those pieces; texts that
+    were not prefetched, or whose batch could not be split unambiguously, are
+    synthesized on their own.
+    """
+
+    separator = '\n\n'
+
+    def __init__(self, provider: TTSProvider, work_dir: Path, max_chars: Optional[int] = None,
+                 sample_rate: int = 24000, **kwargs):
+        super().__init__(**kwargs)
+        self.provider = provider
+        self.work_dir = Path(work_dir)
+        self.max_chars = max_chars or provider.max_request_chars
+        self.sample_rate = sample_rate
+        self.requests = 0
+        self._pieces: Dict[Tuple[str, str], Path] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def identity(self) -> str:
+        return self.provider.identity
+
+    @property
+    def audio_format(self):
+        return self.provider.audio_format
+
+    @property
+    def degraded(self) -> bool:
+        return self.provider.degraded
+
+    def _count_request(self) -> int:
+        with self._lock:
+            self.requests += 1
+            return next(self._ids)
+
+    def batches(self, texts: List[str]) -> List[List[str]]:
+        """Group consecutive texts into runs that fit in one request"""
+        batches: List[List[str]] = []
+        size = 0
+        for text in texts:
+            added = len(text) + len(self.separator)
+            if batches and size + added <= self.max_chars:
+                batches[-1].append(text)
+                size += added
+            else:
+                batches.append([text])
+                size = len(text)
+        return batches
+
+    def prefetch(self, texts: List[str], language: str = 'it-IT'):
+        """Synthesize the texts in as few requests as possible, for later `synthesize` calls"""
+        pending = [t for t in dict.fromkeys(texts) if t and (t, language) not in self._pieces]
+        for batch in self.batches(pending):
+            # Single texts are synthesized on demand, straight into their file
+            if len(batch) > 1 and not self._synthesize_batch(batch, language):
+                self.logger.info(f"Could not split a batch of {len(batch)} speeches, "
+                                 "synthesizing them one by one")
+
+    def _synthesize_batch(self, batch: List[str], language: str) -> bool:
+        from ..audio import decode_pcm, encode_pcm, find_silences, split_points
+
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        batch_id = self._count_request()
+        joined = self.work_dir / f'batch_{batch_id}.{self.audio_format.extension}'
+        try:
+            if not self.provider.synthesize(self.separator.join(batch), joined, language):
+                return False
+
+            rate = self.sample_rate
+            samples = decode_pcm(joined, rate)
+            duration = len(samples) / rate
+            gaps = split_points(find_silences(samples, rate), duration, [len(t) for t in batch])
+            if gaps is None:
+                return False
+
+            # Keep a little of each gap around the pieces, not to clip the last syllable
+            pad = 0.05
+            starts = [0.0] + [max(gap[1] - pad, (gap[0] + gap[1]) / 2) for gap in gaps]
+            ends = [min(gap[0] + pad, (gap[0] + gap[1]) / 2) for gap in gaps] + [duration]
+            pieces = {}
+            for n, (text, start, end) in enumerate(zip(batch, starts, ends)):
+                # Same container as the provider, pieces and single requests are interchangeable
+                piece = self.work_dir / f'batch_{batch_id}_{n}.{self.audio_format.extension}'
+                encode_pcm(samples[int(start * rate):int(end * rate)], rate, piece)
+                pieces[(text, language)] = piece
+            self._pieces.update(pieces)
+            return True
+
+        except Exception as e:
+            self.logger.warning(f"Error splitting coalesced speech: {str(e)}")
+            return False
+        finally:
+            joined.unlink(missing_ok=True)
+
+    def synthesize(self, text: str, output_path: Path, language: str = 'it-IT') -> bool:
+        piece = self._pieces.get((text, language))
+        if piece is not None and piece.exists():
+            shutil.copyfile(piece, output_path)
+            return True
+        self._count_request()
+        return self.provider.synthesize(text, output_path, language)
@@ -1,14 +1,17 @@
 from enum import Enum
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Union
+from importlib import import_module
+from pathlib import Path
 import os
 from dataclasses import dataclass
 import logging
-from .providers import TTSProvider, GttsTTSProvider, AzureTTSProvider
+from .providers import TTSProvider
 
 class TTSProviderType(Enum):
     """Enumeration of available TTS providers"""
     GTTS = "gtts"
     AZURE = "azure"
+    SYNTHETIC = "synthetic"  # offline, for benchmarks and load tests
 
 @dataclass
 class TTSConfig:
@@ -31,24 +34,19 @@ class TTSConfiguration:
         # Default configurations per environment
         self.configs = {
             'dev': {
-                'default': TTSConfig(
-                    provider_type=TTSProviderType(os.getenv('DEV_TTS_PROVIDER', 'gtts')),
-                    config={}
-                ),
+                'default': self._default_config(os.getenv('DEV_TTS_PROVIDER', 'gtts'), {}),
                 'fallback': TTSConfig(
                     provider_type=TTSProviderType.GTTS,
                     config={}
                 )
             },
             'prod': {
-                'default': TTSConfig(
-                    provider_type=TTSProviderType(os.getenv('PROD_TTS_PROVIDER', 'azure')),
-                    config={
-                        'subscription_key': os.getenv('AZURE_SPEECH_KEY'),
-                        'region': os.getenv('AZURE_SPEECH_REGION'),
-                        'voice_name': os.getenv('AZURE_VOICE_NAME', 'it-IT-IsabellaNeural')
-                    }
-                ),
+                'default': self._default_config(os.getenv('PROD_TTS_PROVIDER', 'azure'), {
+                    'subscription_key': os.getenv('AZURE_SPEECH_KEY'),
+                    'region': os.getenv('AZURE_SPEECH_REGION'),
+                    'voice_name': os.getenv('AZURE_VOICE_NAME', 'it-IT-IsabellaNeural'),
+                    'pool_size': int(os.getenv('AZURE_SYNTHESIZER_POOL', '2'))
+                }),
                 'fallback': TTSConfig(
                     provider_type=TTSProviderType.GTTS,
                     config={}
@@ -63,6 +61,26 @@ class TTSConfiguration:
             }
         }
 
+    @staticmethod
+    def _default_config(provider: str, config: Dict[str, Any]) -> TTSConfig:
+        """Default provider of an environment; the synthetic one has its own settings"""
+        provider_type = TTSProviderType(provider)
+        if provider_type == TTSProviderType.SYNTHETIC:
+            capacity = os.getenv('SYNTHETIC_TTS_CAPACITY')
+            config = {
+                'chars_per_second': float(os.getenv('SYNTHETIC_TTS_CHARS_PER_SECOND', '15')),
+                'latency': float(os.getenv('SYNTHETIC_TTS_LATENCY', '0')),
+                'char_latency': float(os.getenv('SYNTHETIC_TTS_CHAR_LATENCY', '0')),
+                'jitter': float(os.getenv('SYNTHETIC_TTS_JITTER', '0')),
+                'error_rate': float(os.getenv('SYNTHETIC_TTS_ERROR_RATE', '0')),
+                'throttle_rate': float(os.getenv('SYNTHETIC_TTS_THROTTLE_RATE', '0')),
+                'capacity': int(capacity) if capacity else None,
+                'seed': int(os.getenv('SYNTHETIC_TTS_SEED', '0')),
+            }
+        elif provider_type != TTSProviderType.AZURE:
+            config = {}
+        return TTSConfig(provider_type=provider_type, config=config)
+
     def get_provider_config(self) -> TTSConfig:
         """Get the appropriate TTS configuration for current environment"""
         env_config = self.configs.get(self.environment, self.configs['dev'])
@@ -80,31 +98,117 @@ class TTSConfiguration:
         self.logger.info(f"Using TTS provider: {provider_config.provider_type.value}")
         return provider_config
 
+    def get_fallback_config(self) -> Optional[TTSConfig]:
+        """Provider used at runtime when the default one fails, None if there is none"""
+        env_config = self.configs.get(self.environment, self.configs['dev'])
+        fallback = env_config['fallback']
+        if fallback is None or fallback.provider_type == self.get_provider_config().provider_type:
+            return None
+        return fallback
+
+    @property
+    def resilience(self) -> Dict[str, Any]:
+        """Settings of the runtime failover wrapper (see ResilientTTSProvider)"""
+        return {
+            'timeout': float(os.getenv('TTS_TIMEOUT', '30')),
+            'hedge': os.getenv('TTS_HEDGE', 'true').lower() == 'true',
+            'hedge_quantile': float(os.getenv('TTS_HEDGE_QUANTILE', '0.95')),
+            'failure_threshold': int(os.getenv('TTS_BREAKER_FAILURES', '5')),
+            'reset_timeout': float(os.getenv('TTS_BREAKER_RESET', '30')),
+        }
+
+    @property
+    def concurrency(self) -> Optional[Dict[str, Any]]:
+        """Settings of the adaptive concurrency limit (see AdaptiveLimiter), None if disabled"""
+        if os.getenv('TTS_ADAPTIVE_LIMIT', 'true').lower() != 'true':
+            return None
+        return {
+            'initial': float(os.getenv('TTS_LIMIT_INITIAL', '4')),
+            'min_limit': float(os.getenv('TTS_LIMIT_MIN', '1')),
+            'max_limit': float(os.getenv('TTS_LIMIT_MAX', '32')),
+            'shared_dir': os.getenv('TTS_LIMIT_DIR') or None,
+        }
+
 class EnhancedTTSFactory:
     """Enhanced factory for creating TTS providers"""
 
-    _providers = {}  # Cache for provider instances
+    _providers = {}  # Registered provider classes or "module:Class" import paths
     logger = logging.getLogger("EnhancedTTSFactory")
 
     @classmethod
-    def register_provider(cls, provider_type: TTSProviderType, provider_class: type):
-        """Register a new provider class"""
+    def register_provider(cls, provider_type: TTSProviderType, provider_class: Union[type, str]):
+        """Register a new provider class
+
+        The class can be given as an import path ("package.module:ClassName"),
+        in which case its module is only imported when the provider is created.
+        """
         cls._providers[provider_type] = provider_class
-        cls.logger.info(f"Registered TTS provider: {provider_type.value}")
+        cls.logger.debug(f"Registered TTS provider: {provider_type.value}")
+
+    @classmethod
+    def get_provider_class(cls, provider_type: TTSProviderType) -> type:
+        """Return the provider class, importing it if registered lazily"""
+        provider_class = cls._providers.get(provider_type)
+        if provider_class is None:
+            raise ValueError(f"No provider registered for type {provider_type}")
+
+        if isinstance(provider_class, str):
+            module_name, class_name = provider_class.split(':')
+            provider_class = getattr(import_module(module_name), class_name)
+            cls._providers[provider_type] = provider_class
+
+        return provider_class
 
     @classmethod
     def create_provider(cls, config: Optional[TTSConfig] = None) -> TTSProvider:
-        """Create TTS provider based on configuration"""
+        """Create TTS provider based on configuration
+
+        Without an explicit configuration, the provider of the environment is
+        wrapped with timeouts, hedging and runtime failover to the fallback
+        provider (disable with TTS_RESILIENT=false), and the requests to each
+        provider share an adaptive concurrency limit (TTS_ADAPTIVE_LIMIT).
+        """
         if config is None:
-            config = TTSConfiguration().get_provider_config()
+            configuration = TTSConfiguration()
+            provider = cls._limited(configuration.get_provider_config(), configuration)
+            if os.getenv('TTS_RESILIENT', 'true').lower() != 'true':
+                return provider
 
-        provider_class = cls._providers.get(config.provider_type)
-        if provider_class is None:
-            raise ValueError(f"No provider registered for type {config.provider_type}")
+            from .resilient import ResilientTTSProvider
+            fallback_config = configuration.get_fallback_config()
+            fallback = (lambda: cls._limited(fallback_config, configuration)) if fallback_config else None
+            return ResilientTTSProvider(provider, fallback, **configuration.resilience)
+
+        provider_class = cls.get_provider_class(config.provider_type)
 
         cls.logger.info(f"Creating TTS provider instance: {config.provider_type.value}")
         return provider_class(**config.config)
 
-# Register available providers
-EnhancedTTSFactory.register_provider(TTSProviderType.GTTS, GttsTTSProvider)
-EnhancedTTSFactory.register_provider(TTSProviderType.AZURE, AzureTTSProvider)
\ No newline at end of file
+    @classmethod
+    def _limited(cls, config: TTSConfig, configuration: TTSConfiguration) -> TTSProvider:
+        """Create a provider whose requests are metered and go through the limiter of its type
+
+        The limiter is shared by every provider of that type in the process,
+        and across processes when TTS_LIMIT_DIR is set.
+        """
+        from .metered import MeteredTTSProvider
+        provider = MeteredTTSProvider(cls.create_provider(config))
+        settings = configuration.concurrency
+        if settings is None:
+            return provider
+
+        from .limiter import AdaptiveLimiter, FileAdaptiveLimiter, RateLimitedTTSProvider
+        settings = dict(settings)
+        shared_dir = settings.pop('shared_dir')
+        name = config.provider_type.value
+        if shared_dir:
+            limiter = FileAdaptiveLimiter.shared(f'{shared_dir}:{name}',
+                                                 path=Path(shared_dir) / f'{name}.json', **settings)
+        else:
+            limiter = AdaptiveLimiter.shared(name, **settings)
+        return RateLimitedTTSProvider(provider, limiter, timeout=configuration.resilience['timeout'])
+
+# Register available providers, imported on first use
+EnhancedTTSFactory.register_provider(TTSProviderType.GTTS, f'{__package__}.providers.gtts:GttsTTSProvider')
+EnhancedTTSFactory.register_provider(TTSProviderType.AZURE, f'{__package__}.providers.azure:AzureTTSProvider')
+EnhancedTTSFactory.register_provider(TTSProviderType.SYNTHETIC, f'{__package__}.providers.synthetic:SyntheticTTSProvider')
@@ -0,0 +1,227 @@
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+import json
+import logging
+import os
+import threading
+import time
+from .providers import AudioTTSProvider, SynthesizedAudio, TTSError, TTSProvider
+from .. import metrics
+
+class AdaptiveLimiter:
+    """AIMD limit on the requests in flight to a provider
+
+    Each healthy answer raises the limit by `increase / limit` (about +1 per
+    round of requests) while the latency stays within `latency_tolerance`
+    times the best recent one and at least half the limit is in use (an
+    idle limit would otherwise grow without bound); a throttled answer (HTTP 429) or a timeout
+    multiplies it by `decrease`, at most once per `backoff_interval`, so a
+    burst of rejections counts as one congestion signal. Plain errors leave
+    the limit unchanged. The limit converges on what the provider sustains.
+    """
+
+    _shared: Dict[str, 'AdaptiveLimiter'] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, initial: float = 4, min_limit: float = 1, max_limit: float = 32,
+                 increase: float = 1.0, decrease: float = 0.5,
+                 latency_tolerance: float = 2.0, backoff_interval: float = 1.0):
+        self.limit = float(initial)
+        self.min_limit = float(min_limit)
+        self.max_limit = float(max_limit)
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.backoff_interval = backoff_interval
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._cond = threading.Condition()
+        self._init_state()
+
+    def _init_state(self):
+        """Requests in flight, latency baseline and last backoff, kept in memory"""
+        self.in_flight = 0
+        self.baseline: Optional[float] = None
+        self._last_backoff = 0.0
+
+    @classmethod
+    def shared(cls, name: str, **kwargs) -> 'AdaptiveLimiter':
+        """The process-wide limiter of a provider, created with `kwargs` on first use"""
+        with cls._shared_lock:
+            if name not in cls._shared:
+                cls._shared[name] = cls(**kwargs)
+            return cls._shared[name]
+
+    def _adjust(self, limit: float, baseline: Optional[float], last_backoff: float,
+                outcome: str, latency: float, now: float, in_flight: int):
+        """AIMD step, returns the new (limit, baseline, last_backoff)"""
+        if outcome in ('throttled', 'timeout'):
+            if now - last_backoff >= self.backoff_interval:
+                limit = max(self.min_limit, limit * self.decrease)
+                last_backoff = now
+                self.logger.info(f"TTS {outcome}, concurrency limit down to {limit:.1f}")
+        elif outcome == 'ok':
+            # The baseline slowly forgets, so it follows a provider that got slower for good
+            baseline = latency if baseline is None else min(latency, baseline * 1.05)
+            if latency <= baseline * self.latency_tolerance and in_flight * 2 >= limit:
+                limit = min(self.max_limit, limit + self.increase / limit)
+        return limit, baseline, last_backoff
+
+    def acquire(self):
+        """Wait for a free slot"""
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, outcome: str = 'ok', latency: float = 0.0):
+        """Free a slot, reporting how the request went: ok, throttled, timeout or error"""
+        with self._cond:
+            self.limit, self.baseline, self._last_backoff = self._adjust(
+                self.limit, self.baseline, self._last_backoff, outcome, latency,
+                time.monotonic(), self.in_flight
+            )
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, timeout: Optional[float] = None):
+        """Hold a slot around a request, classifying its outcome
+
+        A request slower than `timeout` counts as a timeout even if it succeeded.
+        """
+        metrics.QUEUE_DEPTH.inc(queue='tts')
+        try:
+            self.acquire()
+        finally:
+            metrics.QUEUE_DEPTH.dec(queue='tts')
+        start = time.monotonic()
+        outcome = 'error'
+        try:
+            yield
+            outcome = 'ok'
+        except TTSError as e:
+            outcome = 'throttled' if e.throttled else 'error'
+            raise
+        finally:
+            latency = time.monotonic() - start
+            if timeout is not None and latency > timeout:
+                outcome = 'timeout'
+            self.release(outcome, latency)
+
+class FileAdaptiveLimiter(AdaptiveLimiter):
+    """AdaptiveLimiter whose state lives in a locked file shared by processes
+
+    Every process using the same `path` (e.g. parallel batch renders) draws
+    from one limit. Slots are recorded per process id, so the slots of a
+    process that died are reclaimed.
+    """
+
+    def __init__(self, path: Path, poll_interval: float = 0.05, **kwargs):
+        super().__init__(**kwargs)
+        self.path = Path(path)
+        self.poll_interval = poll_interval
+
+    @contextmanager
+    def _state(self):
+        import fcntl
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'a+', encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    state = json.loads(f.read() or '{}')
+                except ValueError:
+                    state = {}
+                state.setdefault('limit', self.limit)
+                state.setdefault('baseline', None)
+                state.setdefault('last_backoff', 0.0)
+                state['slots'] = {pid: n for pid, n in state.get('slots', {}).items()
+                                  if n > 0 and self._alive(int(pid))}
+                yield state
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+            return True
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+
+    def acquire(self):
+        pid = str(os.getpid())
+        while True:
+            with self._state() as state:
+                if sum(state['slots'].values()) < int(state['limit']):
+                    state['slots'][pid] = state['slots'].get(pid, 0) + 1
+                    self.limit = state['limit']
+                    return
+            time.sleep(self.poll_interval)
+
+    def release(self, outcome: str = 'ok', latency: float = 0.0):
+        pid = str(os.getpid())
+        with self._state() as state:
+            # Monotonic clocks are not comparable across processes: wall time instead
+            state['limit'], state['baseline'], state['last_backoff'] = self._adjust(
+                state['limit'], state['baseline'], state['last_backoff'], outcome, latency,
+                time.time(), sum(state['slots'].values())
+            )
+            state['slots'][pid] = max(0, state['slots'].get(pid, 0) - 1)
+            self.limit = state['limit']
+
+    def _init_state(self):
+        # Kept in the file, created by the first `_state()`
+        pass
+
+    @property
+    def in_flight(self) -> int:
+        with self._state() as state:
+            return sum(state['slots'].values())
+
+class RateLimitedTTSProvider(AudioTTSProvider):
+    """Decorator sending the requests of a provider through an AdaptiveLimiter
+
+    Callers that time requests themselves (ResilientTTSProvider) hold a
+    `slot()` and send through `unlimited`, so waiting for the slot is not
+    request time.
+    """
+
+    def __init__(self, provider: TTSProvider, limiter: AdaptiveLimiter,
+                 timeout: Optional[float] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.provider = provider
+        self.limiter = limiter
+        self.timeout = timeout
+
+    @property
+    def identity(self) -> str:
+        return self.provider.identity
+
+    @property
+    def audio_format(self):
+        return self.provider.audio_format
+
+    @property
+    def max_request_chars(self) -> int:
+        return self.provider.max_request_chars
+
+    @property
+    def unlimited(self) -> TTSProvider:
+        """The wrapped provider, for requests sent while holding a `slot()`"""
+        return self.provider
+
+    def slot(self):
+        return self.limiter.slot(self.timeout)
+
+    def synthesize_bytes(self, text: str, language: str = 'it-IT') -> SynthesizedAudio:
+        with self.slot():
+            return self.provider.synthesize_bytes(text, language)
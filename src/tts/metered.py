@@ -0,0 +1,54 @@
+from typing import Iterator
+import time
+from .providers import AudioTTSProvider, SynthesizedAudio, TTSProvider
+from .. import metrics
+
+class MeteredTTSProvider(AudioTTSProvider):
+    """Decorator recording each request of a provider in the TTS metrics
+
+    The factory puts it right around every provider it creates, under the
+    limiter and the runtime failover, so each request to the service is
+    counted once however the stack is configured (TTS_RESILIENT,
+    TTS_ADAPTIVE_LIMIT). Latency does not include waiting for a slot.
+    """
+
+    def __init__(self, provider: TTSProvider, **kwargs):
+        super().__init__(**kwargs)
+        self.provider = provider
+
+    @property
+    def identity(self) -> str:
+        return self.provider.identity
+
+    @property
+    def audio_format(self):
+        return self.provider.audio_format
+
+    @property
+    def max_request_chars(self) -> int:
+        return self.provider.max_request_chars
+
+    def _record(self, start: float, ok: bool):
+        metrics.TTS_REQUESTS.inc(provider=self.identity, outcome='ok' if ok else 'error')
+        if ok:
+            metrics.TTS_LATENCY.observe(time.monotonic() - start, provider=self.identity)
+
+    def synthesize_bytes(self, text: str, language: str = 'it-IT') -> SynthesizedAudio:
+        start = time.monotonic()
+        try:
+            audio = self.provider.synthesize_bytes(text, language)
+        except Exception:
+            self._record(start, False)
+            raise
+        self._record(start, True)
+        return audio
+
+    def iter_audio(self, text: str, language: str = 'it-IT') -> Iterator[bytes]:
+        # Streamed requests are measured until the last chunk
+        start = time.monotonic()
+        try:
+            yield from self.provider.iter_audio(text, language)
+        except Exception:
+            self._record(start, False)
+            raise
+        self._record(start, True)
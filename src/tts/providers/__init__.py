@@ -1,5 +1,19 @@
-from .base import TTSProvider
-from .gtts import GttsTTSProvider
-from .azure import AzureTTSProvider
+from importlib import import_module
+from .base import TTSProvider, AudioTTSProvider, AudioFormat, SynthesizedAudio, TTSError
 
-__all__ = ['TTSProvider', 'GttsTTSProvider', 'AzureTTSProvider']
\ No newline at end of file
+# Concrete providers import their SDKs (gTTS, Azure Speech) at module level,
+# so they are only loaded when first accessed
+_LAZY_PROVIDERS = {
+    'GttsTTSProvider': '.gtts',
+    'AzureTTSProvider': '.azure',
+    'SyntheticTTSProvider': '.synthetic',
+}
+
+def __getattr__(name: str):
+    if name in _LAZY_PROVIDERS:
+        module = import_module(_LAZY_PROVIDERS[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+__all__ = ['TTSProvider', 'AudioTTSProvider', 'AudioFormat', 'SynthesizedAudio', 'TTSError',
+           'GttsTTSProvider', 'AzureTTSProvider', 'SyntheticTTSProvider']
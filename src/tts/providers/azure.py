@@ -1,51 +1,158 @@
-from pathlib import Path
+from typing import Iterator, Optional
+import queue
+import threading
 import azure.cognitiveservices.speech as speechsdk
-from .base import TTSProvider
+from .base import AudioTTSProvider, AudioFormat, SynthesizedAudio, TTSError
 
-class AzureTTSProvider(TTSProvider):
-    """Azure Speech Services implementation"""
+class AzureTTSProvider(AudioTTSProvider):
+    """Azure Speech Services implementation
+
+    Keeps a small pool of long-lived synthesizers, so the connection to the
+    service is set up once per synthesizer instead of once per speech, and
+    receives the audio in memory as 24 kHz 16-bit mono PCM (in a WAV header):
+    no intermediate file and no MP3 decode. Each synthesizer serves one request
+    at a time, so up to `pool_size` threads synthesize concurrently.
+    `iter_audio` streams the audio while it is being synthesized.
+    """
+
+    max_request_chars = 5000
+    # 24 kHz is the native rate of the neural voices
+    output_format = speechsdk.SpeechSynthesisOutputFormat.Riff24Khz16BitMonoPcm
+    audio_format = AudioFormat('wav', 24000, 1)
+    # Bytes read at a time when streaming
+    chunk_size = 16000
 
     def __init__(self, subscription_key: str, region: str,
-                 voice_name: str = 'it-IT-IsabellaNeural', **kwargs):
+                 voice_name: str = 'it-IT-IsabellaNeural', pool_size: int = 2,
+                 prewarm: bool = True, **kwargs):
         super().__init__(**kwargs)
         self.subscription_key = subscription_key
         self.region = region
         self.voice_name = voice_name
+        self.pool_size = max(1, pool_size)
+        self._pool: queue.LifoQueue = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        if prewarm:
+            threading.Thread(target=self.warm_up, name='azure-tts-warmup', daemon=True).start()
 
-    def synthesize(self, text: str, output_path: Path, language: str = 'it-IT') -> bool:
-        try:
-            self.logger.info(f"Synthesizing text with Azure (voice: {self.voice_name})")
+    @property
+    def identity(self) -> str:
+        return f"{self.__class__.__name__}:{self.voice_name}"
 
-            # Configure speech service
-            speech_config = speechsdk.SpeechConfig(
-                subscription=self.subscription_key,
-                region=self.region
-            )
+    def _create_synthesizer(self) -> speechsdk.SpeechSynthesizer:
+        speech_config = speechsdk.SpeechConfig(
+            subscription=self.subscription_key,
+            region=self.region
+        )
+        speech_config.speech_synthesis_voice_name = self.voice_name
+        speech_config.set_speech_synthesis_output_format(self.output_format)
 
-            # Set speech synthesis voice
-            speech_config.speech_synthesis_voice_name = self.voice_name
+        # No audio config: the audio is only returned in the result
+        synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=None)
+        # Open the connection now rather than on the first request
+        speechsdk.Connection.from_speech_synthesizer(synthesizer).open(True)
+        return synthesizer
 
-            # Configure audio output
-            audio_config = speechsdk.AudioConfig(filename=str(output_path))
+    def warm_up(self):
+        """Create the synthesizers of the pool and connect them to the service"""
+        try:
+            while True:
+                with self._lock:
+                    if self._created >= self.pool_size:
+                        return
+                    self._created += 1
+                try:
+                    self._pool.put(self._create_synthesizer())
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+        except Exception as e:
+            self.logger.warning(f"Could not pre-warm Azure synthesizers: {str(e)}")
+
+    def _acquire(self) -> speechsdk.SpeechSynthesizer:
+        """Take an idle synthesizer, creating one while the pool is not full"""
+        while True:
+            with self._lock:
+                create = self._pool.empty() and self._created < self.pool_size
+                if create:
+                    self._created += 1
+            if create:
+                try:
+                    return self._create_synthesizer()
+                except Exception:
+                    self._discard()
+                    raise
+            try:
+                # Wake up now and then: a synthesizer being warmed up may fail
+                return self._pool.get(timeout=0.5)
+            except queue.Empty:
+                continue
 
-            # Create synthesizer
-            synthesizer = speechsdk.SpeechSynthesizer(
-                speech_config=speech_config,
-                audio_config=audio_config
-            )
+    def _discard(self, synthesizer: Optional[speechsdk.SpeechSynthesizer] = None):
+        """Close and forget a broken synthesizer, a new one is created on demand"""
+        with self._lock:
+            self._created -= 1
+        if synthesizer is None:
+            return
+        # The SDK has no close() for the synthesizer: stop what it is still
+        # speaking and close its connection, the handle goes with the object
+        try:
+            synthesizer.stop_speaking()
+            speechsdk.Connection.from_speech_synthesizer(synthesizer).close()
+        except Exception as e:
+            self.logger.debug(f"Error closing Azure synthesizer: {str(e)}")
 
-            # Perform synthesis
+    def synthesize_bytes(self, text: str, language: str = 'it-IT') -> SynthesizedAudio:
+        """Synthesize to an in-memory WAV file (24 kHz, 16-bit, mono)"""
+        synthesizer = self._acquire()
+        try:
+            self.logger.info(f"Synthesizing text with Azure (voice: {self.voice_name})")
             result = synthesizer.speak_text_async(text).get()
+        except Exception as e:
+            self._discard(synthesizer)
+            raise TTSError(str(e), self.identity) from e
 
-            if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
-                self.logger.info("Azure synthesis completed successfully")
-                return True
-            else:
-                self.logger.error(
-                    f"Azure synthesis failed: {result.reason} {result.error_details}"
-                )
-                return False
+        if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
+            self._pool.put(synthesizer)
+            self.logger.info("Azure synthesis completed successfully")
+            return SynthesizedAudio.from_wav(result.audio_data)
 
-        except Exception as e:
-            self.logger.error(f"Error in Azure synthesis: {str(e)}")
-            return False
\ No newline at end of file
+        # The connection may be broken (e.g. expired token): do not reuse it
+        self._discard(synthesizer)
+        raise TTSError(f"synthesis failed: {result.reason} {self._error_details(result)}",
+                       self.identity, throttled=self._throttled(result))
+
+    def iter_audio(self, text: str, language: str = 'it-IT') -> Iterator[bytes]:
+        """Yield the WAV data while it is being synthesized"""
+        synthesizer = self._acquire()
+        try:
+            self.logger.info(f"Streaming text with Azure (voice: {self.voice_name})")
+            result = synthesizer.start_speaking_text_async(text).get()
+            stream = speechsdk.AudioDataStream(result)
+            buffer = bytes(self.chunk_size)
+            filled = stream.read_data(buffer)
+            while filled > 0:
+                # The SDK refills the same buffer: yield a copy
+                yield bytes(memoryview(buffer)[:filled])
+                filled = stream.read_data(buffer)
+            if stream.status != speechsdk.StreamStatus.AllData:
+                raise TTSError(f"synthesis failed: {self._error_details(stream)}", self.identity,
+                               throttled=self._throttled(stream))
+        except BaseException as e:
+            self._discard(synthesizer)
+            if isinstance(e, Exception) and not isinstance(e, TTSError):
+                raise TTSError(str(e), self.identity) from e
+            raise
+        self._pool.put(synthesizer)
+
+    @staticmethod
+    def _throttled(result) -> bool:
+        details = getattr(result, 'cancellation_details', None)
+        return getattr(details, 'error_code', None) == speechsdk.CancellationErrorCode.TooManyRequests
+
+    @staticmethod
+    def _error_details(result) -> str:
+        details = getattr(result, 'cancellation_details', None)
+        return getattr(details, 'error_details', '') if details else ''
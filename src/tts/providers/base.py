@@ -1,14 +1,75 @@
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import AsyncIterator, Iterator, Optional
+import io
 import logging
+import os
+import tempfile
+import threading
+import wave
+
+class TTSError(Exception):
+    """A speech could not be synthesized
+
+    `throttled` is set when the provider refused the request because of its
+    rate limit (HTTP 429), the signal the adaptive limiter backs off on.
+    """
+
+    def __init__(self, message: str, provider: Optional[str] = None, throttled: bool = False):
+        super().__init__(f"{provider}: {message}" if provider else message)
+        self.provider = provider
+        self.throttled = throttled
+
+@dataclass(frozen=True)
+class AudioFormat:
+    """Encoding of synthesized audio, None when not known in advance"""
+    codec: str                          # 'mp3', 'wav' (PCM in a RIFF header) or 'pcm_s16le'
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
+
+    @property
+    def extension(self) -> str:
+        return {'pcm_s16le': 'raw'}.get(self.codec, self.codec)
+
+@dataclass
+class SynthesizedAudio:
+    """Audio returned by a provider, with its format and duration (if known)"""
+    data: bytes
+    format: AudioFormat
+    duration: Optional[float] = None
+
+    @classmethod
+    def from_wav(cls, data: bytes) -> 'SynthesizedAudio':
+        """Wrap WAV data, reading format and duration from its header"""
+        with wave.open(io.BytesIO(data)) as wav:
+            rate, channels, frames = wav.getframerate(), wav.getnchannels(), wav.getnframes()
+        return cls(data, AudioFormat('wav', rate, channels), frames / rate if rate else None)
 
 class TTSProvider(ABC):
-    """Base abstract class for TTS providers"""
+    """Base abstract class for TTS providers
+
+    Providers implement the file-based `synthesize`. The bytes and streaming
+    methods have working defaults on top of it, so every provider can be used
+    through either interface; providers that produce audio in memory derive
+    from `AudioTTSProvider` instead.
+    """
+
+    # Longest text sent in a single request when speeches are coalesced
+    max_request_chars = 1000
+    # Format of the audio files written by `synthesize`
+    audio_format = AudioFormat('mp3')
+    # True while the audio may come from another voice than `identity` (runtime failover)
+    degraded = False
 
     def __init__(self, **kwargs):
         self.logger = logging.getLogger(self.__class__.__name__)
 
+    @property
+    def identity(self) -> str:
+        """Identifies the voice produced by this provider, e.g. for caching"""
+        return self.__class__.__name__
+
     @abstractmethod
     def synthesize(self, text: str, output_path: Path, language: str = 'it-IT') -> bool:
         """
@@ -22,4 +83,64 @@ class TTSProvider(ABC):
         Returns:
             bool: True if successful, False otherwise
         """
-        pass
\ No newline at end of file
+        pass
+
+    def synthesize_bytes(self, text: str, language: str = 'it-IT') -> SynthesizedAudio:
+        """Synthesize speech in memory, raising TTSError on failure"""
+        fd, tmp = tempfile.mkstemp(suffix=f'.{self.audio_format.extension}')
+        os.close(fd)
+        try:
+            if not self.synthesize(text, Path(tmp), language):
+                raise TTSError("synthesis failed", self.identity)
+            return SynthesizedAudio(Path(tmp).read_bytes(), self.audio_format)
+        finally:
+            os.unlink(tmp)
+
+    def iter_audio(self, text: str, language: str = 'it-IT') -> Iterator[bytes]:
+        """Yield the audio in chunks as soon as they are available"""
+        yield self.synthesize_bytes(text, language).data
+
+    async def astream(self, text: str, language: str = 'it-IT') -> AsyncIterator[bytes]:
+        """Asynchronous `iter_audio`: the provider runs in a thread, chunks are
+        yielded to the event loop as they arrive"""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+        done = object()
+
+        def produce():
+            try:
+                for chunk in self.iter_audio(text, language):
+                    loop.call_soon_threadsafe(chunks.put_nowait, chunk)
+                loop.call_soon_threadsafe(chunks.put_nowait, done)
+            except Exception as e:
+                loop.call_soon_threadsafe(chunks.put_nowait, e)
+
+        threading.Thread(target=produce, name='tts-stream', daemon=True).start()
+        while True:
+            chunk = await chunks.get()
+            if chunk is done:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+class AudioTTSProvider(TTSProvider):
+    """Base class for providers producing audio in memory
+
+    Subclasses implement `synthesize_bytes` (and `iter_audio` when they can
+    stream); the file-based `synthesize` writes that audio out.
+    """
+
+    @abstractmethod
+    def synthesize_bytes(self, text: str, language: str = 'it-IT') -> SynthesizedAudio:
+        pass
+
+    def synthesize(self, text: str, output_path: Path, language: str = 'it-IT') -> bool:
+        try:
+            Path(output_path).write_bytes(self.synthesize_bytes(text, language).data)
+            return True
+        except Exception as e:
+            self.logger.error(f"Error in {self.__class__.__name__} synthesis: {str(e)}")
+            return False
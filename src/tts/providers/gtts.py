@@ -1,24 +1,95 @@
-from pathlib import Path
-from gtts import gTTS
-from .base import TTSProvider
+from contextlib import contextmanager
+from typing import Iterator
+import base64
+import queue
+import re
+import urllib.request
+import requests
+from gtts import gTTS, gTTSError
+from .base import AudioTTSProvider, AudioFormat, SynthesizedAudio, TTSError
 
-class GttsTTSProvider(TTSProvider):
-    """Google TTS implementation"""
+# Release whose `gTTS.stream` is mirrored below, pinned in requirements.txt and setup.py
+GTTS_VERSION = '2.3.2'
 
-    def __init__(self, **kwargs):
+class _SessionTTS(gTTS):
+    """gTTS sending its requests through a given keep-alive session
+
+    gTTS opens a new session, hence a new TLS connection, for each of the
+    requests a text is split into; this sends them all on `session`. `stream`
+    follows `gTTS.stream` of GTTS_VERSION and relies on its internals
+    (`_prepare_requests`, the RPC id, the audio regex): tests/tts/test_gtts.py
+    fails when they change, so the copy is checked on every upgrade.
+    """
+
+    _AUDIO = re.compile(r'jQ1olc","\[\\"(.*)\\"]')
+
+    def __init__(self, text: str, session: requests.Session, timeout: float, **kwargs):
+        super().__init__(text, **kwargs)
+        self.session = session
+        self.timeout = timeout
+
+    def stream(self):
+        for pr in self._prepare_requests():
+            try:
+                response = self.session.send(pr, proxies=urllib.request.getproxies(),
+                                             timeout=self.timeout)
+                response.raise_for_status()
+            except requests.exceptions.HTTPError:
+                raise gTTSError(tts=self, response=response)
+            except requests.exceptions.RequestException:
+                raise gTTSError(tts=self)
+
+            # Reading the whole body hands the connection back to the pool
+            for line in response.iter_lines(chunk_size=1024):
+                decoded_line = line.decode('utf-8')
+                if self.GOOGLE_TTS_RPC in decoded_line:
+                    audio = self._AUDIO.search(decoded_line)
+                    if not audio:
+                        raise gTTSError(tts=self, response=response)
+                    yield base64.b64decode(audio.group(1).encode('ascii'))
+
+class GttsTTSProvider(AudioTTSProvider):
+    """Google TTS implementation
+
+    Requests go through a pool of keep-alive HTTP sessions, one per concurrent
+    caller, so the TLS handshake is paid once per session instead of once per
+    sentence. The MP3 parts of long texts are streamed as each request
+    completes. Safe to use from several threads.
+    """
+
+    audio_format = AudioFormat('mp3', 24000, 1)
+
+    def __init__(self, timeout: float = 30.0, **kwargs):
         super().__init__(**kwargs)
+        self.timeout = timeout
+        self._sessions: queue.LifoQueue = queue.LifoQueue()
 
-    def synthesize(self, text: str, output_path: Path, language: str = 'it-IT') -> bool:
+    @contextmanager
+    def _session(self):
+        """Borrow an idle session (or a new one), dropping it if a request fails"""
         try:
-            # Convert language code format if needed
-            lang = language.split('-')[0]  # Convert 'it-IT' to 'it'
+            session = self._sessions.get_nowait()
+        except queue.Empty:
+            session = requests.Session()
+        try:
+            yield session
+        except BaseException:
+            # Also when a stream is abandoned half-way: the connection is mid-response
+            session.close()
+            raise
+        self._sessions.put(session)
 
-            self.logger.info(f"Synthesizing text with GTTS (lang: {lang})")
-            tts = gTTS(text=text, lang=lang)
-            tts.save(str(output_path))
+    def iter_audio(self, text: str, language: str = 'it-IT') -> Iterator[bytes]:
+        # Convert language code format if needed
+        lang = language.split('-')[0]  # Convert 'it-IT' to 'it'
 
-            return True
+        self.logger.info(f"Synthesizing text with GTTS (lang: {lang})")
+        try:
+            with self._session() as session:
+                yield from _SessionTTS(text, session, self.timeout, lang=lang).stream()
+        except (gTTSError, ValueError, AssertionError) as e:
+            status = getattr(getattr(e, 'rsp', None), 'status_code', None)
+            raise TTSError(str(e), self.identity, throttled=status == 429) from e
 
-        except Exception as e:
-            self.logger.error(f"Error in GTTS synthesis: {str(e)}")
-            return False
\ No newline at end of file
+    def synthesize_bytes(self, text: str, language: str = 'it-IT') -> SynthesizedAudio:
+        return SynthesizedAudio(b''.join(self.iter_audio(text, language)), self.audio_format)
@@ -0,0 +1,102 @@
+from typing import Optional
+import hashlib
+import io
+import random
+import re
+import threading
+import time
+import wave
+import zlib
+from .base import AudioTTSProvider, AudioFormat, SynthesizedAudio, TTSError
+
+class SyntheticTTSProvider(AudioTTSProvider):
+    """Offline provider producing deterministic speech-like audio
+
+    Each word becomes a tone burst lasting its length divided by
+    `chars_per_second`, followed by a pause for punctuation (longer at the end
+    of sentences and paragraphs), so durations and silences are those of real
+    speech and the same text always gives the same bytes. Meant for
+    benchmarks and load tests on machines without network access:
+
+    - `latency` seconds per request plus `char_latency` per character, and
+      an exponentially distributed `jitter` with that mean (a long tail);
+    - `error_rate` of the requests fail, `throttle_rate` are rejected as
+      rate limited (HTTP 429), and so is every request beyond `capacity`
+      concurrent ones.
+
+    The random draws come from `seed`, so a sequential run is repeatable.
+    """
+
+    max_request_chars = 5000
+    audio_format = AudioFormat('wav', 24000, 1)
+
+    PAUSES = {'paragraph': 0.6, 'sentence': 0.35, 'clause': 0.15, 'word': 0.04}
+
+    def __init__(self, chars_per_second: float = 15.0, latency: float = 0.0,
+                 char_latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, capacity: Optional[int] = None,
+                 seed: int = 0, voice: str = 'synthetic', **kwargs):
+        super().__init__(**kwargs)
+        self.chars_per_second = chars_per_second
+        self.latency = latency
+        self.char_latency = char_latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.capacity = capacity
+        self.voice = voice
+        self.requests = 0
+        self.in_flight = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def identity(self) -> str:
+        return f"{self.__class__.__name__}:{self.voice}:{self.chars_per_second:g}"
+
+    def render(self, text: str) -> bytes:
+        """The WAV audio of `text`, without latency or injected failures"""
+        import numpy as np
+
+        rate = self.audio_format.sample_rate
+        # Pitch depends on the voice, so two voices never share cached audio by accident
+        base = 110 + int(hashlib.sha256(self.voice.encode()).hexdigest(), 16) % 80
+        parts = [np.zeros(int(0.1 * rate), dtype=np.float32)]
+        for token in re.findall(r'\n\s*\n|\S+', text):
+            if not token.strip():
+                parts.append(np.zeros(int(self.PAUSES['paragraph'] * rate), dtype=np.float32))
+                continue
+            t = np.arange(int(len(token) / self.chars_per_second * rate)) / rate
+            pitch = base + zlib.crc32(token.encode()) % 60
+            tone = np.sin(2 * np.pi * pitch * t) + 0.3 * np.sin(4 * np.pi * pitch * t)
+            fade = np.minimum(1.0, np.minimum(t, t[::-1]) / 0.01) if len(t) else t
+            parts.append((0.3 * tone * fade).astype(np.float32))
+            pause = ('sentence' if token[-1] in '.!?' else
+                     'clause' if token[-1] in ',;:' else 'word')
+            parts.append(np.zeros(int(self.PAUSES[pause] * rate), dtype=np.float32))
+
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(rate)
+            wav.writeframes((np.concatenate(parts) * 32767).astype('<i2').tobytes())
+        return buffer.getvalue()
+
+    def synthesize_bytes(self, text: str, language: str = 'it-IT') -> SynthesizedAudio:
+        with self._lock:
+            self.requests += 1
+            over_capacity = self.capacity is not None and self.in_flight >= self.capacity
+            self.in_flight += 1
+            draw = self._random.random()
+            jitter = self._random.expovariate(1 / self.jitter) if self.jitter else 0.0
+        try:
+            time.sleep(self.latency + self.char_latency * len(text) + jitter)
+            if over_capacity or draw < self.throttle_rate:
+                raise TTSError("429 Too Many Requests (injected)", self.identity, throttled=True)
+            if draw < self.throttle_rate + self.error_rate:
+                raise TTSError("synthesis failed (injected)", self.identity)
+            return SynthesizedAudio.from_wav(self.render(text))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
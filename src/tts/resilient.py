@@ -0,0 +1,302 @@
+from bisect import bisect_left
+from contextlib import nullcontext
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple, Union
+import threading
+import time
+from .limiter import RateLimitedTTSProvider
+from .providers import AudioTTSProvider, SynthesizedAudio, TTSError, TTSProvider
+from .. import metrics
+
+class LatencyHistogram:
+    """Latency distribution of successful calls
+
+    Cumulative bucket counts (Prometheus style, in seconds) for reporting,
+    and a window of the most recent samples for the quantiles that drive
+    hedging.
+    """
+
+    BUCKETS = metrics.LATENCY_BUCKETS
+
+    def __init__(self, window: int = 200):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.total = 0.0
+        self.recent: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self.counts[bisect_left(self.BUCKETS, seconds)] += 1
+            self.total += seconds
+            self.recent.append(seconds)
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Quantile of the recent samples, None before the first one"""
+        with self._lock:
+            samples = sorted(self.recent)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def snapshot(self) -> Dict:
+        cumulative, buckets = 0, {}
+        for bound, count in zip([*map(str, self.BUCKETS), '+Inf'], self.counts):
+            cumulative += count
+            buckets[bound] = cumulative
+        return {'count': cumulative, 'sum': round(self.total, 3), 'buckets': buckets,
+                'p50': self.quantile(0.5), 'p95': self.quantile(0.95), 'p99': self.quantile(0.99)}
+
+class CircuitBreaker:
+    """Stops calling a provider after repeated failures
+
+    After `failure_threshold` consecutive failures the circuit opens and calls
+    are refused for `reset_timeout` seconds; then one trial call is let
+    through (half-open), which closes the circuit on success.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+class ResilientTTSProvider(AudioTTSProvider):
+    """Decorator adding timeouts, hedging, circuit breaking and failover
+
+    Each call to the primary provider gets `timeout` seconds. When it has not
+    answered by the recent `hedge_quantile` latency (p95 by default, once
+    `hedge_min_samples` calls were observed) a duplicate request is sent and
+    the first answer wins. A provider failing repeatedly is skipped by its
+    circuit breaker, and failed calls go to the fallback provider. Latencies
+    are recorded per provider, see `stats()`.
+
+    Each provider has its own pool of `max_workers` threads, so calls hanging
+    on the primary never delay the fallback. The timeout starts when a call
+    gets a thread and, for a RateLimitedTTSProvider, a slot of its limiter:
+    waiting for them is bounded by `timeout` too, but a throttled yet
+    healthy provider is not timed out for it. A hedge shares the slot of the
+    call it duplicates. Attempts that are no longer needed (timed out, or
+    beaten by the other one) are cancelled if they have not started yet.
+    """
+
+    def __init__(self, primary: TTSProvider,
+                 fallback: Union[TTSProvider, Callable[[], TTSProvider], None] = None,
+                 timeout: float = 30.0, hedge: bool = True, hedge_quantile: float = 0.95,
+                 hedge_min_samples: int = 20, failure_threshold: int = 5,
+                 reset_timeout: float = 30.0, max_workers: int = 8, **kwargs):
+        super().__init__(**kwargs)
+        self.primary = primary
+        self._fallback = fallback
+        self.timeout = timeout
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker_settings = (failure_threshold, reset_timeout)
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.latency: Dict[str, LatencyHistogram] = {}
+        self.counters = {'calls': 0, 'hedged': 0, 'hedge_wins': 0, 'timeouts': 0,
+                         'errors': 0, 'failovers': 0}
+        self._failover_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self.max_workers = max_workers
+        # Pool of each provider. Calls that time out cannot be interrupted, they finish in the pool
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+
+    @property
+    def identity(self) -> str:
+        return self.primary.identity
+
+    @property
+    def audio_format(self):
+        return self.primary.audio_format
+
+    @property
+    def max_request_chars(self) -> int:
+        return self.primary.max_request_chars
+
+    @property
+    def fallback(self) -> Optional[TTSProvider]:
+        """Fallback provider, created on first use"""
+        if callable(self._fallback) and not isinstance(self._fallback, TTSProvider):
+            with self._lock:
+                if callable(self._fallback) and not isinstance(self._fallback, TTSProvider):
+                    self._fallback = self._fallback()
+        return self._fallback
+
+    @property
+    def degraded(self) -> bool:
+        """True while the primary is failing or a recent call was served by the fallback
+
+        Audio produced meanwhile may come from another voice and must not be
+        cached under the primary's identity.
+        """
+        breaker = self.breakers.get(self.primary.identity)
+        recent_failover = (self._failover_at is not None and
+                           time.monotonic() - self._failover_at < self.breaker_settings[1])
+        return recent_failover or (breaker is not None and breaker.state != 'closed')
+
+    def _breaker(self, provider: TTSProvider) -> CircuitBreaker:
+        with self._lock:
+            return self.breakers.setdefault(provider.identity, CircuitBreaker(*self.breaker_settings))
+
+    def _histogram(self, provider: TTSProvider) -> LatencyHistogram:
+        with self._lock:
+            return self.latency.setdefault(provider.identity, LatencyHistogram())
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+        metrics.TTS_EVENTS.inc(event=name)
+
+    def _executor(self, provider: TTSProvider) -> ThreadPoolExecutor:
+        role = 'primary' if provider is self.primary else 'fallback'
+        with self._lock:
+            if role not in self._executors:
+                self._executors[role] = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                           thread_name_prefix=f'tts-{role}')
+            return self._executors[role]
+
+    def _hedge_delay(self, histogram: LatencyHistogram) -> Optional[float]:
+        if not self.hedge or histogram.count < self.hedge_min_samples:
+            return None
+        return histogram.quantile(self.hedge_quantile)
+
+    def _attempt(self, provider: TTSProvider, text: str, language: str, hedge: bool,
+                 started: threading.Event, abandoned: threading.Event) -> SynthesizedAudio:
+        slot = nullcontext()
+        if isinstance(provider, RateLimitedTTSProvider):
+            if not hedge:
+                slot = provider.slot()
+            provider = provider.unlimited
+        with slot:
+            if abandoned.is_set():
+                # The caller gave up while this waited for the slot
+                raise TTSError("abandoned before it started", provider.identity)
+            started.set()
+            start = time.monotonic()
+            audio = provider.synthesize_bytes(text, language)
+        self._histogram(provider).observe(time.monotonic() - start)
+        return audio
+
+    def _submit(self, provider: TTSProvider, text: str, language: str, abandoned: threading.Event,
+                hedge: bool = False) -> Tuple[Future, threading.Event]:
+        """Queue an attempt; the event is set once it runs (or ends without running)"""
+        started = threading.Event()
+        future = self._executor(provider).submit(self._attempt, provider, text, language, hedge,
+                                                 started, abandoned)
+        future.add_done_callback(lambda _: started.set())
+        return future, started
+
+    def _call(self, provider: TTSProvider, text: str, language: str) -> SynthesizedAudio:
+        """One logical request: timeout and (maybe) a hedged duplicate"""
+        abandoned = threading.Event()
+        first, started = self._submit(provider, text, language, abandoned)
+        attempts: List[Future] = [first]
+        try:
+            # Waiting for a thread of the pool or a limiter slot does not count against the timeout
+            if not started.wait(self.timeout):
+                self._count('timeouts')
+                raise TTSError(f"no free worker or limiter slot within {self.timeout}s",
+                               provider.identity)
+            deadline = time.monotonic() + self.timeout
+            hedge_delay = self._hedge_delay(self._histogram(provider))
+            if hedge_delay is not None and hedge_delay < self.timeout:
+                done, _ = wait(attempts, timeout=hedge_delay)
+                if not done:
+                    self._count('hedged')
+                    attempts.append(self._submit(provider, text, language, abandoned, hedge=True)[0])
+
+            pending = set(attempts)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                     return_when=FIRST_COMPLETED)
+                if not done:
+                    self._count('timeouts')
+                    raise TTSError(f"no answer within {self.timeout}s", provider.identity)
+                for future in done:
+                    if future.exception() is None:
+                        if len(attempts) > 1 and future is attempts[1]:
+                            self._count('hedge_wins')
+                        return future.result()
+                    error = future.exception()
+            raise error
+        finally:
+            # Attempts still queued are not needed any more
+            abandoned.set()
+            for future in attempts:
+                future.cancel()
+
+    def synthesize_bytes(self, text: str, language: str = 'it-IT') -> SynthesizedAudio:
+        self._count('calls')
+        errors = []
+        for provider in (self.primary, self.fallback):
+            if provider is None:
+                continue
+            breaker = self._breaker(provider)
+            if not breaker.allow():
+                errors.append(f"{provider.identity}: circuit open")
+                continue
+            try:
+                audio = self._call(provider, text, language)
+            except Exception as e:
+                breaker.record_failure()
+                self._count('errors')
+                self.logger.warning(f"TTS call to {provider.identity} failed: {str(e)}")
+                errors.append(str(e))
+                continue
+
+            breaker.record_success()
+            if provider is not self.primary:
+                self._count('failovers')
+                self._failover_at = time.monotonic()
+                self.logger.warning(f"Speech synthesized by fallback provider {provider.identity}")
+            return audio
+
+        raise TTSError(f"all providers failed ({'; '.join(errors)})", self.identity)
+
+    def stats(self) -> Dict:
+        """Counters, circuit states and latency histograms, for tuning the thresholds"""
+        return {
+            **self.counters,
+            'circuits': {name: breaker.state for name, breaker in self.breakers.items()},
+            'latency': {name: histogram.snapshot() for name, histogram in self.latency.items()},
+        }
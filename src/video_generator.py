@@ -1,16 +1,139 @@
 import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from pathlib import Path
 from typing import List, Dict, Optional, Callable
-from .processors import BlogProcessor, ScriptProcessor, VideoProcessor
+from .processors import BlogProcessor, ScriptProcessor, VideoProcessor, RenderSelection
 from .base_processor import ProcessorCallback
+from .build_graph import BuildGraph, fingerprint
+from .config import Config
+from . import metrics, profiling, tracing
+
+# VideoProcessor reused by the renders of one worker process
+_worker_processor: Optional[VideoProcessor] = None
+
+def _render_job(processor: VideoProcessor, script_path: str,
+                selection: Optional[RenderSelection] = None) -> Dict:
+    """Render one script, capturing the outcome instead of raising"""
+    start = time.perf_counter()
+    result = {'script_file': str(script_path), 'video_file': None, 'status': 'ok', 'error': None}
+    try:
+        result['video_file'] = processor.process(str(script_path), selection)
+        result['outputs'] = processor.outputs
+        result['streams'] = processor.streams
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = str(e)
+    result['stages'] = processor.stage_report
+    result['resources'] = processor.resources
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    return result
+
+def _render_in_worker(script_path: str, quality: Optional[str], profile: Optional[str],
+                      selection: Optional[RenderSelection], incremental: bool = False,
+                      aspects: Optional[List[str]] = None, trace: bool = False,
+                      profile_dir: Optional[str] = None) -> Dict:
+    """Entry point of the worker processes used by VideoGenerator.render_scripts
+
+    The metrics recorded by the render travel back in the result ('metrics'),
+    and its spans too with `trace` ('spans'). With `profile_dir`, the worker
+    writes the CPU profile of each job there.
+    """
+    global _worker_processor
+    if trace:
+        tracing.enable()
+    if profile_dir:
+        profiling.enable(Path(profile_dir), Config().PROFILE_INTERVAL)
+    else:
+        # A forked worker inherits the profiler of its parent
+        profiling.disable()
+    if _worker_processor is None:
+        # A forked worker starts with the metrics of its parent: they are not its own
+        metrics.collect()
+        _worker_processor = VideoProcessor()
+    _worker_processor.set_quality(quality)
+    _worker_processor.set_profile(profile)
+    _worker_processor.incremental = incremental
+    _worker_processor.set_aspects(aspects)
+    result = _render_job(_worker_processor, script_path, selection)
+    result['metrics'] = metrics.collect()
+    spans = tracing.collect()
+    if trace:
+        result['spans'] = spans
+    return result
 
 class VideoGenerator:
     """Facade pattern for the entire video generation process"""
 
     def __init__(self):
+        self.config = Config()
         self.blog_processor = BlogProcessor()
         self.script_processor = ScriptProcessor()
         self.video_processor = VideoProcessor()
         self.logger = logging.getLogger(self.__class__.__name__)
+        # Manifest of built scripts and videos, set when incremental builds are on
+        self.build_graph: Optional[BuildGraph] = None
+        # Prometheus textfile rewritten after every render (empty = off)
+        self.metrics_file = self.config.METRICS_FILE
+        # Stage trace written by cleanup() (None = off), see set_tracing
+        self.trace_file: Optional[Path] = None
+        self.trace_format = self.config.TRACE_FORMAT
+        if self.config.TRACE_FILE:
+            self.set_tracing(self.config.TRACE_FILE)
+        # Worker processes of render_scripts profiled too, see set_profiling
+        self.profile_workers = False
+        if self.config.PROFILE_DIR:
+            self.set_profiling(self.config.PROFILE_DIR, self.config.PROFILE_WORKERS)
+        self.set_incremental(self.config.INCREMENTAL_BUILDS)
+
+    def set_incremental(self, enabled: bool):
+        """Skip scripts and renders whose inputs did not change since the last build"""
+        self.video_processor.incremental = enabled
+        if not enabled:
+            self.build_graph = None
+        elif self.build_graph is None:
+            self.build_graph = BuildGraph(self.config.BUILD_MANIFEST)
+
+    def set_profiling(self, directory: Optional[str], workers: bool = False):
+        """Write CPU profiles of every render to `directory` (None turns profiling off)
+
+        With `workers`, the worker processes of parallel renders are profiled too.
+        """
+        if directory is None:
+            profiling.disable()
+            self.profile_workers = False
+            return
+        profiling.enable(Path(directory), self.config.PROFILE_INTERVAL)
+        self.profile_workers = workers
+
+    def set_tracing(self, path: Optional[str], trace_format: Optional[str] = None):
+        """Trace the pipeline stages, written to `path` by cleanup() (None turns tracing off)
+
+        `trace_format` is 'chrome' or 'otlp' (default: TRACE_FORMAT).
+        """
+        if path is None:
+            self.trace_file = None
+            tracing.disable()
+            return
+        trace_format = (trace_format or self.config.TRACE_FORMAT).lower()
+        if trace_format not in tracing.FORMATS:
+            raise ValueError(f"Unknown trace format '{trace_format}', "
+                             f"expected one of: {', '.join(tracing.FORMATS)}")
+        self.trace_file, self.trace_format = Path(path), trace_format
+        tracing.enable()
+
+    def export_trace(self) -> Optional[Path]:
+        """Write the spans recorded so far to the trace file, if any"""
+        if self.trace_file is None:
+            return None
+        tracing.export(self.trace_file, self.trace_format)
+        return self.trace_file
+
+    @property
+    def build_report(self) -> Dict[str, Dict[str, int]]:
+        """Built/skipped counts per stage, empty unless incremental builds are on"""
+        return self.build_graph.report if self.build_graph is not None else {}
 
     def set_callbacks(self, message_callback: Optional[Callable] = None,
                      progress_callback: Optional[Callable] = None):
@@ -20,13 +143,17 @@ class VideoGenerator:
         for processor in [self.blog_processor, self.script_processor, self.video_processor]:
             processor.set_callbacks(message_callback, progress_callback)
 
-    def generate_scripts(self, num_posts: Optional[int] = None) -> List[Dict]:
+    def generate_scripts(self, num_posts: Optional[int] = None,
+                         since: Optional[date] = None) -> List[Dict]:
         """Only generate scripts from posts"""
         try:
-            posts = self.blog_processor.process(num_posts)
+            posts = self.blog_processor.process(num_posts, since)
             results = []
 
             for post in posts:
+                if self.build_graph is not None:
+                    results.append(self._incremental_script(post))
+                    continue
                 script_file, _ = self.script_processor.process(post)
                 results.append({
                     'title': post['title'],
@@ -34,18 +161,118 @@ class VideoGenerator:
                     'url': post['url']
                 })
 
+            if self.build_graph is not None:
+                self.build_graph.save()
             return results
 
         except Exception as e:
             raise Exception(f"Error generating scripts: {str(e)}")
 
-    def generate_video(self, script_path: str) -> str:
-        """Generate a video from an existing script"""
+    def _incremental_script(self, post: Dict) -> Dict:
+        """Write the script of a post unless the post and intro/outro are unchanged"""
+        node_id = f"script:{post.get('source', post['title'])}"
+        node_fingerprint = fingerprint(post, self.config.INTRO_TEXT, self.config.OUTRO_TEXT)
+        result = {'title': post['title'], 'url': post['url']}
+        if self.build_graph.is_fresh(node_id, node_fingerprint):
+            self.build_graph.skip(node_id)
+            return {**result, 'script_file': self.build_graph.outputs(node_id)[0], 'skipped': True}
+
+        script_file, _ = self.script_processor.process(post)
+        self.build_graph.record(node_id, node_fingerprint, [script_file])
+        return {**result, 'script_file': script_file}
+
+    def generate_video(self, script_path: str,
+                       selection: Optional[RenderSelection] = None) -> str:
+        """Generate a video from an existing script, or only a selection of it"""
         try:
-            return self.video_processor.process(script_path)
+            return self.video_processor.process(script_path, selection)
         except Exception as e:
             raise Exception(f"Error generating video: {str(e)}")
 
+    def render_scripts(self, script_paths: List[str], jobs: int = 1,
+                       quality: Optional[str] = None,
+                       profile: Optional[str] = None,
+                       selection: Optional[RenderSelection] = None) -> List[Dict]:
+        """Render several scripts, up to `jobs` at a time in worker processes
+
+        A failing script does not stop the batch: every result carries its own
+        status, error and render time, in the order of `script_paths`.
+        """
+        self.video_processor.set_quality(quality)
+        self.video_processor.set_profile(profile)
+        graph = self.build_graph if selection is None else None
+        results: Dict[int, Dict] = {}
+        pending = []
+        fingerprints = {}
+        for i, path in enumerate(script_paths):
+            if graph is None:
+                pending.append(i)
+                continue
+            node_id = f"video:{path}"
+            try:
+                fingerprints[i] = self.video_processor.render_fingerprint(str(path))
+            except Exception as e:
+                # Unreadable script: let the render report the error
+                self.logger.warning(f"Cannot fingerprint {path}: {str(e)}")
+                fingerprints[i] = None
+            if fingerprints[i] is not None and graph.is_fresh(node_id, fingerprints[i]):
+                graph.skip(node_id)
+                results[i] = {'script_file': str(path), 'video_file': graph.outputs(node_id)[0],
+                              'status': 'skipped', 'error': None, 'stages': {}, 'seconds': 0.0}
+            else:
+                pending.append(i)
+
+        paths = [script_paths[i] for i in pending]
+        metrics.QUEUE_DEPTH.set(len(paths), queue='batch')
+        if jobs <= 1 or len(paths) <= 1:
+            rendered = []
+            for path in paths:
+                rendered.append(_render_job(self.video_processor, path, selection))
+                self._job_done()
+        else:
+            workers = min(jobs, len(paths))
+            self.logger.info(f"Rendering {len(paths)} scripts with {workers} workers")
+            with tracing.span('batch', scripts=len(paths), workers=workers), \
+                    ProcessPoolExecutor(max_workers=workers) as executor:
+                finished = executor.map(_render_in_worker, paths,
+                                        [quality] * len(paths),
+                                        [profile] * len(paths),
+                                        [selection] * len(paths),
+                                        [self.video_processor.incremental] * len(paths),
+                                        [self.video_processor.aspects] * len(paths),
+                                        [tracing.enabled()] * len(paths),
+                                        [self._worker_profile_dir()] * len(paths))
+                rendered = []
+                for result in finished:
+                    metrics.REGISTRY.merge(result.pop('metrics', {}))
+                    spans = result.pop('spans', None)
+                    if spans:
+                        tracing.enable().merge(spans)
+                    rendered.append(result)
+                    self._job_done()
+        results.update(zip(pending, rendered))
+
+        if graph is not None:
+            for i in pending:
+                result = results[i]
+                graph.merge_report(result['stages'])
+                if result['status'] == 'ok' and fingerprints[i] is not None:
+                    graph.record(f"video:{script_paths[i]}", fingerprints[i],
+                                 result.get('outputs') or [result['video_file']])
+            graph.save()
+        return [results[i] for i in range(len(script_paths))]
+
+    def _worker_profile_dir(self) -> Optional[str]:
+        if not (self.profile_workers and profiling.enabled()):
+            return None
+        return str(profiling.directory())
+
+    def _job_done(self):
+        """One script of the batch rendered: update the queue and the metrics file"""
+        metrics.QUEUE_DEPTH.dec(queue='batch')
+        if self.metrics_file:
+            metrics.write_textfile(self.metrics_file)
+
     def process_recent_posts(self, num_posts: Optional[int] = None) -> List[Dict]:
         """Complete process: from post to video"""
         try:
@@ -66,13 +293,17 @@ class VideoGenerator:
             raise Exception(f"Error processing posts: {str(e)}")
 
     def cleanup(self):
-            """Cleans up resources from all processors, handling any errors"""
+            """Cleans up resources from all processors, handling any errors, and writes the trace"""
             errors = []
             for processor in [self.blog_processor, self.script_processor, self.video_processor]:
                 try:
                     processor.cleanup()
                 except Exception as e:
                     errors.append(str(e))
+            try:
+                self.export_trace()
+            except OSError as e:
+                errors.append(f"trace: {str(e)}")
 
             if errors:
                 self.logger.warning(f"Errors during cleanup: {', '.join(errors)}")
@@ -127,4 +127,17 @@ def test_callback_usage(blog_processor):
 
     blog_processor.process()
 
-    message_mock.assert_called_with('📥 Fetching recent posts...')
\ No newline at end of file
+    message_mock.assert_called_with('📥 Fetching recent posts...')
+
+def test_process_since_filters_older_posts(blog_processor, mock_content_dir):
+    old_post = mock_content_dir / "old_post.md"
+    old_post.write_text("""---
+title: Old Post
+date: 2023-06-01
+---
+# Old
+Old content""")
+
+    result = blog_processor.process(since=datetime(2024, 1, 1).date())
+
+    assert [post['title'] for post in result] == ['Test Post']
@@ -1,3 +1,4 @@
+import wave
 import pytest
 from unittest.mock import Mock, patch
 from pathlib import Path
@@ -26,4 +27,248 @@ def test_processor_initialization(video_processor):
     """Test that processor is correctly configured"""
     assert video_processor.config.TEMP_DIR.exists()
     assert video_processor.config.OUTPUT_DIR.exists()
-    assert video_processor.config.SPEECH_LANG == "it"
\ No newline at end of file
+    assert video_processor.config.SPEECH_LANG == "it"
+
+def test_draft_profile_scales_layout():
+    """The draft profile keeps the final layout at a reduced size"""
+    processor = VideoProcessor()
+    final = processor.profile
+    processor.set_profile('draft')
+    draft = processor.profile
+
+    assert draft.width < final.width and draft.height < final.height
+    assert draft.width % 2 == 0 and draft.height % 2 == 0
+    assert draft.scaled(70) == round(70 * draft.width / final.width)
+    assert not draft.effects
+    assert draft.tts_cache
+
+def test_aspect_profile_keeps_short_side():
+    processor = VideoProcessor()
+    processor.set_profile('draft')
+    draft = processor.profile
+
+    vertical = processor.config.aspect_profile(draft, '9:16')
+    assert (vertical.width, vertical.height) == (draft.height, draft.width)
+    assert vertical.aspect == '9x16' and vertical.scale == draft.scale
+    assert processor.config.aspect_profile(draft, '16:9') is draft
+
+    with pytest.raises(ValueError):
+        processor.set_aspects(['tall'])
+
+def test_still_profile_encoder_params(monkeypatch):
+    from dataclasses import replace
+    processor = VideoProcessor()
+    monkeypatch.setattr(processor.config, 'STREAM_FORMAT', 'off')
+    processor.profile = replace(processor.profile, still=False, crf=None)
+    assert processor._video_params([0.0, 2.5], 4.0) == ['-b:v', processor.profile.bitrate]
+
+    processor.profile = replace(processor.profile, still=True, crf=23, codec='libx264', bitrate='2000k')
+    params = processor._video_params([0.0, 2.5], 4.0, ['format=yuv420p'])
+
+    assert params[:6] == ['-crf', '23', '-maxrate', '2000000', '-bufsize', '4000000']
+    assert ['-tune', 'stillimage'] == params[6:8]
+    filters = params[params.index('-vf') + 1].split(',')
+    assert filters[0] == 'format=yuv420p' and filters[1].startswith('mpdecimate')
+    assert params[params.index('-fps_mode') + 1] == 'vfr'
+    assert params[-2:] == ['-force_key_frames', '0.000,2.500']
+
+    # Streamed videos keep every frame, so the renditions share one timeline
+    monkeypatch.setattr(processor.config, 'STREAM_FORMAT', 'hls')
+    params = processor._video_params([0.0, 2.5], 4.0, ['format=yuv420p'])
+    assert '-fps_mode' not in params and 'mpdecimate' not in params[params.index('-vf') + 1]
+    assert ['-tune', 'stillimage'] == params[6:8] and params[-2:] == ['-force_key_frames', '0.000,2.500']
+
+def test_bounded_render_windows(monkeypatch):
+    processor = VideoProcessor()
+    cues = [{'index': i} for i in range(5)]
+    monkeypatch.setattr(processor.config, 'RENDER_MAX_CLIPS', 2)
+
+    monkeypatch.setattr(processor.config, 'RENDER_BOUNDED', False)
+    assert processor._cue_windows(cues) == [cues]
+
+    monkeypatch.setattr(processor.config, 'RENDER_BOUNDED', True)
+    assert [[cue['index'] for cue in window] for window in processor._cue_windows(cues)] == [[0, 1], [2, 3], [4]]
+
+def test_unknown_profile_rejected():
+    with pytest.raises(ValueError):
+        VideoProcessor().set_profile('ultra')
+
+def test_draft_slide_matches_profile_size(tmp_path):
+    processor = VideoProcessor()
+    processor.set_profile('draft')
+    slide = tmp_path / 'slide.png'
+
+    processor._create_slide("Some text on the slide", slide, 2)
+
+    from PIL import Image
+    assert Image.open(slide).size == (processor.profile.width, processor.profile.height)
+
+def test_selection_matches_indices_and_headings():
+    from src.processors import RenderSelection
+    section = {'heading': 'First Section'}
+
+    assert RenderSelection().matches(3, section)
+    assert RenderSelection(sections=[3]).matches(3, section)
+    assert not RenderSelection(sections=[1]).matches(3, section)
+    assert RenderSelection(headings=['first section']).matches(0, section)
+
+def test_selection_clip_cues_trims_boundaries():
+    from src.processors import RenderSelection
+    cues = [{'index': i, 'duration': 2.0} for i in range(4)]  # 0-2, 2-4, 4-6, 6-8
+
+    kept, position = RenderSelection(start=3.0, end=5.0).clip_cues(cues, 0.0)
+
+    assert [cue['index'] for cue in kept] == [1, 2]
+    assert kept[0]['trim'] == (1.0, 2.0)
+    assert kept[1]['trim'] == (0.0, 1.0)
+    assert position == 8.0
+
+def test_selection_clip_cues_keeps_whole_cues_inside_range():
+    from src.processors import RenderSelection
+    cues = [{'index': i, 'duration': 2.0} for i in range(2)]
+
+    kept, position = RenderSelection(start=10.0).clip_cues(cues, 9.0)
+
+    assert [cue['index'] for cue in kept] == [0, 1]
+    assert kept[0]['trim'] == (1.0, 2.0)
+    assert 'trim' not in kept[1]
+    assert position == 13.0
+
+def test_selection_parse_time():
+    from src.processors import RenderSelection
+    assert RenderSelection.parse_time('75') == 75.0
+    assert RenderSelection.parse_time('1:15.5') == 75.5
+    assert RenderSelection.parse_time('1:00:00') == 3600.0
+    with pytest.raises(ValueError):
+        RenderSelection.parse_time('-1:30')
+
+def test_selection_rejects_bad_time_range():
+    from src.processors import RenderSelection
+    assert RenderSelection(end=5.0).has_time_range
+    for start, end in ((-1.0, None), (5.0, 5.0), (5.0, 2.0), (None, 0.0)):
+        with pytest.raises(ValueError):
+            RenderSelection(start=start, end=end)
+
+@pytest.fixture
+def bumper_processor(tmp_path):
+    processor = VideoProcessor()
+    processor.config = Mock(wraps=processor.config)
+    processor.config.BUMPER_CACHE_DIR = tmp_path / 'bumpers'
+    processor.config.ASSETS_DIR = tmp_path / 'assets'
+    processor.config.REUSE_BUMPERS = True
+    processor.config.style_config = {'bgcolor': '#291d38'}
+    processor.config.SPEECH_LANG = 'it'
+    processor.config.TEXT_RENDERER = 'pil'
+    processor.config.STREAM_FORMAT = 'off'
+    processor.tts_provider = Mock(identity='FakeProvider', degraded=False)
+    return processor
+
+INTRO = {'level': 1, 'type': 'intro', 'background': None, 'animation': None,
+         'heading': 'Introduzione', 'speeches': [{'text': 'Ciao a tutti', 'pause': 0.5}]}
+
+def test_bumper_key_tracks_text_and_style(bumper_processor):
+    key = bumper_processor._segment_key(INTRO)
+
+    assert bumper_processor._segment_key(dict(INTRO)) == key
+    changed_text = {**INTRO, 'speeches': [{'text': 'Benvenuti', 'pause': 0.5}]}
+    assert bumper_processor._segment_key(changed_text) != key
+    bumper_processor.config.style_config = {'bgcolor': '#000000'}
+    assert bumper_processor._segment_key(INTRO) != key
+
+def test_bumper_rendered_once(bumper_processor):
+    bumper_processor._synthesize_section = Mock(return_value=[{'duration': 2.0}])
+    bumper_processor._create_segment = Mock(return_value=Mock())
+    bumper_processor._write_video = Mock(side_effect=lambda clip, path: Path(path).write_bytes(b'mp4'))
+
+    cache_dir = bumper_processor._segment_cache_dir(INTRO)
+    first = bumper_processor._cached_segment(INTRO, 0, cache_dir)
+    second = bumper_processor._cached_segment(INTRO, 0, cache_dir)
+
+    assert first == second and first.exists()
+    assert first.name.startswith('intro_')
+    bumper_processor._create_segment.assert_called_once()
+    # Only the render that encodes the segment plans its encode
+    assert bumper_processor.progress.stages['encode'].total == 2.0
+    assert list(first.parent.iterdir()) == [first]
+    assert bumper_processor.stage_report['segment'] == {'built': 1, 'skipped': 1}
+
+def test_only_intro_outro_are_bumpers(bumper_processor):
+    assert bumper_processor._is_bumper(INTRO)
+    assert not bumper_processor._is_bumper({**INTRO, 'type': 'content'})
+    bumper_processor.config.REUSE_BUMPERS = False
+    assert not bumper_processor._is_bumper(INTRO)
+
+def test_incremental_caches_every_segment(bumper_processor, tmp_path):
+    content = {**INTRO, 'type': 'content'}
+    bumper_processor.config.SEGMENT_CACHE_DIR = tmp_path / 'segments'
+    assert bumper_processor._segment_cache_dir(content) is None
+
+    bumper_processor.incremental = True
+    assert bumper_processor._segment_cache_dir(content) == tmp_path / 'segments'
+    assert bumper_processor._segment_cache_dir(INTRO) == tmp_path / 'bumpers'
+
+def test_speech_audio_keeps_native_rate(bumper_processor, tmp_path):
+    from src.tts import SyntheticTTSProvider
+    bumper_processor.tts_provider = SyntheticTTSProvider()
+    bumper_processor.config.AUDIO_SAMPLE_FORMAT = 's16le'
+    output = tmp_path / 'speech.wav'
+
+    rate, duration = bumper_processor._create_audio('Ciao a tutti.', output, pause=0.5)
+
+    assert rate == 24000
+    with wave.open(str(output)) as wav:
+        assert wav.getframerate() == 24000
+        assert wav.getnchannels() == 1
+        assert wav.getnframes() == round(duration * rate)
+    assert duration > 0.5
+
+@pytest.fixture
+def subtitle_processor(tmp_path, monkeypatch):
+    from src.tts import SyntheticTTSProvider
+    processor = VideoProcessor()
+    monkeypatch.setattr(processor.config, 'TEXT_RENDERER', 'ass')
+    monkeypatch.setattr(processor.config, 'TEMP_DIR', tmp_path)
+    processor.tts_provider = SyntheticTTSProvider()
+    processor.set_profile('draft')
+    return processor
+
+def test_subtitle_lines_follow_slide_layout(subtitle_processor):
+    section = {**INTRO, 'level': 4}
+    text = 'Una frase abbastanza lunga da andare a capo almeno una volta nella slide'
+    document = subtitle_processor._subtitle_document()
+
+    subtitle_processor._add_subtitle(document, section, text, 1.0, 3.0)
+
+    _, font_size, lines, y = subtitle_processor._text_layout(text, 4)
+    assert len(lines) > 1
+    assert len(document.events) == len(lines)
+    second_y = y + font_size * subtitle_processor.config.TEXT_LINE_SPACING
+    assert f"\\pos({subtitle_processor.profile.width // 2},{second_y:.0f})" in document.events[1]
+
+def test_section_encoded_in_one_pass(subtitle_processor, tmp_path, monkeypatch):
+    monkeypatch.setattr(subtitle_processor.config, 'TEXT_RENDERER', 'soft')
+    subtitle_processor._create_section_slide = Mock()
+
+    cues = subtitle_processor._synthesize_section(INTRO, 0)
+    output = subtitle_processor._encode_section(INTRO, 0, cues, tmp_path / 'intro.mp4')
+
+    assert output.stat().st_size > 0
+    assert not subtitle_processor._create_section_slide.called
+    assert 'Ciao a tutti' in (tmp_path / 'text_0.ass').read_text(encoding='utf-8')
+
+def test_aspect_outputs_share_narration(subtitle_processor, tmp_path, monkeypatch):
+    script = tmp_path / 'script.xml'
+    script.write_text(
+        '<script><metadata><title>Aspects</title><url>u</url><date>2024-01-01</date></metadata>'
+        '<content><section level="2" type="content"><heading>Uno</heading>'
+        '<speech pause="0.2">Prima frase.</speech><speech pause="0.2">Seconda frase.</speech>'
+        '</section></content></script>', encoding='utf-8'
+    )
+    monkeypatch.setattr(subtitle_processor.config, 'OUTPUT_DIR', tmp_path)
+    subtitle_processor.set_aspects(['16:9', '9:16'])
+
+    main = subtitle_processor.process(str(script))
+
+    assert subtitle_processor.tts_provider.requests == 2
+    assert subtitle_processor.outputs == [main, str(tmp_path / 'video_Aspects_draft_9x16.mp4')]
+    assert all(Path(video).stat().st_size > 0 for video in subtitle_processor.outputs)
@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import pytest
+from unittest.mock import Mock, patch
+from src.async_generator import AsyncVideoGenerator, _PrefetchedTTSProvider
+from src.processors import RenderCancelled
+
+SCRIPT = {
+    'metadata': {'title': 'Post 1', 'url': '', 'date': '2024-01-01'},
+    'content': [
+        {'level': 1, 'type': 'intro', 'heading': 'Intro',
+         'speeches': [{'text': 'Hello', 'pause': 0.5}, {'text': 'Hello', 'pause': 0.5}]},
+        {'level': 2, 'type': 'content', 'heading': 'Body',
+         'speeches': [{'text': 'World', 'pause': 0.3}]},
+    ]
+}
+
+@pytest.fixture
+def tts_provider():
+    provider = Mock()
+
+    def synthesize(text, output_path, language='it-IT'):
+        output_path.write_text(text)
+        return True
+
+    provider.synthesize.side_effect = synthesize
+    return provider
+
+def fake_process(self, script_path, selection=None):
+    """Stands in for VideoProcessor.process: uses the prefetched audio and reports progress"""
+    self.callback.update_progress(50, "Halfway")
+    output = self.config.TEMP_DIR / 'out.mp3'
+    assert self.tts_provider.synthesize('World', output)
+    return f"video_{output.read_text()}.mp4"
+
+@patch('src.processors.video_processor.VideoProcessor._parse_script', return_value=SCRIPT)
+@patch('src.processors.video_processor.VideoProcessor.process', fake_process)
+def test_agenerate_video_prefetches_speech_once(mock_parse, tts_provider):
+    async def run():
+        async with AsyncVideoGenerator(max_renders=1, tts_provider=tts_provider) as generator:
+            return await generator.agenerate_video('script.xml')
+
+    assert asyncio.run(run()) == 'video_World.mp4'
+    synthesized = [c.args[0] for c in tts_provider.synthesize.call_args_list]
+    assert sorted(synthesized) == ['Hello', 'World']
+
+@patch('src.processors.video_processor.VideoProcessor._parse_script', return_value=SCRIPT)
+@patch('src.processors.video_processor.VideoProcessor.process', fake_process)
+def test_render_job_progress_iterator(mock_parse, tts_provider):
+    async def run():
+        async with AsyncVideoGenerator(tts_provider=tts_provider) as generator:
+            job = generator.start_video('script.xml')
+            return [event async for event in job.progress()]
+
+    events = asyncio.run(run())
+    assert [e['type'] for e in events] == ['stage', 'stage', 'progress', 'done']
+    assert events[2]['value'] == 50
+    assert events[-1]['video_file'] == 'video_World.mp4'
+
+@patch('src.processors.video_processor.VideoProcessor._parse_script', return_value=SCRIPT)
+def test_render_job_cancel_stops_processor(mock_parse, tts_provider):
+    started = threading.Event()
+
+    def blocking_process(self, script_path, selection=None):
+        started.set()
+        if self.cancel_event.wait(timeout=5):
+            raise RenderCancelled("Render cancelled")
+        return 'video.mp4'
+
+    async def run():
+        async with AsyncVideoGenerator(tts_provider=tts_provider) as generator:
+            job = generator.start_video('script.xml')
+            await asyncio.to_thread(started.wait, 5)
+            job.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await job
+            events = [event async for event in job.progress()]
+            return job, events
+
+    with patch('src.processors.video_processor.VideoProcessor.process', blocking_process):
+        job, events = asyncio.run(run())
+    assert job.cancel_event.is_set()
+    assert events[-1]['type'] == 'cancelled'
+
+@patch('src.async_generator.AsyncVideoGenerator.agenerate_scripts')
+@patch('src.async_generator.AsyncVideoGenerator._run_job')
+def test_aprocess_recent_posts(mock_run_job, mock_generate_scripts, tts_provider):
+    async def generate_scripts(num_posts=None, since=None):
+        return [{'title': f'Post {i}', 'script_file': f'script{i}.xml', 'url': ''} for i in range(2)]
+
+    async def run_job(job, profile=None, selection=None):
+        return job.script_path.replace('.xml', '.mp4')
+
+    mock_generate_scripts.side_effect = generate_scripts
+    mock_run_job.side_effect = run_job
+
+    async def run():
+        async with AsyncVideoGenerator(tts_provider=tts_provider) as generator:
+            return await generator.aprocess_recent_posts(2)
+
+    results = asyncio.run(run())
+    assert [r['video_file'] for r in results] == ['script0.mp4', 'script1.mp4']
+
+def test_prefetched_provider_falls_back(tmp_path, tts_provider):
+    cached = tmp_path / 'cached.mp3'
+    cached.write_text('cached')
+    provider = _PrefetchedTTSProvider(tts_provider, {'Hello': cached})
+
+    assert provider.synthesize('Hello', tmp_path / 'a.mp3')
+    assert (tmp_path / 'a.mp3').read_text() == 'cached'
+    assert provider.synthesize('Other', tmp_path / 'b.mp3')
+    tts_provider.synthesize.assert_called_once()
@@ -0,0 +1,54 @@
+import wave
+import numpy as np
+from src.audio import decode_pcm, encode_pcm, find_silences, pcm_clip, split_points
+
+RATE = 8000
+
+def tone(seconds):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return 0.5 * np.sin(2 * np.pi * 220 * t)
+
+def silence(seconds):
+    return np.zeros(int(seconds * RATE))
+
+def test_find_silences():
+    samples = np.concatenate([tone(1), silence(0.5), tone(1), silence(0.05), tone(0.5)])
+
+    silences = find_silences(samples, RATE, min_duration=0.1)
+
+    assert len(silences) == 1
+    start, end = silences[0]
+    assert abs(start - 1.0) < 0.02 and abs(end - 1.5) < 0.02
+
+def test_split_points_takes_longest_gaps_in_order():
+    silences = [(1.0, 1.6), (2.0, 2.1), (3.0, 3.7)]
+
+    assert split_points(silences, 5.0, [10, 10, 10]) == [(1.0, 1.6), (3.0, 3.7)]
+
+def test_split_points_rejects_ambiguous_audio():
+    # Not enough gaps
+    assert split_points([(1.0, 1.5)], 3.0, [1, 1, 1]) is None
+    # Leading and trailing silence are not separators
+    assert split_points([(0.0, 0.5), (2.5, 3.0)], 3.0, [1, 1]) is None
+    # Pieces far from their expected lengths
+    assert split_points([(0.2, 0.8)], 10.0, [10, 10]) is None
+    assert split_points([], 3.0, [1]) == []
+
+def test_encode_pcm_keeps_rate_and_sample_format(tmp_path):
+    path = tmp_path / 'speech.wav'
+    encode_pcm(tone(1), RATE, path, sample_format='s16le')
+    with wave.open(str(path)) as wav:
+        assert wav.getframerate() == RATE
+        assert wav.getnchannels() == 1
+        assert wav.getsampwidth() == 2
+
+    # Wider formats keep more precision than 16 bits
+    encode_pcm(tone(1), RATE, path, sample_format='s32le')
+    assert np.abs(decode_pcm(path, RATE) - tone(1)).max() < 1e-6
+
+def test_pcm_clip_is_mono_at_native_rate():
+    clip = pcm_clip(tone(0.5).astype(np.float32), RATE)
+
+    assert clip.nchannels == 1
+    assert clip.duration == 0.5
+    assert clip.to_soundarray(fps=RATE).shape == (RATE // 2, 1)
@@ -0,0 +1,48 @@
+import json
+import os
+from src.build_graph import BuildGraph, fingerprint
+
+def test_fingerprint_is_stable_and_order_independent():
+    assert fingerprint({'a': 1, 'b': 2}) == fingerprint({'b': 2, 'a': 1})
+    assert fingerprint({'a': 1}) != fingerprint({'a': 2})
+
+def test_node_is_fresh_until_inputs_or_outputs_change(tmp_path):
+    output = tmp_path / 'video.mp4'
+    output.write_bytes(b'video')
+    graph = BuildGraph(tmp_path / 'manifest.json')
+
+    assert not graph.is_fresh('video:a.xml', 'fp1')
+    graph.record('video:a.xml', 'fp1', [output])
+    assert graph.is_fresh('video:a.xml', 'fp1')
+    assert not graph.is_fresh('video:a.xml', 'fp2')
+
+    # Overwritten by another build
+    os.utime(output, ns=(0, 0))
+    assert not graph.is_fresh('video:a.xml', 'fp1')
+    output.unlink()
+    assert not graph.is_fresh('video:a.xml', 'fp1')
+
+def test_manifest_round_trip_and_report(tmp_path):
+    output = tmp_path / 'script.xml'
+    output.write_text('<script/>')
+    manifest = tmp_path / 'manifest.json'
+    graph = BuildGraph(manifest)
+    graph.record('script:post.md', 'fp', [output])
+    graph.skip('video:a.xml')
+    graph.merge_report({'audio': {'built': 2, 'skipped': 3}})
+    graph.save()
+
+    assert graph.report == {'script': {'built': 1, 'skipped': 0},
+                            'video': {'built': 0, 'skipped': 1},
+                            'audio': {'built': 2, 'skipped': 3}}
+    reloaded = BuildGraph(manifest)
+    assert reloaded.is_fresh('script:post.md', 'fp')
+    assert reloaded.outputs('script:post.md') == [str(output)]
+    assert reloaded.report == {}
+
+def test_unreadable_manifest_starts_empty(tmp_path):
+    manifest = tmp_path / 'manifest.json'
+    manifest.write_text('{not json')
+    assert BuildGraph(manifest).nodes == {}
+    manifest.write_text(json.dumps({'version': 1}))
+    assert BuildGraph(manifest).nodes == {}
@@ -0,0 +1,121 @@
+import io
+import json
+import pytest
+from datetime import date
+from unittest.mock import patch
+from src.cli import build_parser, run_batch
+
+def test_build_parser_render_options():
+    args = build_parser().parse_args(
+        ['render', 'a.xml', 'scripts/*.xml', '--jobs', '4', '--quality', 'low',
+         '--since', '2024-01-01', '--limit', '3', '--json']
+    )
+    assert args.command == 'render'
+    assert args.paths == ['a.xml', 'scripts/*.xml']
+    assert args.jobs == 4
+    assert args.quality == 'low'
+    assert args.since == date(2024, 1, 1)
+    assert args.limit == 3
+    assert args.json is True
+
+def test_build_parser_rejects_invalid_date():
+    with pytest.raises(SystemExit):
+        build_parser().parse_args(['script', '--since', '01/01/2024'])
+
+@patch('src.video_generator.VideoGenerator.generate_scripts')
+def test_script_command_json(mock_generate_scripts):
+    mock_generate_scripts.return_value = [
+        {'title': 'Post 1', 'script_file': 'script1.xml', 'url': 'http://example.com/1'}
+    ]
+    stdout = io.StringIO()
+
+    exit_code = run_batch(['script', '--limit', '2', '--json'], stdout)
+
+    payload = json.loads(stdout.getvalue())
+    assert exit_code == 0
+    assert payload['command'] == 'script'
+    assert payload['ok'] is True
+    assert payload['results'][0]['script_file'] == 'script1.xml'
+    mock_generate_scripts.assert_called_once_with(2, None)
+
+@patch('src.video_generator.VideoGenerator.render_scripts')
+def test_render_command_expands_globs(mock_render_scripts, tmp_path):
+    for name in ['b.xml', 'a.xml', 'notes.txt']:
+        (tmp_path / name).write_text('<script/>')
+    mock_render_scripts.return_value = [
+        {'script_file': str(tmp_path / 'a.xml'), 'status': 'ok', 'video_file': 'a.mp4'},
+        {'script_file': str(tmp_path / 'b.xml'), 'status': 'error', 'error': 'boom'},
+    ]
+    stdout = io.StringIO()
+
+    exit_code = run_batch(['render', str(tmp_path / '*.xml'), '--jobs', '2', '--json'], stdout)
+
+    mock_render_scripts.assert_called_once_with(
+        [str(tmp_path / 'a.xml'), str(tmp_path / 'b.xml')], 2, None, None, None
+    )
+    payload = json.loads(stdout.getvalue())
+    assert exit_code == 1
+    assert payload['ok'] is False
+    assert payload['results'][1]['error'] == 'boom'
+
+@patch('src.video_generator.VideoGenerator.render_scripts')
+@patch('src.video_generator.VideoGenerator.generate_scripts')
+def test_generate_command_merges_results(mock_generate_scripts, mock_render_scripts):
+    mock_generate_scripts.return_value = [
+        {'title': 'Post 1', 'script_file': 'script1.xml', 'url': 'http://example.com/1'}
+    ]
+    mock_render_scripts.return_value = [
+        {'script_file': 'script1.xml', 'video_file': 'video1.mp4', 'status': 'ok', 'seconds': 1.5}
+    ]
+    stdout = io.StringIO()
+
+    exit_code = run_batch(['generate', '--quality', 'high', '--profile', 'draft'], stdout)
+
+    assert exit_code == 0
+    mock_render_scripts.assert_called_once_with(['script1.xml'], 1, 'high', 'draft')
+    assert 'Post 1' in stdout.getvalue()
+    assert 'video1.mp4' in stdout.getvalue()
+
+@patch('src.video_generator.VideoGenerator.generate_scripts')
+def test_command_error_sets_exit_code(mock_generate_scripts):
+    mock_generate_scripts.side_effect = Exception("no content")
+    stdout = io.StringIO()
+
+    exit_code = run_batch(['script', '--json'], stdout)
+
+    assert exit_code == 1
+    assert json.loads(stdout.getvalue())['error'] == 'no content'
+
+@patch('src.video_generator.VideoGenerator.render_scripts')
+def test_render_command_partial_selection(mock_render_scripts):
+    from src.processors import RenderSelection
+    mock_render_scripts.return_value = []
+
+    run_batch(['render', 'script.xml', '--sections', '0,2-3', '--heading', 'Intro',
+               '--start', '1:05', '--end', '90'], io.StringIO())
+
+    selection = mock_render_scripts.call_args.args[4]
+    assert selection == RenderSelection([0, 2, 3], ['Intro'], 65.0, 90.0)
+
+@pytest.mark.parametrize('times', [['--start', '-5'], ['--start', '1:-30'], ['--end', '0'],
+                                   ['--start', '1:30', '--end', '60']])
+def test_render_command_rejects_bad_time_range(times, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        run_batch(['render', 'script.xml', *times], io.StringIO())
+    assert exit_info.value.code == 2
+    assert 'usage:' in capsys.readouterr().err
+
+
+@patch('src.video_generator.VideoGenerator.set_incremental')
+@patch('src.video_generator.VideoGenerator.render_scripts')
+def test_render_command_incremental(mock_render_scripts, mock_set_incremental):
+    mock_render_scripts.return_value = [
+        {'script_file': 'script.xml', 'video_file': 'video.mp4', 'status': 'skipped'}
+    ]
+    stdout = io.StringIO()
+
+    exit_code = run_batch(['render', 'script.xml', '--incremental', '--json'], stdout)
+
+    mock_set_incremental.assert_called_with(True)
+    assert exit_code == 0
+    assert json.loads(stdout.getvalue())['ok'] is True
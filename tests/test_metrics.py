@@ -0,0 +1,67 @@
+import urllib.request
+import pytest
+from src.metrics import Counter, Gauge, Histogram, Registry, serve, write_textfile
+
+@pytest.fixture
+def registry():
+    return Registry()
+
+def test_exposition_format(registry):
+    renders = registry.counter('renders_total', 'Renders', ('profile',))
+    latency = registry.histogram('latency_seconds', 'Latency', buckets=(0.5, 1))
+    renders.inc(profile='draft')
+    renders.inc(2, profile='a "b"')
+    latency.observe(0.2)
+    latency.observe(0.7)
+    latency.observe(3)
+
+    text = registry.exposition()
+    assert '# TYPE renders_total counter' in text
+    assert 'renders_total{profile="draft"} 1\n' in text
+    assert 'renders_total{profile="a \\"b\\""} 2\n' in text
+    assert 'latency_seconds_bucket{le="0.5"} 1\n' in text
+    assert 'latency_seconds_bucket{le="1"} 2\n' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 3\n' in text
+    assert 'latency_seconds_sum 3.9\n' in text and 'latency_seconds_count 3\n' in text
+
+def test_labels_are_checked(registry):
+    renders = registry.counter('renders_total', 'Renders', ('profile',))
+    with pytest.raises(ValueError):
+        renders.inc(quality='high')
+    with pytest.raises(ValueError):
+        registry.counter('renders_total', 'Again')
+
+def test_worker_values_merged(registry):
+    worker = Registry()
+    for target in (registry, worker):
+        target.register(Counter('renders_total', 'Renders'))
+        target.register(Histogram('latency_seconds', 'Latency', buckets=(1,)))
+        target.register(Gauge('queue_depth', 'Queue'))
+    registry.metrics['renders_total'].inc()
+    worker.metrics['renders_total'].inc(2)
+    worker.metrics['latency_seconds'].observe(0.5)
+    worker.metrics['queue_depth'].set(7)
+
+    snapshot = worker.collect()
+    registry.merge(snapshot)
+    registry.merge(worker.collect())
+
+    assert 'queue_depth' not in snapshot
+    assert registry.metrics['renders_total'].value() == 3
+    assert registry.metrics['latency_seconds'].value() == ([1, 0], 0.5)
+
+def test_textfile_and_http_endpoint(tmp_path):
+    from src import metrics
+
+    metrics.SCRIPTS_WRITTEN.inc()
+    write_textfile(tmp_path / 'md2video.prom')
+    assert '# TYPE md2video_scripts_written_total counter' in (tmp_path / 'md2video.prom').read_text()
+
+    server = serve(0, '127.0.0.1')
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url) as response:
+            assert 'md2video_scripts_written_total ' in response.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,82 @@
+import pstats
+import threading
+import time
+import pytest
+from src import profiling, tracing
+
+@pytest.fixture
+def profile_dir(tmp_path):
+    profiling.enable(tmp_path, interval=0.001)
+    yield tmp_path
+    profiling.disable()
+    tracing.disable()
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(1000))
+
+def test_disabled_jobs_are_noop(tmp_path):
+    assert not profiling.enabled()
+    with profiling.job('render') as job:
+        pass
+    assert job is profiling.job('other')
+    assert list(tmp_path.iterdir()) == []
+
+def test_samples_are_rooted_at_the_stage(profile_dir):
+    started, done = threading.Barrier(3), threading.Event()
+
+    def work(stage, idle):
+        with tracing.span(stage):
+            started.wait()
+            while not done.is_set():
+                if idle:
+                    done.wait()
+                else:
+                    sum(range(1000))
+
+    threads = [threading.Thread(target=work, args=('encode', False), name='encoder'),
+               threading.Thread(target=work, args=('tts', True), name='speech')]
+    for thread in threads:
+        thread.start()
+    started.wait()
+    time.sleep(0.05)  # Out of the barrier
+    stacks = profiling.Sampler(0.001).sample()
+    done.set()
+    for thread in threads:
+        thread.join()
+
+    # The speech thread only waits: idle threads are left out, and so is the sampling one
+    assert [stack.split(';')[:2] for stack in stacks] == [['encode', 'encoder']]
+    assert 'work (test_profiling.py' in next(iter(stacks))
+
+def test_job_writes_collapsed_stacks_and_pstats(profile_dir):
+    with profiling.job('post'):
+        with tracing.span('slide'):
+            busy(0.2)
+
+    [collapsed] = profile_dir.glob('post_*.collapsed')
+    lines = collapsed.read_text().splitlines()
+    assert lines and all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+    assert any(line.startswith('slide;') and 'busy (test_profiling.py' in line for line in lines)
+    [stats] = profile_dir.glob('post_*.pstats')
+    assert any(name == 'busy' for _, _, name in pstats.Stats(str(stats)).stats)
+
+def test_repeated_jobs_keep_their_profiles(profile_dir):
+    for _ in range(2):
+        with profiling.job('post'):
+            busy(0.02)
+
+    assert len(list(profile_dir.glob('post_*.collapsed'))) == 2
+    assert len(list(profile_dir.glob('post_*.pstats'))) == 2
+
+def test_profiling_alone_records_no_spans(profile_dir):
+    assert not tracing.enabled()
+    with profiling.job('post'):
+        with tracing.span('slide'):
+            assert set(tracing.active_stages().values()) == {'slide'}
+            busy(0.02)
+
+    assert tracing.collect() == [] and tracing.active_stages() == {}
+    profiling.disable()
+    assert tracing.span('slide') is tracing.span('encode')
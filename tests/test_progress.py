@@ -0,0 +1,83 @@
+import pytest
+from unittest.mock import Mock
+from src.ffmpeg import run_ffmpeg
+from src.progress import JobProgress, ffmpeg_reporter, parse_weights
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def events(callback):
+    return [(c.args[0], c.kwargs) for c in callback.update_progress.call_args_list]
+
+def test_parse_weights():
+    assert parse_weights('') == {'sections': 30.0, 'encode': 65.0, 'finalize': 5.0}
+    assert parse_weights('encode:80, sections:15')['encode'] == 80.0
+    with pytest.raises(ValueError):
+        parse_weights('upload:10')
+    with pytest.raises(ValueError):
+        parse_weights('encode:fast')
+
+def test_weighted_progress_is_throttled_and_monotonic():
+    clock, callback = Clock(), Mock()
+    progress = JobProgress(callback, {'sections': 25, 'encode': 75}, interval=1.0, clock=clock)
+    progress.plan('sections', 2)
+
+    progress.advance('sections', 1, 'Section 0')
+    clock.now = 0.5
+    progress.advance('sections', 1, 'Section 1')
+    progress.plan('encode', 10)
+    clock.now = 1.0
+    progress.advance('encode', 2.0, speed=2.0)
+    clock.now = 1.5
+    progress.advance('encode', 2.0)
+    clock.now = 2.5
+    progress.advance('encode', 2.0)
+    # The encode plan grows: the fraction drops but the reported value does not
+    progress.plan('encode', 10)
+    clock.now = 3.5
+    progress.advance('encode', 0)
+    progress.finish()
+
+    values = [value for value, _ in events(callback)]
+    # Stage starts and the end always go out, the rest at most once per interval
+    assert values == [12.5, 40.0, 70.0, 70.0, 100.0]
+    assert events(callback)[1][1]['speed'] == 2.0
+    assert events(callback)[1][1]['stage'] == 'encode'
+    assert progress.fraction == 1.0
+
+def test_eta_from_measured_rates():
+    clock, callback = Clock(), Mock()
+    progress = JobProgress(callback, {'sections': 50, 'encode': 50}, interval=0, clock=clock)
+    progress.plan('sections', 4)
+    progress.plan('encode', 100)
+    assert progress.eta() is None
+
+    progress.advance('sections', 0)
+    clock.now = 10.0
+    progress.advance('sections', 2)
+    # 2 sections in 10s: 10s left for the sections; the encode, not started, is half
+    # of the job at the rate of the job so far (1/40 per second): 20s
+    assert progress.eta() == pytest.approx(10.0 + 20.0)
+
+    progress.advance('encode', 0)
+    clock.now = 20.0
+    progress.advance('sections', 2)
+    progress.advance('encode', 50)
+    # The encode runs at 5 s/s: 50 seconds of video left
+    assert progress.eta() == pytest.approx(10.0)
+    assert events(callback)[-1][1]['eta'] == pytest.approx(10.0)
+
+def test_ffmpeg_progress_blocks(tmp_path):
+    report = Mock()
+    run_ffmpeg(['-f', 'lavfi', '-i', 'color=c=black:s=64x64:r=10', '-t', '2',
+                '-c:v', 'mpeg4', tmp_path / 'out.mp4'], progress=ffmpeg_reporter(report))
+
+    positions = [c.args[0] for c in report.call_args_list]
+    assert positions and positions == sorted(positions)
+    assert positions[-1] == pytest.approx(2.0, abs=0.2)
+    with pytest.raises(RuntimeError):
+        run_ffmpeg(['-i', tmp_path / 'missing.mp4', tmp_path / 'out.mp4'], progress=Mock())
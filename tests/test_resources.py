@@ -0,0 +1,33 @@
+import logging
+import subprocess
+import sys
+import pytest
+from src.resources import ResourceBudget, ResourceBudgetExceeded, current_usage
+
+def test_current_usage_counts_children():
+    before = current_usage()
+    child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(5)'])
+    try:
+        usage = current_usage()
+    finally:
+        child.kill()
+        child.wait()
+
+    assert usage.rss_mb > 0 and usage.open_files > 0
+    assert usage.processes == before.processes + 1
+
+def test_budget_warns_once_per_resource(caplog):
+    budget = ResourceBudget(max_rss_mb=1)
+
+    with caplog.at_level(logging.WARNING):
+        budget.check('section 0')
+        budget.check('section 1')
+
+    assert len(caplog.records) == 1 and 'rss_mb' in caplog.records[0].message
+    assert budget.peak['rss_mb'] > 1
+
+def test_strict_budget_raises():
+    with pytest.raises(ResourceBudgetExceeded, match='open_files'):
+        ResourceBudget(max_open_files=1, strict=True).check('section 0')
+
+    assert ResourceBudget(strict=True).check('section 0').rss_mb > 0
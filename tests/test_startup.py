@@ -0,0 +1,29 @@
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+def _loaded_modules(code: str, modules: list) -> list:
+    """Run code in a fresh interpreter and return which of modules got imported"""
+    probe = f"{code}\nimport sys\nprint(','.join(m for m in {modules!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, '-c', probe], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    return [m for m in result.stdout.strip().split(',') if m]
+
+def test_cli_startup_does_not_import_heavy_dependencies():
+    code = "import io\nfrom src.cli import VideoGeneratorCLI\nVideoGeneratorCLI(stdout=io.StringIO())"
+    loaded = _loaded_modules(code, ['moviepy.editor', 'numpy', 'azure.cognitiveservices.speech', 'gtts'])
+    assert loaded == []
+
+def test_tts_providers_resolved_lazily():
+    code = (
+        "from src.tts import EnhancedTTSFactory, TTSProviderType\n"
+        "EnhancedTTSFactory.get_provider_class(TTSProviderType.GTTS)"
+    )
+    loaded = _loaded_modules(code, ['gtts', 'azure.cognitiveservices.speech'])
+    assert loaded == ['gtts']
+
+def test_lazy_provider_attribute_access():
+    from src.tts import GttsTTSProvider, TTSProvider
+    assert issubclass(GttsTTSProvider, TTSProvider)
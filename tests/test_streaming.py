@@ -0,0 +1,101 @@
+import pytest
+from src.ffmpeg import run_ffmpeg
+from src.streaming import HlsWriter, Rendition, bits_per_second, keyframe_params, parse_ladder
+
+def section(path, seconds):
+    run_ffmpeg(['-f', 'lavfi', '-i', f"testsrc=s=320x180:r=10:d={seconds}",
+                '-f', 'lavfi', '-i', f"sine=d={seconds}", '-c:v', 'libx264', '-preset', 'ultrafast',
+                '-pix_fmt', 'yuv420p', *keyframe_params(1), '-c:a', 'aac', '-shortest', path])
+    return path
+
+def test_parse_ladder():
+    assert parse_ladder('720:2500k, 480:1000k,') == [Rendition(720, '2500k'), Rendition(480, '1000k')]
+    assert bits_per_second('2500k') == 2500000
+    with pytest.raises(ValueError):
+        parse_ladder('720p')
+
+def test_sections_published_in_order(tmp_path):
+    writer = HlsWriter(tmp_path / 'stream', 320, 180, '300k', '64k', preset='ultrafast', segment_time=1)
+    media = tmp_path / 'stream' / '180p' / 'index.m3u8'
+
+    writer.add(1, section(tmp_path / 'b.mp4', 2))
+    assert not media.exists()
+
+    writer.add(0, section(tmp_path / 'a.mp4', 2))
+    playlist = media.read_text()
+    assert playlist.index('section000_') < playlist.index('section001_')
+    assert playlist.count('#EXT-X-DISCONTINUITY') == 1
+    assert '#EXT-X-PLAYLIST-TYPE:EVENT' in playlist and '#EXT-X-ENDLIST' not in playlist
+
+    writer.close(2)
+    assert media.read_text().endswith('#EXT-X-ENDLIST\n')
+
+def test_ladder_renditions_from_one_run(tmp_path):
+    writer = HlsWriter(tmp_path / 'stream', 320, 180, '300k', '64k', preset='ultrafast',
+                       segment_time=1, segment_type='fmp4',
+                       ladder=[Rendition(360, '600k'), Rendition(90, '100k')])
+    writer.add(0, section(tmp_path / 'a.mp4', 1))
+    writer.close(1)
+
+    master = writer.playlist.read_text()
+    assert '360p' not in master
+    assert 'RESOLUTION=320x180' in master and 'RESOLUTION=160x90' in master
+    assert '#EXT-X-MAP:URI="init000.mp4"' in (tmp_path / 'stream' / '90p' / 'index.m3u8').read_text()
+
+def test_publishing_does_not_block_other_encoders(tmp_path, monkeypatch):
+    import threading
+    writer = HlsWriter(tmp_path / 'stream', 320, 180, '300k', '64k', segment_time=1)
+    publishing, release, published = threading.Event(), threading.Event(), []
+
+    def publish(position, path):
+        publishing.set()
+        release.wait(5)
+        published.append(position)
+
+    monkeypatch.setattr(writer, '_publish', publish)
+    first = threading.Thread(target=writer.add, args=(0, tmp_path / 'a.mp4'))
+    first.start()
+    assert publishing.wait(5)
+
+    # Section 0 is being published: handing over the next one returns at once
+    adder = threading.Thread(target=writer.add, args=(1, tmp_path / 'b.mp4'))
+    adder.start()
+    adder.join(1)
+    assert not adder.is_alive()
+    release.set()
+    writer.close(2)
+    first.join()
+    assert published == [0, 1]
+
+def test_still_sections_keep_renditions_in_step(tmp_path, monkeypatch):
+    from src.ffmpeg import probe_duration
+    from src.processors import VideoProcessor
+    processor = VideoProcessor()
+    processor.set_profile('draft')
+    monkeypatch.setattr(processor.config, 'STREAM_FORMAT', 'hls')
+    monkeypatch.setattr(processor.config, 'STREAM_SEGMENT_TIME', 1.0)
+    assert processor.profile.still
+
+    def still_section(path, seconds):
+        # One slide held for the whole section, then a second one
+        run_ffmpeg(['-f', 'lavfi', '-i', f"color=c=red:s=320x180:r={processor.profile.fps}:d={seconds}",
+                    '-f', 'lavfi', '-i', f"sine=d={seconds}", '-c:v', 'libx264', '-preset', 'ultrafast',
+                    *processor._video_params([0.0, 1.5], seconds, ['format=yuv420p']),
+                    '-c:a', 'aac', '-t', f"{seconds:.3f}", path])
+        return path
+
+    writer = HlsWriter(tmp_path / 'stream', 320, 180, '300k', '64k', preset='ultrafast',
+                       segment_time=1, ladder=[Rendition(90, '100k')])
+    sections = [still_section(tmp_path / 'a.mp4', 3.26), still_section(tmp_path / 'b.mp4', 2.0)]
+    for position, path in enumerate(sections):
+        writer.add(position, path)
+    writer.close(2)
+
+    durations = [probe_duration(path) for path in sections]
+    assert writer._positions == {'180p': pytest.approx(sum(durations)), '90p': pytest.approx(sum(durations))}
+    for position, duration in enumerate(durations):
+        for rendition in writer.renditions:
+            extinf = sum(d for d, uri, _ in writer._segments[rendition.name]
+                         if uri.startswith(f"section{position:03d}_"))
+            # The video track spans the section: at most a frame short of the audio
+            assert extinf == pytest.approx(duration, abs=1.5 / processor.profile.fps)
@@ -0,0 +1,28 @@
+from src.subtitles import AssDocument, ass_color, ass_escape, ass_filter, ass_time
+
+def test_ass_color_is_bgr():
+    assert ass_color('#f22bb3') == '&H00B32BF2'
+
+def test_ass_time_rounds_to_centiseconds():
+    assert ass_time(0) == '0:00:00.00'
+    assert ass_time(3723.456) == '1:02:03.46'
+
+def test_ass_escape_neutralizes_overrides():
+    escaped = ass_escape('a {b} c\\N d\ne')
+    assert '{' not in escaped and '}' not in escaped
+    assert '\\' not in escaped and '\n' not in escaped
+
+def test_document_lists_styles_and_events(tmp_path):
+    document = AssDocument(1920, 1080, 'Titolo')
+    document.add_style('text', 'DejaVu Sans', 46, shadow=2)
+    document.add_event(1.0, 2.5, 'Ciao {a tutti}', 'text', r'\an8\pos(960,500)')
+    path = tmp_path / 'text.ass'
+    document.save(path)
+
+    content = path.read_text(encoding='utf-8')
+    assert 'PlayResX: 1920' in content and 'PlayResY: 1080' in content
+    assert 'Style: text,DejaVu Sans,46,&H00FFFFFF' in content
+    assert r'Dialogue: 0,0:00:01.00,0:00:02.50,text,,0,0,0,,{\an8\pos(960,500)}Ciao ｛a tutti｝' in content
+
+def test_ass_filter_escapes_paths():
+    assert ass_filter('/tmp/a:b.ass', '/fonts') == r'ass=filename=/tmp/a\:b.ass:fontsdir=/fonts'
@@ -0,0 +1,120 @@
+import io
+import json
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from src import tracing
+from src.cli import run_batch
+
+@pytest.fixture
+def tracer():
+    yield tracing.enable()
+    tracing.disable()
+
+def test_disabled_spans_are_noop():
+    assert not tracing.enabled()
+    with tracing.span('tts', chars=10) as span:
+        span.set(cache_hit=True)
+    assert span is tracing.span('encode')
+    assert tracing.collect() == []
+
+def encode():
+    with tracing.span('encode'):
+        pass
+
+def test_spans_nest_across_threads(tracer):
+    with tracing.span('render', script='a.xml'):
+        with tracing.span('tts', chars=12) as tts:
+            tts.set(cache_hit=False)
+        with ThreadPoolExecutor(1) as pool:
+            pool.submit(tracing.propagate(encode)).result()
+    with pytest.raises(ValueError):
+        with tracing.span('concat'):
+            raise ValueError('boom')
+
+    spans = {span.name: span for span in tracer.spans}
+    assert spans['tts'].parent_id == spans['render'].span_id
+    assert spans['encode'].parent_id == spans['render'].span_id
+    assert spans['render'].parent_id is None
+    assert spans['tts'].attributes == {'chars': 12, 'cache_hit': False}
+    assert spans['concat'].error == 'ValueError: boom'
+
+def test_chrome_and_otlp_export(tracer, tmp_path):
+    with tracing.span('render'):
+        with tracing.span('encode', bytes=2048):
+            pass
+
+    tracing.export(tmp_path / 'trace.json')
+    events = json.loads((tmp_path / 'trace.json').read_text())['traceEvents']
+    assert [e['name'] for e in events] == ['render', 'encode']
+    assert events[1]['ph'] == 'X' and events[1]['args'] == {'bytes': 2048}
+    assert events[0]['ts'] <= events[1]['ts'] and events[0]['dur'] >= events[1]['dur']
+
+    tracing.export(tmp_path / 'trace.otlp.json', 'otlp')
+    document = json.loads((tmp_path / 'trace.otlp.json').read_text())
+    render, encode = document['resourceSpans'][0]['scopeSpans'][0]['spans']
+    assert encode['parentSpanId'] == render['spanId'] and 'parentSpanId' not in render
+    assert {'key': 'bytes', 'value': {'intValue': '2048'}} in encode['attributes']
+    with pytest.raises(ValueError):
+        tracing.export(tmp_path / 'trace.txt', 'text')
+
+def test_worker_spans_merged_under_current_span(tracer):
+    with tracing.span('render'):
+        pass
+    spans = tracing.collect()
+    assert tracer.spans == []
+    with tracing.span('batch') as batch:
+        tracer.merge(spans)
+    merged = [span for span in tracer.spans if span.name == 'render']
+    assert merged[0].parent_id == batch.span_id
+
+@patch('src.video_generator.VideoGenerator.generate_scripts')
+def test_trace_option_writes_trace(mock_generate_scripts, tmp_path):
+    mock_generate_scripts.return_value = []
+    stdout = io.StringIO()
+    try:
+        exit_code = run_batch(['script', '--json', '--trace', str(tmp_path / 'trace.json')], stdout)
+    finally:
+        tracing.disable()
+
+    assert exit_code == 0
+    assert json.loads(stdout.getvalue())['trace'] == str(tmp_path / 'trace.json')
+    events = json.loads((tmp_path / 'trace.json').read_text())['traceEvents']
+    assert [e['args'] for e in events if e['name'] == 'command'] == [{'command': 'script'}]
+
+def test_generator_writes_trace_from_config(monkeypatch, tmp_path):
+    from src.config import Config
+    from src.video_generator import VideoGenerator
+
+    monkeypatch.setattr(Config(), 'TRACE_FILE', str(tmp_path / 'trace.json'))
+    generator = VideoGenerator()
+    try:
+        with tracing.span('render', script='a.xml'):
+            pass
+        generator.cleanup()
+    finally:
+        tracing.disable()
+
+    events = json.loads((tmp_path / 'trace.json').read_text())['traceEvents']
+    # The cleanup itself is traced before the trace is written
+    assert [e['name'] for e in events] == ['render', 'cleanup']
+
+def test_async_generator_writes_trace_on_close(monkeypatch, tmp_path):
+    import asyncio
+    from src.async_generator import AsyncVideoGenerator
+    from src.config import Config
+
+    monkeypatch.setattr(Config(), 'TRACE_FILE', str(tmp_path / 'trace.otlp.json'))
+    monkeypatch.setattr(Config(), 'TRACE_FORMAT', 'otlp')
+
+    async def run():
+        async with AsyncVideoGenerator(max_renders=1):
+            with tracing.span('render'):
+                pass
+
+    try:
+        asyncio.run(run())
+    finally:
+        tracing.disable()
+    document = json.loads((tmp_path / 'trace.otlp.json').read_text())
+    assert [span['name'] for span in document['resourceSpans'][0]['scopeSpans'][0]['spans']] == ['render']
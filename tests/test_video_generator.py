@@ -73,7 +73,7 @@ def test_generate_video(mock_video_process, video_generator):
     result = video_generator.generate_video('script.xml')
 
     assert result == 'output.mp4'
-    mock_video_process.assert_called_once_with('script.xml')
+    mock_video_process.assert_called_once_with('script.xml', None)
 
 def test_generate_video_with_error(video_generator):
     """Testing error handling during video generation"""
@@ -180,7 +180,7 @@ def test_generate_scripts_with_custom_num_posts(mock_blog_process, video_generat
     mock_blog_process.return_value = []
 
     video_generator.generate_scripts(num_posts=5)
-    mock_blog_process.assert_called_once_with(5)
+    mock_blog_process.assert_called_once_with(5, None)
 
 @patch('src.video_generator.VideoGenerator.generate_scripts')
 def test_process_recent_posts_with_custom_num_posts(mock_generate_scripts, video_generator):
@@ -189,3 +189,62 @@ def test_process_recent_posts_with_custom_num_posts(mock_generate_scripts, video
 
     video_generator.process_recent_posts(num_posts=5)
     mock_generate_scripts.assert_called_once_with(5)
+
+@patch('src.processors.video_processor.VideoProcessor.process')
+def test_render_scripts_reports_each_script(mock_video_process, video_generator):
+    """A failing script is reported without stopping the batch"""
+    mock_video_process.side_effect = ['video1.mp4', Exception("Render error")]
+
+    results = video_generator.render_scripts(['script1.xml', 'script2.xml'])
+
+    assert [r['status'] for r in results] == ['ok', 'error']
+    assert results[0]['video_file'] == 'video1.mp4'
+    assert results[1]['error'] == 'Render error'
+    assert all('seconds' in r for r in results)
+
+def test_render_scripts_rejects_unknown_quality(video_generator):
+    with pytest.raises(ValueError):
+        video_generator.render_scripts(['script1.xml'], quality='ultra')
+
+
+@patch('src.processors.video_processor.VideoProcessor.render_fingerprint')
+@patch('src.processors.video_processor.VideoProcessor.process')
+def test_incremental_render_skips_unchanged_scripts(mock_video_process, mock_fingerprint,
+                                                    video_generator, tmp_path, monkeypatch):
+    """Scripts whose render inputs are unchanged are not rendered again"""
+    video = tmp_path / 'video1.mp4'
+    video.write_bytes(b'video')
+    mock_video_process.return_value = str(video)
+    mock_fingerprint.return_value = 'fp1'
+    monkeypatch.setattr(video_generator.config, 'BUILD_MANIFEST', tmp_path / 'manifest.json')
+    video_generator.set_incremental(True)
+
+    first = video_generator.render_scripts(['script1.xml'])
+    second = video_generator.render_scripts(['script1.xml'])
+    mock_fingerprint.return_value = 'fp2'
+    third = video_generator.render_scripts(['script1.xml'])
+
+    assert [r['status'] for r in first + second + third] == ['ok', 'skipped', 'ok']
+    assert second[0]['video_file'] == str(video)
+    assert mock_video_process.call_count == 2
+    assert video_generator.build_report['video'] == {'built': 2, 'skipped': 1}
+    assert (tmp_path / 'manifest.json').exists()
+
+@patch('src.processors.script_processor.ScriptProcessor.process')
+@patch('src.processors.blog_processor.BlogProcessor.process')
+def test_incremental_scripts_skip_unchanged_posts(mock_blog_process, mock_script_process,
+                                                  video_generator, sample_post, tmp_path,
+                                                  monkeypatch):
+    script = tmp_path / 'script.xml'
+    script.write_text('<script/>')
+    mock_blog_process.return_value = [{**sample_post, 'source': 'post.md'}]
+    mock_script_process.return_value = (str(script), '<script/>')
+    monkeypatch.setattr(video_generator.config, 'BUILD_MANIFEST', tmp_path / 'manifest.json')
+    video_generator.set_incremental(True)
+
+    video_generator.generate_scripts()
+    results = video_generator.generate_scripts()
+
+    mock_script_process.assert_called_once()
+    assert results[0]['skipped'] is True
+    assert results[0]['script_file'] == str(script)
@@ -0,0 +1,89 @@
+import ctypes
+import io
+import wave
+import pytest
+from unittest.mock import Mock, patch
+from src.tts.providers import azure
+from src.tts.providers.azure import AzureTTSProvider
+
+def wav(seconds=0.5, rate=24000):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(bytes(int(seconds * rate) * 2))
+    return buffer.getvalue()
+
+def result(reason, audio=None):
+    return Mock(reason=reason, audio_data=audio or wav())
+
+@pytest.fixture
+def sdk():
+    with patch.object(azure.speechsdk, 'SpeechConfig'), \
+         patch.object(azure.speechsdk, 'Connection'), \
+         patch.object(azure.speechsdk, 'SpeechSynthesizer') as synthesizer_class:
+        synthesizer_class.return_value.speak_text_async.return_value.get.return_value = \
+            result(azure.speechsdk.ResultReason.SynthesizingAudioCompleted)
+        yield synthesizer_class
+
+def test_synthesizer_is_reused_across_calls(sdk, tmp_path):
+    provider = AzureTTSProvider('key', 'westeurope', prewarm=False)
+
+    for i in range(3):
+        assert provider.synthesize(f'Frase {i}', tmp_path / f'{i}.wav')
+
+    sdk.assert_called_once()
+    assert sdk.call_args.kwargs['audio_config'] is None
+    assert (tmp_path / '2.wav').read_bytes() == wav()
+
+def test_synthesize_bytes_reports_format_and_duration(sdk):
+    provider = AzureTTSProvider('key', 'westeurope', prewarm=False)
+
+    audio = provider.synthesize_bytes('Frase')
+
+    assert (audio.format.codec, audio.format.sample_rate, audio.format.channels) == ('wav', 24000, 1)
+    assert audio.duration == pytest.approx(0.5)
+
+def test_iter_audio_streams_chunks(sdk):
+    provider = AzureTTSProvider('key', 'westeurope', prewarm=False)
+    data = wav()
+    position = 0
+
+    def read_data(buffer):
+        nonlocal position
+        chunk = data[position:position + len(buffer)]
+        position += len(chunk)
+        # Like the SDK, fill the bytes buffer in place
+        ctypes.memmove(buffer, chunk, len(chunk))
+        return len(chunk)
+
+    with patch.object(azure.speechsdk, 'AudioDataStream') as stream_class:
+        stream_class.return_value.read_data.side_effect = read_data
+        stream_class.return_value.status = azure.speechsdk.StreamStatus.AllData
+        streamed = list(provider.iter_audio('Frase'))
+
+    assert b''.join(streamed) == data
+    assert len(streamed) == -(-len(data) // provider.chunk_size)
+    assert provider._pool.qsize() == 1
+
+def test_warm_up_fills_the_pool(sdk):
+    provider = AzureTTSProvider('key', 'westeurope', pool_size=3, prewarm=False)
+
+    provider.warm_up()
+
+    assert sdk.call_count == 3
+    assert azure.speechsdk.Connection.from_speech_synthesizer.return_value.open.call_count == 3
+
+def test_failed_synthesizer_is_replaced(sdk, tmp_path):
+    provider = AzureTTSProvider('key', 'westeurope', pool_size=1, prewarm=False)
+    speak = sdk.return_value.speak_text_async.return_value.get
+    speak.return_value = result(azure.speechsdk.ResultReason.Canceled)
+
+    assert not provider.synthesize('Frase', tmp_path / 'a.wav')
+    speak.return_value = result(azure.speechsdk.ResultReason.SynthesizingAudioCompleted)
+    assert provider.synthesize('Frase', tmp_path / 'a.wav')
+
+    assert sdk.call_count == 2
+    sdk.return_value.stop_speaking.assert_called_once()
+    azure.speechsdk.Connection.from_speech_synthesizer.return_value.close.assert_called_once()
@@ -0,0 +1,54 @@
+import pytest
+from unittest.mock import Mock
+from src.tts import CachedTTSProvider
+from src.tts.providers.base import AudioFormat
+
+@pytest.fixture
+def provider():
+    provider = Mock()
+    provider.identity = 'FakeProvider:voice'
+    provider.degraded = False
+    provider.audio_format = AudioFormat('mp3', 24000, 1)
+
+    def synthesize(text, output_path, language='it-IT'):
+        output_path.write_text(f"{language}:{text}")
+        return True
+
+    provider.synthesize.side_effect = synthesize
+    return provider
+
+def test_cache_hit_skips_provider(provider, tmp_path):
+    cached = CachedTTSProvider(provider, tmp_path / 'cache')
+
+    assert cached.synthesize('Hello', tmp_path / 'a.mp3', 'it')
+    assert cached.synthesize('Hello', tmp_path / 'b.mp3', 'it')
+
+    provider.synthesize.assert_called_once()
+    assert (tmp_path / 'b.mp3').read_text() == 'it:Hello'
+
+def test_cache_key_includes_voice_and_language(provider, tmp_path):
+    cached = CachedTTSProvider(provider, tmp_path / 'cache')
+    key = cached.cache_path('Hello', 'it')
+
+    assert cached.cache_path('Hello', 'en') != key
+    provider.identity = 'FakeProvider:other-voice'
+    assert cached.cache_path('Hello', 'it') != key
+
+def test_cache_entries_follow_audio_format(provider, tmp_path):
+    cached = CachedTTSProvider(provider, tmp_path / 'cache')
+    key = cached.cache_path('Hello', 'it')
+    assert key.suffix == '.mp3'
+
+    provider.audio_format = AudioFormat('wav', 24000, 1)
+    assert cached.cache_path('Hello', 'it').suffix == '.wav'
+    provider.audio_format = AudioFormat('mp3', 16000, 1)
+    assert cached.cache_path('Hello', 'it').suffix == '.mp3'
+    assert cached.cache_path('Hello', 'it') != key
+
+def test_failed_synthesis_is_not_cached(provider, tmp_path):
+    provider.synthesize.side_effect = None
+    provider.synthesize.return_value = False
+    cached = CachedTTSProvider(provider, tmp_path / 'cache')
+
+    assert not cached.synthesize('Hello', tmp_path / 'a.mp3', 'it')
+    assert not cached.cache_path('Hello', 'it').exists()
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from unittest.mock import Mock
+from src.audio import decode_pcm, encode_pcm
+from src.tts import AudioFormat, CoalescingTTSProvider
+
+RATE = 24000
+
+def speech(text):
+    """A tone burst per word, a long pause at paragraph breaks"""
+    parts = []
+    for paragraph in text.split('\n\n'):
+        for word in paragraph.split():
+            parts += [0.5 * np.sin(np.arange(int(len(word) * 0.05 * RATE)) * 0.06),
+                      np.zeros(int(0.03 * RATE))]
+        parts.append(np.zeros(int(0.5 * RATE)))
+    return np.concatenate(parts)
+
+@pytest.fixture
+def provider():
+    provider = Mock(identity='FakeProvider', max_request_chars=1000, audio_format=AudioFormat('mp3'), degraded=False)
+
+    def synthesize(text, output_path, language='it-IT'):
+        encode_pcm(speech(text), RATE, output_path)
+        return True
+
+    provider.synthesize.side_effect = synthesize
+    return provider
+
+def test_batches_respect_max_chars(provider, tmp_path):
+    coalescer = CoalescingTTSProvider(provider, tmp_path, max_chars=20)
+
+    assert coalescer.batches(['aaaa', 'bbbb', 'cccccccccccccccc', 'ddd']) == \
+        [['aaaa', 'bbbb'], ['cccccccccccccccc'], ['ddd']]
+
+def test_prefetch_splits_one_request_per_speech(provider, tmp_path):
+    texts = ['Uno due tre quattro.', 'Cinque sei.', 'Sette otto nove dieci undici.']
+    coalescer = CoalescingTTSProvider(provider, tmp_path / 'work')
+
+    coalescer.prefetch(texts, 'it')
+    durations = []
+    for i, text in enumerate(texts):
+        assert coalescer.synthesize(text, tmp_path / f'{i}.wav', 'it')
+        durations.append(len(decode_pcm(tmp_path / f'{i}.wav', RATE)) / RATE)
+
+    provider.synthesize.assert_called_once()
+    assert coalescer.requests == 1
+    # Each piece is about as long as the speech synthesized on its own
+    for text, duration in zip(texts, durations):
+        assert abs(duration - len(speech(text)) / RATE) < 0.6
+
+def test_unsplittable_batch_falls_back_to_single_requests(provider, tmp_path):
+    coalescer = CoalescingTTSProvider(provider, tmp_path / 'work')
+    coalescer.separator = ' '
+
+    coalescer.prefetch(['Uno due.', 'Tre quattro.'], 'it')
+    assert coalescer.synthesize('Uno due.', tmp_path / 'a.wav', 'it')
+
+    assert provider.synthesize.call_count == 2
+    assert provider.synthesize.call_args.args[0] == 'Uno due.'
+
+def test_batches_keep_the_provider_format(provider, tmp_path):
+    provider.audio_format = AudioFormat('wav', RATE, 1)
+    coalescer = CoalescingTTSProvider(provider, tmp_path / 'work')
+
+    coalescer.prefetch(['Uno due.', 'Tre quattro.'], 'it')
+
+    assert provider.synthesize.call_args.args[1].suffix == '.wav'
+    assert sorted(p.name for p in (tmp_path / 'work').iterdir()) == ['batch_0_0.wav', 'batch_0_1.wav']
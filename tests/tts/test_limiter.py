@@ -0,0 +1,144 @@
+import multiprocessing
+import threading
+import time
+from src.tts import (AdaptiveLimiter, AudioFormat, AudioTTSProvider, EnhancedTTSFactory,
+                     FileAdaptiveLimiter, RateLimitedTTSProvider, SynthesizedAudio, TTSError)
+
+class RateLimitedService(AudioTTSProvider):
+    """Answers in `latency` seconds, 429 beyond `capacity` concurrent requests"""
+
+    def __init__(self, capacity, latency=0.01):
+        super().__init__()
+        self.capacity = capacity
+        self.latency = latency
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def synthesize_bytes(self, text, language='it-IT'):
+        with self._lock:
+            rejected = self.in_flight >= self.capacity
+            self.in_flight += 1
+        time.sleep(self.latency)
+        with self._lock:
+            self.in_flight -= 1
+        if rejected:
+            raise TTSError('429 Too Many Requests', 'service', throttled=True)
+        return SynthesizedAudio(b'audio', AudioFormat('mp3'))
+
+def test_limit_grows_while_healthy():
+    limiter = AdaptiveLimiter(initial=2, max_limit=5)
+    for _ in range(20):
+        slots = int(limiter.limit)
+        for _ in range(slots):
+            limiter.acquire()
+        for _ in range(slots):
+            limiter.release('ok', 0.1)
+    assert limiter.limit == 5
+
+def test_idle_limit_does_not_grow():
+    limiter = AdaptiveLimiter(initial=4)
+    for _ in range(10):
+        limiter.acquire()
+        limiter.release('ok', 0.1)
+    assert limiter.limit == 4
+
+def test_limit_does_not_grow_when_latency_degrades():
+    limiter = AdaptiveLimiter(initial=1, latency_tolerance=2.0)
+    limiter.acquire()
+    limiter.release('ok', 0.1)
+    limit = limiter.limit
+    limiter.acquire()
+    limiter.release('ok', 1.0)
+    assert limiter.limit == limit
+
+def test_throttling_halves_limit_once_per_interval():
+    limiter = AdaptiveLimiter(initial=8, backoff_interval=60)
+    for _ in range(3):
+        limiter.acquire()
+        limiter.release('throttled')
+    assert limiter.limit == 4
+
+    limiter.acquire()
+    limiter.release('error')
+    assert limiter.limit == 4
+
+def test_slow_request_counts_as_timeout():
+    limiter = AdaptiveLimiter(initial=8)
+    with limiter.slot(timeout=0.01):
+        time.sleep(0.02)
+    assert limiter.limit == 4
+
+def test_acquire_blocks_at_limit():
+    limiter = AdaptiveLimiter(initial=1)
+    limiter.acquire()
+    acquired = threading.Event()
+    threading.Thread(target=lambda: (limiter.acquire(), acquired.set()), daemon=True).start()
+
+    assert not acquired.wait(0.05)
+    limiter.release('ok', 0.1)
+    assert acquired.wait(1)
+
+def _hammer(provider):
+    """8 threads sending 20 requests each, returns the number of failures"""
+    failures = []
+
+    def work():
+        for _ in range(20):
+            try:
+                provider.synthesize_bytes('Ciao')
+            except TTSError:
+                failures.append(1)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(failures)
+
+def test_provider_backs_off_to_service_capacity():
+    unlimited = _hammer(RateLimitedService(capacity=3))
+    provider = RateLimitedTTSProvider(RateLimitedService(capacity=3),
+                                      AdaptiveLimiter(initial=8, backoff_interval=0.01))
+    limited = _hammer(provider)
+
+    # The limit oscillates around the capacity instead of flooding the service
+    assert provider.limiter.limit < 8
+    assert limited < unlimited / 2
+
+def _hold_slot(path, results):
+    limiter = FileAdaptiveLimiter(path, initial=1, poll_interval=0.01)
+    start = time.monotonic()
+    with limiter.slot():
+        results.put(time.monotonic() - start)
+        time.sleep(0.2)
+
+def test_file_limiter_is_shared_across_processes(tmp_path):
+    path = tmp_path / 'gtts.json'
+    limiter = FileAdaptiveLimiter(path, initial=1, poll_interval=0.01)
+    results = multiprocessing.Queue()
+    limiter.acquire()
+    process = multiprocessing.Process(target=_hold_slot, args=(path, results))
+    process.start()
+    time.sleep(0.2)
+    limiter.release('ok', 0.1)
+    process.join(5)
+
+    assert results.get(timeout=1) >= 0.15
+    assert limiter.in_flight == 0
+
+def test_file_limiter_reclaims_slots_of_dead_processes(tmp_path):
+    path = tmp_path / 'gtts.json'
+    path.write_text('{"limit": 1, "slots": {"999999999": 1}}')
+    limiter = FileAdaptiveLimiter(path)
+    assert limiter.in_flight == 0
+
+def test_factory_shares_limiter_per_provider_type(monkeypatch):
+    monkeypatch.setenv('APP_ENV', 'dev')
+    monkeypatch.setenv('TTS_RESILIENT', 'false')
+    first, second = EnhancedTTSFactory.create_provider(), EnhancedTTSFactory.create_provider()
+    assert isinstance(first, RateLimitedTTSProvider)
+    assert first.limiter is second.limiter
+
+    monkeypatch.setenv('TTS_ADAPTIVE_LIMIT', 'false')
+    assert not isinstance(EnhancedTTSFactory.create_provider(), RateLimitedTTSProvider)
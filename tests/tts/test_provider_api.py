@@ -0,0 +1,59 @@
+import asyncio
+import pytest
+from pathlib import Path
+from src.tts import (AudioFormat, AudioTTSProvider, EnhancedTTSFactory, SynthesizedAudio,
+                     TTSConfig, TTSError, TTSProvider, TTSProviderType)
+
+class FileProvider(TTSProvider):
+    """A provider written against the file-based API only"""
+
+    def synthesize(self, text: str, output_path: Path, language: str = 'it-IT') -> bool:
+        if not text.strip():
+            return False
+        Path(output_path).write_bytes(text.encode())
+        return True
+
+class ChunkProvider(AudioTTSProvider):
+    audio_format = AudioFormat('pcm_s16le', 16000, 1)
+
+    def iter_audio(self, text, language='it-IT'):
+        for word in text.split():
+            yield word.encode()
+
+    def synthesize_bytes(self, text, language='it-IT'):
+        if not text.strip():
+            raise TTSError('empty text', self.identity)
+        return SynthesizedAudio(b''.join(self.iter_audio(text)), self.audio_format)
+
+def test_file_provider_gets_bytes_api():
+    audio = FileProvider().synthesize_bytes('Ciao')
+
+    assert audio.data == b'Ciao'
+    assert audio.format == AudioFormat('mp3')
+    with pytest.raises(TTSError, match='FileProvider'):
+        FileProvider().synthesize_bytes(' ')
+
+def test_audio_provider_gets_file_api(tmp_path):
+    provider = ChunkProvider()
+
+    assert provider.synthesize('uno due', tmp_path / 'a.raw')
+    assert (tmp_path / 'a.raw').read_bytes() == b'unodue'
+    assert not provider.synthesize(' ', tmp_path / 'b.raw')
+
+def test_astream_yields_chunks_as_produced():
+    async def collect(provider, text):
+        return [chunk async for chunk in provider.astream(text)]
+
+    assert asyncio.run(collect(ChunkProvider(), 'uno due tre')) == [b'uno', b'due', b'tre']
+    assert asyncio.run(collect(FileProvider(), 'Ciao')) == [b'Ciao']
+    with pytest.raises(TTSError):
+        asyncio.run(collect(FileProvider(), ' '))
+
+def test_audio_provider_registers_through_factory():
+    original = EnhancedTTSFactory._providers[TTSProviderType.GTTS]
+    EnhancedTTSFactory.register_provider(TTSProviderType.GTTS, ChunkProvider)
+    try:
+        provider = EnhancedTTSFactory.create_provider(TTSConfig(TTSProviderType.GTTS, {}))
+        assert provider.synthesize_bytes('uno due').format.sample_rate == 16000
+    finally:
+        EnhancedTTSFactory.register_provider(TTSProviderType.GTTS, original)
@@ -0,0 +1,183 @@
+import threading
+import time
+import pytest
+from src.tts import (AdaptiveLimiter, AudioFormat, AudioTTSProvider, CircuitBreaker,
+                     EnhancedTTSFactory, LatencyHistogram, MeteredTTSProvider, RateLimitedTTSProvider,
+                     ResilientTTSProvider, SynthesizedAudio, TTSError)
+
+class ScriptedProvider(AudioTTSProvider):
+    """Answers after the given delays, or raises when the delay is an exception"""
+
+    def __init__(self, name, delays):
+        super().__init__()
+        self.name = name
+        self.delays = list(delays)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    @property
+    def identity(self):
+        return self.name
+
+    def synthesize_bytes(self, text, language='it-IT'):
+        with self._lock:
+            self.calls += 1
+            delay = self.delays.pop(0) if self.delays else 0.0
+        if isinstance(delay, Exception):
+            raise delay
+        time.sleep(delay)
+        return SynthesizedAudio(self.name.encode(), AudioFormat('mp3'))
+
+def test_timeout_fails_over_to_fallback():
+    primary = ScriptedProvider('azure', [1.0])
+    fallback = ScriptedProvider('gtts', [])
+    provider = ResilientTTSProvider(primary, lambda: fallback, timeout=0.1)
+
+    assert provider.synthesize_bytes('Ciao').data == b'gtts'
+    assert provider.counters['timeouts'] == 1
+    assert provider.counters['failovers'] == 1
+    assert provider.degraded
+    assert provider.identity == 'azure'
+
+def test_hanging_primary_does_not_delay_fallback():
+    from concurrent.futures import ThreadPoolExecutor
+    primary = ScriptedProvider('azure', [0.5] * 4)
+    fallback = ScriptedProvider('gtts', [])
+    provider = ResilientTTSProvider(primary, fallback, timeout=0.1, hedge=False, max_workers=2,
+                                    failure_threshold=100)
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(4) as pool:
+        answers = list(pool.map(lambda _: provider.synthesize_bytes('Ciao').data, range(4)))
+
+    assert answers == [b'gtts'] * 4
+    assert time.monotonic() - start < 0.45
+    # Two calls hang in the primary's pool, the two queued behind them were cancelled
+    assert primary.calls == 2
+    assert provider.counters['timeouts'] == 4
+
+def test_waiting_for_a_limiter_slot_is_not_timed_out():
+    from concurrent.futures import ThreadPoolExecutor
+    primary = RateLimitedTTSProvider(ScriptedProvider('azure', [0.15] * 2),
+                                     AdaptiveLimiter(initial=1, max_limit=1))
+    fallback = ScriptedProvider('gtts', [])
+    provider = ResilientTTSProvider(primary, fallback, timeout=0.25, hedge=False)
+
+    # One slot: the second call waits for it, then answers within the timeout
+    with ThreadPoolExecutor(2) as pool:
+        answers = list(pool.map(lambda _: provider.synthesize_bytes('Ciao').data, range(2)))
+
+    assert answers == [b'azure'] * 2
+    assert provider.counters['timeouts'] == 0 and fallback.calls == 0
+
+def test_hedge_shares_the_slot_of_its_call():
+    limiter = AdaptiveLimiter(initial=1, max_limit=1)
+    primary = RateLimitedTTSProvider(ScriptedProvider('azure', [0.01] * 5 + [1.0, 0.01]), limiter)
+    provider = ResilientTTSProvider(primary, timeout=2.0, hedge_min_samples=5)
+    for _ in range(5):
+        provider.synthesize_bytes('Ciao')
+
+    start = time.monotonic()
+    assert provider.synthesize_bytes('Ciao').data == b'azure'
+
+    # The slot is still held by the slow attempt: the hedge did not wait for another one
+    assert time.monotonic() - start < 0.5
+    assert provider.counters['hedge_wins'] == 1
+    assert limiter.in_flight == 1
+
+def test_slow_call_is_hedged():
+    primary = ScriptedProvider('azure', [0.01] * 5 + [1.0, 0.01])
+    provider = ResilientTTSProvider(primary, timeout=2.0, hedge_min_samples=5)
+    for _ in range(5):
+        provider.synthesize_bytes('Ciao')
+
+    start = time.monotonic()
+    assert provider.synthesize_bytes('Ciao').data == b'azure'
+
+    assert time.monotonic() - start < 0.5
+    assert provider.counters['hedged'] == 1
+    assert provider.counters['hedge_wins'] == 1
+    assert not provider.degraded
+
+def test_circuit_opens_after_repeated_failures():
+    primary = ScriptedProvider('azure', [TTSError('down')] * 10)
+    fallback = ScriptedProvider('gtts', [])
+    provider = ResilientTTSProvider(primary, fallback, failure_threshold=2, reset_timeout=60)
+
+    for _ in range(4):
+        assert provider.synthesize_bytes('Ciao').data == b'gtts'
+
+    assert primary.calls == 2
+    assert provider.stats()['circuits']['azure'] == 'open'
+
+def test_all_providers_failing_raises():
+    provider = ResilientTTSProvider(ScriptedProvider('azure', [TTSError('down')]))
+
+    with pytest.raises(TTSError, match='all providers failed'):
+        provider.synthesize_bytes('Ciao')
+    assert not provider.synthesize('Ciao', '/nonexistent/a.mp3')
+
+def test_circuit_breaker_half_open_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()  # a single trial call
+    breaker.record_success()
+    assert breaker.state == 'closed'
+
+def test_latency_histogram_snapshot():
+    histogram = LatencyHistogram()
+    for seconds in (0.02, 0.3, 0.3, 5.0):
+        histogram.observe(seconds)
+
+    snapshot = histogram.snapshot()
+
+    assert snapshot['count'] == 4
+    assert snapshot['buckets']['0.05'] == 1
+    assert snapshot['buckets']['0.5'] == 3
+    assert snapshot['buckets']['+Inf'] == 4
+    assert snapshot['p50'] == 0.3
+
+def test_factory_wraps_default_provider(monkeypatch):
+    monkeypatch.setenv('APP_ENV', 'dev')
+    provider = EnhancedTTSFactory.create_provider()
+    assert isinstance(provider, ResilientTTSProvider)
+
+    monkeypatch.setenv('TTS_RESILIENT', 'false')
+    assert not isinstance(EnhancedTTSFactory.create_provider(), ResilientTTSProvider)
+
+def test_requests_recorded_in_metrics():
+    from src import metrics
+
+    primary = MeteredTTSProvider(ScriptedProvider('metrics-primary', [TTSError('boom')]))
+    fallback = MeteredTTSProvider(ScriptedProvider('metrics-fallback', [0.0]))
+    provider = ResilientTTSProvider(primary, fallback, hedge=False)
+
+    provider.synthesize_bytes('Ciao')
+    assert metrics.TTS_REQUESTS.value(provider='metrics-primary', outcome='error') == 1
+    assert metrics.TTS_REQUESTS.value(provider='metrics-fallback', outcome='ok') == 1
+    counts, _ = metrics.TTS_LATENCY.value(provider='metrics-fallback')
+    assert sum(counts) == 1
+
+@pytest.mark.parametrize('resilient, limited', [('false', 'true'), ('false', 'false'), ('true', 'false')])
+def test_factory_providers_are_metered(monkeypatch, resilient, limited):
+    from src import metrics
+
+    monkeypatch.setenv('APP_ENV', 'dev')
+    monkeypatch.setenv('DEV_TTS_PROVIDER', 'synthetic')
+    monkeypatch.setenv('TTS_RESILIENT', resilient)
+    monkeypatch.setenv('TTS_ADAPTIVE_LIMIT', limited)
+    provider = EnhancedTTSFactory.create_provider()
+
+    def recorded():
+        latency = metrics.TTS_LATENCY.value(provider=provider.identity)
+        return (metrics.TTS_REQUESTS.value(provider=provider.identity, outcome='ok') or 0,
+                sum(latency[0]) if latency else 0)
+
+    before = recorded()
+    provider.synthesize_bytes('Ciao')
+    # Once per request, whatever wraps the provider
+    assert recorded() == (before[0] + 1, before[1] + 1)
@@ -0,0 +1,72 @@
+import io
+import threading
+import wave
+import pytest
+from src.tts import (EnhancedTTSFactory, SyntheticTTSProvider, TTSConfiguration,
+                     TTSError, TTSProviderType)
+
+def test_audio_is_deterministic():
+    text = "Ciao a tutti, questo è un test."
+    first = SyntheticTTSProvider().synthesize_bytes(text)
+    second = SyntheticTTSProvider().synthesize_bytes(text)
+
+    assert first.data == second.data
+    assert first.format.codec == 'wav'
+    with wave.open(io.BytesIO(first.data)) as wav:
+        assert wav.getframerate() == 24000
+        assert wav.getnchannels() == 1
+
+def test_duration_follows_speaking_rate():
+    text = "parola " * 30
+    slow = SyntheticTTSProvider(chars_per_second=10).synthesize_bytes(text)
+    fast = SyntheticTTSProvider(chars_per_second=20).synthesize_bytes(text)
+
+    # 180 voiced characters: 18s against 9s, plus the same pauses
+    assert slow.duration - fast.duration == pytest.approx(9.0, abs=0.1)
+
+def test_voices_differ():
+    first, second = SyntheticTTSProvider(voice='a'), SyntheticTTSProvider(voice='b')
+    assert first.identity != second.identity
+    assert first.render('Ciao.') != second.render('Ciao.')
+
+def test_error_injection():
+    provider = SyntheticTTSProvider(error_rate=1.0)
+    with pytest.raises(TTSError) as error:
+        provider.synthesize_bytes('Ciao')
+    assert not error.value.throttled
+
+    provider = SyntheticTTSProvider(throttle_rate=1.0)
+    with pytest.raises(TTSError) as error:
+        provider.synthesize_bytes('Ciao')
+    assert error.value.throttled
+
+def test_requests_beyond_capacity_are_throttled():
+    provider = SyntheticTTSProvider(latency=0.1, capacity=1)
+    errors = []
+
+    def call():
+        try:
+            provider.synthesize_bytes('Ciao')
+        except TTSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 2
+    assert all(error.throttled for error in errors)
+
+def test_registered_in_factory(monkeypatch):
+    monkeypatch.setenv('APP_ENV', 'dev')
+    monkeypatch.setenv('DEV_TTS_PROVIDER', 'synthetic')
+    monkeypatch.setenv('SYNTHETIC_TTS_LATENCY', '0.5')
+
+    config = TTSConfiguration().get_provider_config()
+    assert config.provider_type == TTSProviderType.SYNTHETIC
+
+    provider = EnhancedTTSFactory.create_provider(config)
+    assert isinstance(provider, SyntheticTTSProvider)
+    assert provider.latency == 0.5